@@ -0,0 +1,23 @@
+from django.core.cache import cache
+
+from academics.constants import TERM_CHOICES
+
+
+def get_timetable_cache_key(user_id, year, term_number):
+    return f"academics:timetable:{user_id}:{year}:{term_number}"
+
+
+def invalidate_timetables(keys):
+    """
+    指定した (ユーザー, 年度) の時間割グリッドのキャッシュを削除する
+
+    Args:
+        keys: (ユーザーID, 年度) の組の集合
+    """
+    cache.delete_many(
+        [
+            get_timetable_cache_key(user_id, year, term_number)
+            for user_id, year in keys
+            for term_number, _ in TERM_CHOICES
+        ]
+    )
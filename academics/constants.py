@@ -38,6 +38,9 @@ TIME_FOURTH = 4
 TIME_FIFTH = 5
 MAX_TIME = 5
 
+# 1タームあたりのスケジュール数（Schedule.id の最大値）
+SCHEDULES_PER_TERM = len(DAY_CHOICES) * MAX_TIME
+
 TIME_CHOICES = [
     (TIME_FIRST, "1限"),
     (TIME_SECOND, "2限"),
@@ -46,6 +49,9 @@ TIME_CHOICES = [
     (TIME_FIFTH, "5限"),
 ]
 
+# 出席回数の上限
+MAX_ATTENDANCE_COUNT = 15
+
 # 各時限の実際の時間
 TIME_SLOTS = {
     TIME_FIRST: {"start": "09:00", "end": "10:30"},
@@ -54,3 +60,13 @@ TIME_SLOTS = {
     TIME_FOURTH: {"start": "14:40", "end": "16:10"},
     TIME_FIFTH: {"start": "16:20", "end": "17:50"},
 }
+
+# 時間割グリッドのキャッシュ有効期間（秒）
+TIMETABLE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# 現在のタームのプロセス内キャッシュの有効期間（秒）
+CURRENT_TERM_LOCAL_CACHE_TIMEOUT = 60
+# 現在のタームの共有キャッシュの有効期間（秒）
+CURRENT_TERM_CACHE_TIMEOUT = 60 * 60 * 24
+# /now/ のレスポンスをクライアントがキャッシュできる期間（秒）
+CURRENT_TERM_MAX_AGE = 60 * 60
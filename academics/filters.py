@@ -1,4 +1,5 @@
 import django_filters
+from django.db.models import Exists, OuterRef
 
 from accounts.models import Department
 from .models import Lecture, Registration, Schedule, Term
@@ -23,10 +24,10 @@ class LectureFilter(django_filters.FilterSet):
         label="スケジュール",
     )
     day = django_filters.NumberFilter(
-        field_name="schedules__day", lookup_expr="exact", label="曜日"
+        field_name="day", method="filter_by_schedule", label="曜日"
     )
     time = django_filters.NumberFilter(
-        field_name="schedules__time", lookup_expr="exact", label="時限"
+        field_name="time", method="filter_by_schedule", label="時限"
     )
     is_required = django_filters.BooleanFilter(field_name="syllabus__is_required")
     is_exam = django_filters.BooleanFilter(field_name="syllabus__is_exam")
@@ -42,6 +43,7 @@ class LectureFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(
         field_name="name", lookup_expr="icontains", label="講義名"
     )
+    q = django_filters.CharFilter(method="search", label="キーワード")
 
     class Meta:
         model = Lecture
@@ -49,6 +51,24 @@ class LectureFilter(django_filters.FilterSet):
             "grade": ["exact"],
         }
 
+    def search(self, queryset, name, value):
+        return queryset.search(value)
+
+    def filter_by_schedule(self, queryset, name, value):
+        """
+        曜日または時限が一致するスケジュールを持つ講義に絞り込む
+
+        同じ曜日に複数の時限がある講義が重複しないよう、JOIN ではなく
+        EXISTS サブクエリを使う。
+        """
+        return queryset.filter(
+            Exists(
+                Lecture.schedules.through.objects.filter(
+                    lecture_id=OuterRef("pk"), **{f"schedule__{name}": value}
+                )
+            )
+        )
+
 
 class RegistrationFilter(django_filters.FilterSet):
     year = django_filters.NumberFilter(field_name="year", lookup_expr="exact")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from academics.models import Registration, TimetableOccupancy
+from academics.utils import rebuild_timetable_occupancies
+
+
+class Command(BaseCommand):
+    help = "登録情報から時間割の使用状況ビットマップを再構築するコマンド"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="再構築する年度")
+
+    def handle(self, *args, **options):
+        registrations = Registration.objects.all()
+        occupancies = TimetableOccupancy.objects.all()
+
+        year = options.get("year")
+        if year:
+            registrations = registrations.filter(year=year)
+            occupancies = occupancies.filter(year=year)
+
+        # 登録がなくなった (ユーザー, 年度) も空のビットマップで上書きする
+        keys = set(registrations.values_list("user_id", "year").distinct())
+        keys |= set(occupancies.values_list("user_id", "year"))
+
+        count = rebuild_timetable_occupancies(keys)
+        self.stdout.write(f"時間割の使用状況を再構築しました: {count}件")
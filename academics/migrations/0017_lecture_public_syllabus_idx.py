@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("academics", "0016_registration_attendance_count"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="lecture",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["syllabus"],
+                name="lecture_public_syllabus_idx",
+            ),
+        ),
+    ]
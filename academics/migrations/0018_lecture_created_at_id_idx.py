@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("academics", "0017_lecture_public_syllabus_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="lecture",
+            index=models.Index(
+                fields=["created_at", "id"], name="lecture_created_at_id_idx"
+            ),
+        ),
+    ]
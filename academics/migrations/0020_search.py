@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:03
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("academics", "0019_timetableoccupancy"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name="lecture",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("name"), name="gin_trgm_ops"
+                ),
+                name="lecture_name_trgm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="lecture",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("instructor"),
+                    name="gin_trgm_ops",
+                ),
+                name="lecture_instructor_trgm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="syllabus",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("purpose"),
+                    name="gin_trgm_ops",
+                ),
+                name="syllabus_purpose_trgm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="syllabus",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("goal"), name="gin_trgm_ops"
+                ),
+                name="syllabus_goal_trgm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="syllabus",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("description"),
+                    name="gin_trgm_ops",
+                ),
+                name="syllabus_description_trgm_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="syllabus",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("textbook"),
+                    name="gin_trgm_ops",
+                ),
+                name="syllabus_textbook_trgm_idx",
+            ),
+        ),
+    ]
@@ -1,9 +1,24 @@
 import uuid
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
+from django.db.models import F
 from django.forms import ValidationError
 from django.contrib.auth.models import User
 
-from academics.constants import DAY_CHOICES, MAX_TIME, TERM_CHOICES, TIME_CHOICES
+from academics.cache import invalidate_timetables
+from academics.constants import (
+    DAY_CHOICES,
+    MAX_ATTENDANCE_COUNT,
+    MAX_TIME,
+    SCHEDULES_PER_TERM,
+    TERM_CHOICES,
+    TIME_CHOICES,
+)
+from academics.querysets import (
+    LectureQuerySet,
+    RegistrationQuerySet,
+)
 from accounts.models import Department
 
 
@@ -85,6 +100,25 @@ class Syllabus(models.Model):
 
     class Meta:
         verbose_name_plural = "シラバス"
+        # 講義検索の icontains（UPPER(...) LIKE）を pg_trgm で高速化する
+        indexes = [
+            GinIndex(
+                OpClass(Upper("purpose"), name="gin_trgm_ops"),
+                name="syllabus_purpose_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("goal"), name="gin_trgm_ops"),
+                name="syllabus_goal_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("description"), name="gin_trgm_ops"),
+                name="syllabus_description_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("textbook"), name="gin_trgm_ops"),
+                name="syllabus_textbook_trgm_idx",
+            ),
+        ]
 
 
 class Lecture(models.Model):
@@ -126,8 +160,29 @@ class Lecture(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="登録日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
 
+    objects = LectureQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "講義"
+        indexes = [
+            # 公開講義の絞り込みとシラバスの有無の判定に使う部分インデックス
+            models.Index(
+                fields=["syllabus"],
+                condition=models.Q(is_public=True),
+                name="lecture_public_syllabus_idx",
+            ),
+            # icontains（UPPER(...) LIKE）を pg_trgm で高速化する
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name="lecture_name_trgm_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("instructor"), name="gin_trgm_ops"),
+                name="lecture_instructor_trgm_idx",
+            ),
+            # カーソルページネーションの並び順
+            models.Index(fields=["created_at", "id"], name="lecture_created_at_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.id} - {self.name}"
@@ -152,21 +207,82 @@ class Registration(models.Model):
     )
     registered_at = models.DateTimeField(auto_now_add=True, verbose_name="登録日時")
 
+    objects = RegistrationQuerySet.as_manager()
+
     class Meta:
         unique_together = ("user", "lecture", "year")
         verbose_name_plural = "登録状況"
 
     def increment_attendance(self):
-        if self.attendance_count < 15:
-            self.attendance_count += 1
-            self.save()
-        return self.attendance_count
+        updated = Registration.objects.filter(
+            pk=self.pk, attendance_count__lt=MAX_ATTENDANCE_COUNT
+        ).update(attendance_count=F("attendance_count") + 1)
+        return self._refresh_attendance(updated)
 
     def decrement_attendance(self):
-        if self.attendance_count > 0:
-            self.attendance_count -= 1
-            self.save()
+        updated = Registration.objects.filter(
+            pk=self.pk, attendance_count__gt=0
+        ).update(attendance_count=F("attendance_count") - 1)
+        return self._refresh_attendance(updated)
+
+    def _refresh_attendance(self, updated):
+        # update() ではシグナルが送られないため時間割のキャッシュを直接破棄する
+        if updated:
+            invalidate_timetables({(self.user_id, self.year)})
+        self.refresh_from_db(fields=["attendance_count"])
         return self.attendance_count
 
     def __str__(self):
         return f"{self.user.profile.display_name} が {self.lecture.name} を {self.year}年  に登録"
+
+
+class TimetableOccupancy(models.Model):
+    """
+    ユーザーが年度内に埋めているターム・時限のビットマップ
+
+    Registration と講義のターム・スケジュールから導出される非正規化データで、
+    シグナルにより同期される。ビット位置は utils.get_slot_bit を参照。
+    """
+
+    SLOT_BYTES = (len(TERM_CHOICES) * SCHEDULES_PER_TERM + 7) // 8
+
+    user = models.ForeignKey(
+        User,
+        related_name="timetable_occupancies",
+        on_delete=models.CASCADE,
+        verbose_name="ユーザー",
+    )
+    year = models.PositiveIntegerField(verbose_name="年度")
+    slots = models.BinaryField(
+        max_length=SLOT_BYTES, default=bytes(SLOT_BYTES), verbose_name="使用中の時限"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    class Meta:
+        unique_together = ("user", "year")
+        verbose_name_plural = "時間割の使用状況"
+
+    def __str__(self):
+        return f"{self.user} の {self.year}年度の時間割"
+
+    @property
+    def mask(self):
+        return int.from_bytes(bytes(self.slots), "big")
+
+    @mask.setter
+    def mask(self, value):
+        self.slots = value.to_bytes(self.SLOT_BYTES, "big")
+
+    def term_mask(self, term_number):
+        """指定したタームで使用中のスケジュールのビットマップを返す"""
+        shift = (term_number - 1) * SCHEDULES_PER_TERM
+        return (self.mask >> shift) & ((1 << SCHEDULES_PER_TERM) - 1)
+
+    def free_schedule_ids(self, term_number):
+        """指定したタームで空いているスケジュールIDのリストを返す"""
+        term_mask = self.term_mask(term_number)
+        return [
+            schedule_id
+            for schedule_id in range(1, SCHEDULES_PER_TERM + 1)
+            if not term_mask & (1 << (schedule_id - 1))
+        ]
@@ -0,0 +1,151 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections, models
+from django.db.models import Case, Exists, F, OuterRef, Prefetch, Q, Value, When
+from django.db.models.functions import Greatest, Least
+
+from academics.cache import invalidate_timetables
+from academics.constants import MAX_ATTENDANCE_COUNT
+
+from accounts.models import Department
+
+
+def lecture_related_lookups(prefix=""):
+    """
+    LectureSerializer の出力に必要な関連オブジェクトの先読み設定を返す
+
+    Args:
+        prefix: Lecture までのリレーションパス（例: "lecture__"）
+
+    Returns:
+        tuple: (select_related に渡すパスのリスト, prefetch_related に渡すリスト)
+    """
+    select_related = [
+        f"{prefix}syllabus",
+        f"{prefix}owner__profile__faculty",
+        f"{prefix}owner__profile__department__faculty",
+    ]
+    prefetch_related = [
+        f"{prefix}terms",
+        f"{prefix}schedules",
+        Prefetch(
+            f"{prefix}syllabus__departments",
+            queryset=Department.objects.select_related("faculty"),
+        ),
+    ]
+    return select_related, prefetch_related
+
+
+# シラバスの本文のうち検索対象にする列と、一致した場合に関連度に加える重み
+SYLLABUS_SEARCH_WEIGHTS = [
+    ("purpose", 0.5),
+    ("goal", 0.5),
+    ("description", 0.3),
+    ("textbook", 0.1),
+]
+
+
+class LectureQuerySet(models.QuerySet):
+    def search(self, query):
+        """
+        講義名・担当教員・シラバスの本文をキーワードで検索し、関連度順に並べる
+
+        日本語の文は空白で区切られないため、いずれも部分一致（icontains）で照合し、
+        pg_trgm のインデックスで高速化する。関連度は講義名・担当教員との
+        トライグラム類似度に、一致したシラバスの列の重みを加えたもの。
+        PostgreSQL 以外では関連度を計算せず講義名順に並べる。
+        """
+        text_query = Q(name__icontains=query) | Q(instructor__icontains=query)
+        syllabus_query = Q()
+        syllabus_rank = Value(0.0)
+        for column, weight in SYLLABUS_SEARCH_WEIGHTS:
+            column_query = Q(**{f"syllabus__{column}__icontains": query})
+            syllabus_query |= column_query
+            syllabus_rank += Case(
+                When(column_query, then=Value(weight)), default=Value(0.0)
+            )
+        queryset = self.filter(text_query | syllabus_query)
+
+        if connections[self.db].vendor != "postgresql":
+            return queryset.order_by("name", "id")
+
+        return queryset.annotate(
+            rank=Greatest(
+                TrigramSimilarity("name", query),
+                TrigramSimilarity("instructor", query),
+            )
+            + syllabus_rank
+        ).order_by("-rank", "id")
+
+    def visible_to(self, user):
+        """
+        ユーザーが閲覧可能な講義に絞り込む
+
+        自分が所有者か公開されている講義のうち、シラバスがないもの、
+        またはシラバスの履修可能学科にユーザーの所属学科が含まれるものを返す。
+        M2M の JOIN と DISTINCT の代わりに EXISTS サブクエリを使う。
+        """
+        profile = user.profile
+        department = profile.department
+        syllabus_model = self.model._meta.get_field("syllabus").related_model
+        through = syllabus_model.departments.through
+
+        if department is None and profile.faculty_id is None:
+            # 所属未設定の場合は履修可能学科が未設定のシラバスのみ
+            dept_query = ~Exists(
+                through.objects.filter(syllabus_id=OuterRef("syllabus_id"))
+            )
+        elif department is not None and department.faculty_id == profile.faculty_id:
+            dept_query = Exists(
+                through.objects.filter(
+                    syllabus_id=OuterRef("syllabus_id"), department_id=department.id
+                )
+            )
+        else:
+            # 学部と学科の組み合わせが一致しない場合はシラバス付きの講義は見えない
+            dept_query = Q(pk__in=[])
+
+        return self.filter(
+            Q(owner=user) | Q(is_public=True),
+            Q(syllabus__isnull=True) | dept_query,
+        )
+
+    def for_listing(self):
+        """一覧表示用に関連オブジェクトをまとめて取得する"""
+        select_related, prefetch_related = lecture_related_lookups()
+        return self.select_related(*select_related).prefetch_related(*prefetch_related)
+
+
+class RegistrationQuerySet(models.QuerySet):
+    def for_listing(self):
+        """一覧表示用に講義とその関連オブジェクトをまとめて取得する"""
+        select_related, prefetch_related = lecture_related_lookups("lecture__")
+        return self.select_related(*select_related).prefetch_related(*prefetch_related)
+
+    def add_attendance(self, counts):
+        """
+        出席回数を1回の UPDATE でまとめて加算する
+
+        読み込み→書き込みを挟まないため、同時に押されても加算が失われない。
+
+        Args:
+            counts: 登録IDをキー、加算する回数を値とする辞書
+
+        Returns:
+            int: 更新した登録の数
+        """
+        targets = self.filter(pk__in=counts, attendance_count__lt=MAX_ATTENDANCE_COUNT)
+        keys = set(targets.values_list("user_id", "year").distinct())
+
+        delta = Case(
+            *[When(pk=pk, then=Value(count)) for pk, count in counts.items()],
+            default=Value(0),
+        )
+        updated = targets.update(
+            attendance_count=Least(
+                F("attendance_count") + delta, Value(MAX_ATTENDANCE_COUNT)
+            )
+        )
+
+        # update() ではシグナルが送られないため時間割のキャッシュを直接破棄する
+        invalidate_timetables(keys)
+        return updated
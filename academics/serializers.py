@@ -4,11 +4,13 @@ from academics.constants import TERM_CHOICES
 from accounts.models import Department
 from accounts.serializers import DepartmentSerializer, UserWithProfileSerializer
 from common.exceptions import ValidationError
+from common.serializers import SparseFieldsetMixin
 
 from .models import Lecture, Registration, Schedule, Syllabus, Term
+from .utils import find_schedule_conflicts
 
 
-class TermSerializer(serializers.ModelSerializer):
+class TermSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Term
         fields = ["number", "end_date"]
@@ -21,13 +23,13 @@ class TermSerializer(serializers.ModelSerializer):
         return value
 
 
-class ScheduleSerializer(serializers.ModelSerializer):
+class ScheduleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Schedule
         fields = ["id", "day", "time"]
 
 
-class SyllabusSerializer(serializers.ModelSerializer):
+class SyllabusSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     schedules = ScheduleSerializer(many=True, read_only=True)
     schedule_ids = serializers.PrimaryKeyRelatedField(
         many=True, queryset=Schedule.objects.all(), write_only=True, source="schedules"
@@ -70,7 +72,7 @@ class SyllabusSerializer(serializers.ModelSerializer):
         ]
 
 
-class LectureSerializer(serializers.ModelSerializer):
+class LectureSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     terms = TermSerializer(many=True, read_only=True)
 
     schedules = ScheduleSerializer(many=True, read_only=True)
@@ -130,12 +132,13 @@ class LectureSerializer(serializers.ModelSerializer):
         """
         data = super().to_representation(instance)
         if not instance.syllabus:
-            data["is_required"] = None
-            data["is_exam"] = None
+            for field_name in ("is_required", "is_exam"):
+                if field_name in data:
+                    data[field_name] = None
         return data
 
 
-class RegistrationSerializer(serializers.ModelSerializer):
+class RegistrationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     lecture = LectureSerializer(read_only=True)
     lecture_id = serializers.PrimaryKeyRelatedField(
         queryset=Lecture.objects.all(),
@@ -163,26 +166,22 @@ class RegistrationSerializer(serializers.ModelSerializer):
         if not user.is_authenticated:
             raise ValidationError("認証が必要です。")
 
-        # 取得する講義のタームとスケジュール
-        new_lecture_terms = lecture.terms.all()
-        new_lecture_schedules = lecture.schedules.all()
-
-        # 同じ年に既に登録している講義のタームとスケジュールを取得
-        overlapping_registrations = Registration.objects.filter(
-            user=user,
-            year=year,
-            lecture__terms__in=new_lecture_terms,
-            lecture__schedules__in=new_lecture_schedules,
-        ).distinct()
-
-        if overlapping_registrations.exists():
-            # 重複している講義の詳細を取得
-            overlapping_lectures = overlapping_registrations.values_list(
-                "lecture__name", flat=True
-            )
+        # 同じ年に既に登録している講義との時間割の重複を確認
+        overlapping_lectures = find_schedule_conflicts(user, year, [lecture]).get(
+            lecture.pk
+        )
+
+        if overlapping_lectures:
             overlapping_lectures_str = ", ".join(overlapping_lectures)
             raise ValidationError(
                 f"登録しようとしている講義の日程が（{overlapping_lectures_str}）と重複しています。"
             )
 
         return data
+
+
+class BulkAttendanceSerializer(serializers.Serializer):
+    # 同じ登録IDを複数回指定すると、その回数分の出席を記録する
+    registration_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=50
+    )
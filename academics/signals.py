@@ -1,7 +1,17 @@
-from django.db.models.signals import post_migrate
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_save,
+)
+from django.contrib.auth.models import User
+from django.db import transaction
 from django.dispatch import receiver
 
-from .models import Schedule, Term
+from .models import Lecture, Registration, Schedule, Term
+from .cache import invalidate_timetables
+from .utils import clear_current_term_cache, rebuild_timetable_occupancies
 
 
 @receiver(post_migrate)
@@ -18,3 +28,102 @@ def create_initial_data(sender, **kwargs):
                     day=i,
                     time=j,
                 )
+
+
+@receiver(pre_save, sender=Registration)
+def remember_registration_timetable(sender, instance, **kwargs):
+    """更新前の登録内容を保持し、時間割の再計算が必要か判定できるようにする"""
+    instance._previous_timetable = None
+    if instance.pk and kwargs.get("update_fields") is None:
+        instance._previous_timetable = (
+            Registration.objects.filter(pk=instance.pk)
+            .values_list("user_id", "lecture_id", "year")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Registration)
+def sync_timetable_on_registration_save(sender, instance, created, **kwargs):
+    current = (instance.user_id, instance.lecture_id, instance.year)
+    previous = getattr(instance, "_previous_timetable", None)
+    keys = {(instance.user_id, instance.year)}
+    if previous:
+        keys.add((previous[0], previous[2]))
+
+    # 出席回数の変更もグリッドに表示されるため、キャッシュは常に削除する
+    invalidate_timetables(keys)
+
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and not {"user", "lecture", "year"} & set(
+        update_fields
+    ):
+        return
+    if not created and previous == current:
+        return
+
+    rebuild_timetable_occupancies(keys)
+
+
+@receiver(post_delete, sender=Registration)
+def sync_timetable_on_registration_delete(sender, instance, origin=None, **kwargs):
+    # ユーザー削除に伴うカスケード削除では時間割も削除されるため再計算しない
+    if isinstance(origin, User) or getattr(origin, "model", None) is User:
+        return
+    keys = {(instance.user_id, instance.year)}
+    invalidate_timetables(keys)
+    rebuild_timetable_occupancies(keys)
+
+
+@receiver(m2m_changed, sender=Lecture.terms.through)
+@receiver(m2m_changed, sender=Lecture.schedules.through)
+def sync_timetable_on_lecture_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """講義のターム・スケジュールの変更を登録済みユーザーの時間割に反映する"""
+    if action == "pre_clear" and reverse:
+        # ターム・スケジュール側からの clear() では post_clear に講義IDが渡されない
+        # ため、削除前に対象の講義を控えておく
+        instance._cleared_lecture_ids = list(
+            instance.lectures.values_list("pk", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        lecture_ids = [instance.pk]
+    elif action == "post_clear":
+        lecture_ids = getattr(instance, "_cleared_lecture_ids", [])
+    else:
+        lecture_ids = pk_set
+    if not lecture_ids:
+        return
+
+    keys = set(
+        Registration.objects.filter(lecture_id__in=lecture_ids)
+        .values_list("user_id", "year")
+        .distinct()
+    )
+    invalidate_timetables(keys)
+    rebuild_timetable_occupancies(keys)
+
+
+@receiver(post_save, sender=Lecture)
+def invalidate_timetable_on_lecture_save(sender, instance, created, **kwargs):
+    """講義名や講義室の変更を登録済みユーザーの時間割グリッドに反映する"""
+    if created:
+        return
+    invalidate_timetables(
+        Registration.objects.filter(lecture=instance)
+        .values_list("user_id", "year")
+        .distinct()
+    )
+
+
+@receiver(post_save, sender=Term)
+@receiver(post_delete, sender=Term)
+def clear_current_term_cache_on_term_change(sender, **kwargs):
+    clear_current_term_cache()
+    # コミット前に他のプロセスが古いタームを共有キャッシュに入れ直すことがあるため、
+    # コミット後にもう一度破棄する
+    transaction.on_commit(clear_current_term_cache)
@@ -0,0 +1,120 @@
+import threading
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from academics.models import Lecture, Registration, Schedule, Term, TimetableOccupancy
+from academics.utils import get_slot_bit
+
+
+class TimetableOccupancyTest(TestCase):
+    """時間割の使用状況ビットマップのテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="password123"
+        )
+        self.lecture = Lecture.objects.create(name="講義", instructor="教員")
+        self.lecture.terms.set(Term.objects.filter(number__in=[1, 2]))
+        self.lecture.schedules.set(Schedule.objects.filter(id__in=[1, 7]))
+
+    def get_occupancy(self, year=2025):
+        return TimetableOccupancy.objects.get(user=self.user, year=year)
+
+    def test_registration_updates_occupancy(self):
+        """登録時にビットマップが更新されることを確認"""
+        Registration.objects.create(user=self.user, lecture=self.lecture, year=2025)
+
+        occupancy = self.get_occupancy()
+        expected = 0
+        for term_number in [1, 2]:
+            for schedule_id in [1, 7]:
+                expected |= get_slot_bit(term_number, schedule_id)
+        self.assertEqual(occupancy.mask, expected)
+        self.assertEqual(occupancy.term_mask(1), 0b1000001)
+        self.assertEqual(occupancy.term_mask(3), 0)
+        self.assertNotIn(7, occupancy.free_schedule_ids(2))
+        self.assertIn(7, occupancy.free_schedule_ids(3))
+
+    def test_lecture_change_updates_occupancy(self):
+        """講義のスケジュール変更が登録済みユーザーに反映されることを確認"""
+        Registration.objects.create(user=self.user, lecture=self.lecture, year=2025)
+
+        self.lecture.schedules.set(Schedule.objects.filter(id__in=[2]))
+        self.lecture.terms.remove(Term.objects.get(number=2))
+
+        self.assertEqual(self.get_occupancy().mask, get_slot_bit(1, 2))
+
+    def test_reverse_clear_updates_occupancy(self):
+        """ターム・スケジュール側からの clear() が登録済みユーザーに反映されることを確認"""
+        Registration.objects.create(user=self.user, lecture=self.lecture, year=2025)
+
+        Schedule.objects.get(id=7).lectures.clear()
+        self.assertEqual(
+            self.get_occupancy().mask, get_slot_bit(1, 1) | get_slot_bit(2, 1)
+        )
+
+        Term.objects.get(number=1).lectures.clear()
+        self.assertEqual(self.get_occupancy().mask, get_slot_bit(2, 1))
+
+    def test_registration_delete_clears_occupancy(self):
+        """登録削除時にビットマップが空になることを確認"""
+        registration = Registration.objects.create(
+            user=self.user, lecture=self.lecture, year=2025
+        )
+        registration.delete()
+
+        self.assertEqual(self.get_occupancy().mask, 0)
+
+    def test_user_delete(self):
+        """ユーザー削除時に時間割も削除されることを確認"""
+        Registration.objects.create(user=self.user, lecture=self.lecture, year=2025)
+        self.user.delete()
+
+        self.assertFalse(TimetableOccupancy.objects.exists())
+
+    def test_rebuild_command(self):
+        """コマンドで再構築できることを確認"""
+        Registration.objects.create(user=self.user, lecture=self.lecture, year=2025)
+        expected = self.get_occupancy().mask
+        TimetableOccupancy.objects.update(slots=bytes(TimetableOccupancy.SLOT_BYTES))
+
+        call_command("rebuild_timetable_occupancy", stdout=StringIO())
+
+        self.assertEqual(self.get_occupancy().mask, expected)
+
+
+class AttendanceConcurrencyTest(TransactionTestCase):
+    """出席回数の同時更新のテスト"""
+
+    def test_concurrent_increments(self):
+        """同時にインクリメントしても加算が失われないことを確認"""
+        user = User.objects.create_user(username="testuser", password="password123")
+        lecture = Lecture.objects.create(name="講義", instructor="教員")
+        registration = Registration.objects.create(
+            user=user, lecture=lecture, year=2025
+        )
+
+        thread_count = 10
+        barrier = threading.Barrier(thread_count)
+
+        def increment():
+            # 各スレッドは古いインスタンスを持った状態で同時に更新する
+            stale = Registration.objects.get(pk=registration.pk)
+            barrier.wait()
+            try:
+                stale.increment_attendance()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=increment) for _ in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        registration.refresh_from_db()
+        self.assertEqual(registration.attendance_count, thread_count)
@@ -0,0 +1,93 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from academics.models import (
+    Lecture,
+    Registration,
+    Schedule,
+    Term,
+    TimetableOccupancy,
+)
+from academics.serializers import RegistrationSerializer
+from academics.utils import find_schedule_conflicts
+from common.exceptions import ValidationError
+
+
+class RegistrationSerializerTest(TestCase):
+    """RegistrationSerializerのテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="password123"
+        )
+        request = APIRequestFactory().post("/")
+        request.user = self.user
+        self.context = {"request": request}
+
+        # 第1ターム 月曜1限・2限
+        self.registered = self.create_lecture("登録済み講義", [1], [1, 2])
+        Registration.objects.create(user=self.user, lecture=self.registered, year=2025)
+
+    def create_lecture(self, name, terms, schedules):
+        lecture = Lecture.objects.create(name=name, instructor="教員")
+        lecture.terms.set(Term.objects.filter(number__in=terms))
+        lecture.schedules.set(Schedule.objects.filter(id__in=schedules))
+        return lecture
+
+    def validate(self, lecture, year=2025):
+        serializer = RegistrationSerializer(
+            data={"lecture_id": lecture.pk, "year": year}, context=self.context
+        )
+        return serializer.is_valid(raise_exception=True)
+
+    def test_overlapping_registration(self):
+        """同じターム・時限の講義は登録できないことを確認"""
+        lecture = self.create_lecture("重複講義", [1, 2], [2])
+        with self.assertRaisesMessage(ValidationError, "登録済み講義"):
+            self.validate(lecture)
+
+    def test_non_overlapping_registration(self):
+        """ターム・時限・年度のいずれかが異なれば登録できることを確認"""
+        self.assertTrue(self.validate(self.create_lecture("別ターム", [2], [1])))
+        self.assertTrue(self.validate(self.create_lecture("別時限", [1], [3])))
+        self.assertTrue(self.validate(self.create_lecture("別年度", [1], [1]), 2026))
+
+    def test_validation_is_single_query(self):
+        """重複チェックが1クエリで行われることを確認"""
+        lecture = self.create_lecture("別時限", [1], [3])
+        serializer = RegistrationSerializer(
+            data={"lecture_id": lecture.pk, "year": 2025}, context=self.context
+        )
+        # 講義の取得 + ビットマップによる重複チェック
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid())
+
+    def test_conflicts_without_occupancy(self):
+        """時間割ビットマップがない場合も登録から重複を検出することを確認"""
+        TimetableOccupancy.objects.all().delete()
+        lecture = self.create_lecture("重複講義", [1], [2])
+
+        self.assertEqual(
+            find_schedule_conflicts(self.user, 2025, [lecture]),
+            {lecture.pk: ["登録済み講義"]},
+        )
+        self.assertEqual(
+            find_schedule_conflicts(
+                self.user, 2025, [self.create_lecture("別時限", [1], [3])]
+            ),
+            {},
+        )
+
+    def test_find_schedule_conflicts_batch(self):
+        """複数の候補を一度に検証できることを確認"""
+        first = self.create_lecture("候補1", [2], [1])
+        second = self.create_lecture("候補2", [2], [1, 3])
+        third = self.create_lecture("候補3", [1], [2])
+        fourth = self.create_lecture("候補4", [3], [5])
+
+        conflicts = find_schedule_conflicts(
+            self.user, 2025, [first, second, third, fourth]
+        )
+
+        self.assertEqual(conflicts, {second.pk: ["候補1"], third.pk: ["登録済み講義"]})
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from academics import utils
+from academics.models import Term
+from academics.utils import clear_current_term_cache, get_current_term_and_year
+
+# クエリ数を数えるテストでは DB を使わないキャッシュにする
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CurrentTermCacheTest(TestCase):
+    """現在のターム取得のキャッシュのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        clear_current_term_cache()
+        today = timezone.now().date()
+        self.term = Term.objects.get(number=2)
+        self.term.start_date = today - timedelta(days=10)
+        self.term.end_date = today + timedelta(days=10)
+        self.term.save()
+
+    def tearDown(self):
+        clear_current_term_cache()
+
+    def test_result_is_cached(self):
+        """2回目以降はクエリが発行されないことを確認"""
+        current_term, _ = get_current_term_and_year()
+        self.assertEqual(current_term.number, 2)
+
+        with self.assertNumQueries(0):
+            current_term, _ = get_current_term_and_year()
+        self.assertEqual(current_term.number, 2)
+
+    def test_shared_cache_is_used(self):
+        """プロセス内キャッシュがなくても共有キャッシュから取得できることを確認"""
+        get_current_term_and_year()
+        utils._current_term_cache.clear()
+        with self.assertNumQueries(0):
+            current_term, _ = get_current_term_and_year()
+        self.assertEqual(current_term.number, 2)
+
+    def test_cache_invalidated_on_term_save(self):
+        """ターム更新時にキャッシュが破棄されることを確認"""
+        get_current_term_and_year()
+
+        self.term.end_date = self.term.start_date
+        self.term.save()
+
+        self.assertEqual(get_current_term_and_year(), (None, None))
+
+    def test_cache_invalidated_for_every_date(self):
+        """ターム更新時に今日以外の日付のキャッシュも破棄されることを確認"""
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.assertEqual(get_current_term_and_year(tomorrow)[0].number, 2)
+
+        self.term.end_date = timezone.localdate()
+        self.term.save()
+        # 他のプロセスではプロセス内キャッシュの期限後に共有キャッシュを見る
+        utils._current_term_cache.clear()
+
+        self.assertEqual(get_current_term_and_year(tomorrow), (None, None))
@@ -0,0 +1,642 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from academics.models import (
+    Lecture,
+    Registration,
+    Schedule,
+    Syllabus,
+    Term,
+    TimetableOccupancy,
+)
+from academics import utils
+from academics.constants import CURRENT_TERM_LOCAL_CACHE_TIMEOUT
+from accounts.models import Department, Faculty
+
+# クエリ数を数えるテストでは DB を使わないキャッシュにする
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+class LectureListQueryCountTest(TestCase):
+    """講義一覧のクエリ数のテスト"""
+
+    def setUp(self):
+        self.faculty = Faculty.objects.create(name="情報科学部")
+        self.department = Department.objects.create(
+            name="情報工学科", faculty=self.faculty
+        )
+
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="password123"
+        )
+        self.user.profile.faculty = self.faculty
+        self.user.profile.department = self.department
+        self.user.profile.save()
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_lectures(self, count, start=0):
+        for i in range(start, start + count):
+            syllabus = Syllabus.objects.create(id=f"S{i:04d}", name=f"講義{i}")
+            syllabus.departments.add(self.department)
+            lecture = Lecture.objects.create(
+                syllabus=syllabus,
+                name=f"講義{i}",
+                instructor="教員",
+                owner=self.user,
+            )
+            lecture.terms.set(Term.objects.filter(number__in=[1, 2]))
+            lecture.schedules.set(Schedule.objects.filter(id__in=[1, 2]))
+            Registration.objects.create(user=self.user, lecture=lecture, year=2025)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_lecture_list_query_count_is_constant(self):
+        """講義数に関わらずクエリ数が一定であることを確認"""
+        url = reverse("lecture-list")
+
+        self.create_lectures(2)
+        few_queries, response = self.count_queries(url)
+        self.assertEqual(len(response.data), 2)
+
+        self.create_lectures(10, start=2)
+        many_queries, response = self.count_queries(url)
+        self.assertEqual(len(response.data), 12)
+
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(
+            response.data[0]["departments"][0]["faculty"]["name"], "情報科学部"
+        )
+
+    def test_registration_list_query_count_is_constant(self):
+        """登録数に関わらずクエリ数が一定であることを確認"""
+        url = reverse("registration-list")
+
+        self.create_lectures(2)
+        few_queries, _ = self.count_queries(url)
+
+        self.create_lectures(10, start=2)
+        many_queries, response = self.count_queries(url)
+        self.assertEqual(len(response.data), 12)
+
+        self.assertEqual(few_queries, many_queries)
+
+
+class LectureVisibilityTest(TestCase):
+    """講義の公開範囲のテスト"""
+
+    def setUp(self):
+        self.faculty = Faculty.objects.create(name="情報科学部")
+        self.department = Department.objects.create(
+            name="情報工学科", faculty=self.faculty
+        )
+        self.other_department = Department.objects.create(
+            name="知能工学科", faculty=self.faculty
+        )
+
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="password123"
+        )
+        self.user.profile.faculty = self.faculty
+        self.user.profile.department = self.department
+        self.user.profile.save()
+        self.other_user = User.objects.create_user(
+            username="otheruser", email="other@example.com", password="password123"
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_lecture(self, name, departments=None, **kwargs):
+        syllabus = None
+        if departments is not None:
+            syllabus = Syllabus.objects.create(id=name, name=name)
+            syllabus.departments.set(departments)
+        return Lecture.objects.create(
+            syllabus=syllabus, name=name, instructor="教員", **kwargs
+        )
+
+    def test_visible_lectures(self):
+        """閲覧可能な講義のみが重複なく返されることを確認"""
+        self.create_lecture("public_no_syllabus", owner=self.other_user)
+        self.create_lecture(
+            "public_same_department",
+            [self.department, self.other_department],
+            owner=self.other_user,
+        )
+        self.create_lecture(
+            "public_other_department", [self.other_department], owner=self.other_user
+        )
+        self.create_lecture("private_own", owner=self.user, is_public=False)
+        self.create_lecture("private_other", owner=self.other_user, is_public=False)
+        self.create_lecture(
+            "private_own_other_department",
+            [self.other_department],
+            owner=self.user,
+            is_public=False,
+        )
+
+        response = self.client.get(reverse("lecture-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(
+            [lecture["name"] for lecture in response.data],
+            ["public_no_syllabus", "public_same_department", "private_own"],
+        )
+
+    def test_visible_lectures_without_department(self):
+        """所属未設定のユーザーにはシラバスのない講義のみが返されることを確認"""
+        self.client.force_authenticate(user=self.other_user)
+        self.create_lecture("public_no_syllabus")
+        self.create_lecture("public_same_department", [self.department])
+
+        response = self.client.get(reverse("lecture-list"))
+        self.assertEqual(
+            [lecture["name"] for lecture in response.data], ["public_no_syllabus"]
+        )
+
+
+class LecturePaginationTest(TestCase):
+    """講義一覧のページネーションのテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        for i in range(5):
+            lecture = Lecture.objects.create(name=f"講義{i}", instructor="教員")
+            lecture.terms.set([Term.objects.get(number=1 if i % 2 == 0 else 2)])
+
+    def test_unpaginated_by_default(self):
+        """ページ指定がない場合は全件がリストで返されることを確認"""
+        response = self.client.get(reverse("lecture-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+    def test_cursor_pagination(self):
+        """カーソルで全件を重複なく辿れることを確認"""
+        names = []
+        url = reverse("lecture-list") + "?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            names += [lecture["name"] for lecture in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(names, [f"講義{i}" for i in range(5)])
+
+    def test_cursor_pagination_with_filter(self):
+        """フィルタと併用できることを確認"""
+        response = self.client.get(
+            reverse("lecture-list"), {"page_size": 2, "terms": 1}
+        )
+        self.assertEqual(
+            [lecture["name"] for lecture in response.data["results"]],
+            ["講義0", "講義2"],
+        )
+        self.assertIsNotNone(response.data["next"])
+
+    def test_filter_by_day_without_duplicates(self):
+        """同じ曜日に複数の時限がある講義が重複して返されないことを確認"""
+        lecture = Lecture.objects.get(name="講義0")
+        # 月曜1限と月曜2限
+        lecture.schedules.set(Schedule.objects.filter(id__in=[1, 2]))
+
+        response = self.client.get(reverse("lecture-list"), {"day": 1})
+        self.assertEqual([item["id"] for item in response.data], [lecture.id])
+
+        response = self.client.get(reverse("lecture-list"), {"day": 1, "time": 2})
+        self.assertEqual([item["id"] for item in response.data], [lecture.id])
+
+        response = self.client.get(reverse("lecture-list"), {"day": 1, "page_size": 10})
+        self.assertEqual(len(response.data["results"]), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TimetableViewTest(TestCase):
+    """時間割グリッドAPIのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        # 第1ターム 月曜2限・水曜3限
+        self.lecture = Lecture.objects.create(
+            name="講義", instructor="教員", room="A101"
+        )
+        self.lecture.terms.set(Term.objects.filter(number=1))
+        self.lecture.schedules.set(Schedule.objects.filter(id__in=[2, 13]))
+        self.registration = Registration.objects.create(
+            user=self.user, lecture=self.lecture, year=2025
+        )
+        self.url = reverse("timetable", kwargs={"year": 2025, "term": 1})
+
+    def test_timetable_grid(self):
+        """曜日×時限のグリッドが返されることを確認"""
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        grid = response.data["grid"]
+        self.assertEqual(len(grid), 7)
+        self.assertEqual(len(grid[0]), 5)
+        self.assertEqual(
+            grid[0][1],
+            {
+                "id": str(self.lecture.pk),
+                "registration_id": self.registration.pk,
+                "name": "講義",
+                "room": "A101",
+                "attendance_count": 0,
+            },
+        )
+        self.assertEqual(grid[2][2]["name"], "講義")
+        self.assertIsNone(grid[0][0])
+
+        other_term = self.client.get(reverse("timetable", args=[2025, 2]))
+        self.assertTrue(
+            all(cell is None for row in other_term.data["grid"] for cell in row)
+        )
+
+    def test_timetable_is_cached(self):
+        """2回目以降はキャッシュから返されることを確認"""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["grid"][0][1]["name"], "講義")
+
+    def test_cache_invalidation(self):
+        """登録・講義の変更でキャッシュが更新されることを確認"""
+        self.client.get(self.url)
+
+        self.registration.increment_attendance()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["grid"][0][1]["attendance_count"], 1)
+
+        self.lecture.room = "B202"
+        self.lecture.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["grid"][0][1]["room"], "B202")
+
+        self.lecture.schedules.set(Schedule.objects.filter(id=1))
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["grid"][0][0]["name"], "講義")
+        self.assertIsNone(response.data["grid"][0][1])
+
+        self.registration.delete()
+        response = self.client.get(self.url)
+        self.assertIsNone(response.data["grid"][0][0])
+
+    def test_invalid_term(self):
+        response = self.client.get(reverse("timetable", args=[2025, 5]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_free_schedules(self):
+        """登録していないスケジュールIDが返されることを確認"""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("timetable-free", args=[2025, 1]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(2, response.data["schedule_ids"])
+        self.assertNotIn(13, response.data["schedule_ids"])
+        self.assertIn(1, response.data["schedule_ids"])
+
+        response = self.client.get(reverse("timetable-free", args=[2025, 2]))
+        self.assertIn(2, response.data["schedule_ids"])
+
+    def test_free_schedules_without_occupancy(self):
+        """時間割ビットマップがない場合は構築して返すことを確認"""
+        TimetableOccupancy.objects.all().delete()
+        response = self.client.get(reverse("timetable-free", args=[2025, 1]))
+        self.assertNotIn(2, response.data["schedule_ids"])
+        self.assertTrue(TimetableOccupancy.objects.filter(user=self.user).exists())
+
+
+class CurrentTermViewTest(TestCase):
+    """現在のタームAPIのテスト"""
+
+    def setUp(self):
+        utils.clear_current_term_cache()
+        today = timezone.now().date()
+        term = Term.objects.get(number=1)
+        term.start_date = today - timedelta(days=10)
+        term.end_date = today + timedelta(days=10)
+        term.save()
+        self.client = APIClient()
+        self.url = reverse("now")
+
+    def tearDown(self):
+        utils.clear_current_term_cache()
+
+    def test_etag(self):
+        """ETag が一致する場合は 304 が返されることを確認"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["term"]["number"], 1)
+        self.assertIn("max-age", response["Cache-Control"])
+        etag = response["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_term_change_in_other_process(self):
+        """他のプロセスでのターム変更がプロセス内キャッシュの期限後に反映されることを確認"""
+        self.assertEqual(self.client.get(self.url).data["term"]["number"], 1)
+        # 変更を保存したプロセスとは別のプロセスのプロセス内キャッシュ
+        other_process_cache = dict(utils._current_term_cache)
+
+        today = timezone.now().date()
+        with self.captureOnCommitCallbacks(execute=True):
+            Term.objects.filter(number=1).update(end_date=today - timedelta(days=1))
+            term = Term.objects.get(number=2)
+            term.start_date = today
+            term.end_date = today + timedelta(days=10)
+            term.save()
+
+        utils._current_term_cache.update(other_process_cache)
+        self.assertEqual(self.client.get(self.url).data["term"]["number"], 1)
+
+        expired = time.monotonic() + CURRENT_TERM_LOCAL_CACHE_TIMEOUT + 1
+        with mock.patch("academics.utils.time.monotonic", return_value=expired):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["term"]["number"], 2)
+
+
+class AttendanceViewTest(TestCase):
+    """出席回数APIのテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        lecture = Lecture.objects.create(name="講義", instructor="教員")
+        self.registration = Registration.objects.create(
+            user=self.user, lecture=lecture, year=2025
+        )
+        other_lecture = Lecture.objects.create(name="別の講義", instructor="教員")
+        self.other_registration = Registration.objects.create(
+            user=self.user, lecture=other_lecture, year=2025
+        )
+
+    def test_increment_and_decrement(self):
+        """出席回数の増減と上限・下限を確認"""
+        url = reverse("registration-attendance", args=[self.registration.pk])
+
+        response = self.client.delete(url)
+        self.assertEqual(response.data["attendance_count"], 0)
+
+        Registration.objects.filter(pk=self.registration.pk).update(attendance_count=14)
+        self.assertEqual(self.client.post(url).data["attendance_count"], 15)
+        self.assertEqual(self.client.post(url).data["attendance_count"], 15)
+        self.assertEqual(self.client.delete(url).data["attendance_count"], 14)
+
+    def test_bulk_attendance(self):
+        """複数の出席をまとめて記録できることを確認"""
+        response = self.client.post(
+            reverse("registration-bulk-attendance"),
+            {
+                "registration_ids": [
+                    self.registration.pk,
+                    self.registration.pk,
+                    self.other_registration.pk,
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = {data["id"]: data["attendance_count"] for data in response.data}
+        self.assertEqual(
+            counts, {self.registration.pk: 2, self.other_registration.pk: 1}
+        )
+
+    def test_bulk_attendance_other_user(self):
+        """他人の登録を含む場合は更新されないことを確認"""
+        other_user = User.objects.create_user(username="other", password="password")
+        other_registration = Registration.objects.create(
+            user=other_user, lecture=self.registration.lecture, year=2025
+        )
+
+        response = self.client.post(
+            reverse("registration-bulk-attendance"),
+            {"registration_ids": [self.registration.pk, other_registration.pk]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.registration.refresh_from_db()
+        self.assertEqual(self.registration.attendance_count, 0)
+
+
+class SparseFieldsetTest(TestCase):
+    """?fields= と ?expand= のテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.lecture = Lecture.objects.create(
+            name="講義", instructor="教員", room="A101", owner=self.user
+        )
+        self.lecture.terms.set(Term.objects.filter(number__in=[1, 2]))
+        self.registration = Registration.objects.create(
+            user=self.user, lecture=self.lecture, year=2025
+        )
+
+    def test_default_shape(self):
+        """指定がない場合は従来通りの形で返されることを確認"""
+        response = self.client.get(reverse("registration-list"))
+        lecture = response.data[0]["lecture"]
+        self.assertEqual(lecture["terms"][0]["number"], 1)
+        self.assertIn("display_name", lecture["owner"])
+        self.assertIsNone(lecture["is_required"])
+
+    def test_fields(self):
+        """指定したフィールドのみが返されることを確認"""
+        response = self.client.get(
+            reverse("lecture-list"), {"fields": "id,name,room,is_exam"}
+        )
+        self.assertEqual(
+            response.data[0],
+            {
+                "id": str(self.lecture.pk),
+                "name": "講義",
+                "room": "A101",
+                "is_exam": None,
+            },
+        )
+
+    def test_nested_fields(self):
+        """ネストしたフィールドを指定できることを確認"""
+        response = self.client.get(
+            reverse("registration-list"),
+            {"fields": "id,attendance_count,lecture.name,lecture.terms"},
+        )
+        self.assertEqual(
+            response.data[0],
+            {
+                "id": self.registration.pk,
+                "attendance_count": 0,
+                "lecture": {
+                    "name": "講義",
+                    "terms": [
+                        {"number": 1, "end_date": None},
+                        {"number": 2, "end_date": None},
+                    ],
+                },
+            },
+        )
+
+    def test_nested_serializer_fields(self):
+        """所有者やタームなどネスト先のシリアライザでも絞り込めることを確認"""
+        response = self.client.get(
+            reverse("lecture-list"),
+            {"fields": "id,owner.display_name,terms.number,owner.department.name"},
+        )
+        self.assertEqual(
+            response.data[0],
+            {
+                "id": str(self.lecture.pk),
+                "owner": {"display_name": "", "department": None},
+                "terms": [{"number": 1}, {"number": 2}],
+            },
+        )
+
+        # 名前だけで指定したネスト先は、その下のネストも含めてすべて返す
+        response = self.client.get(
+            reverse("registration-list"), {"fields": "lecture.owner"}
+        )
+        owner = response.data[0]["lecture"]["owner"]
+        self.assertIn("display_name", owner)
+        self.assertIn("department", owner)
+
+    def test_expand(self):
+        """expand に含まれないネストは主キーで返されることを確認"""
+        response = self.client.get(
+            reverse("registration-list"), {"expand": "lecture.terms"}
+        )
+        lecture = response.data[0]["lecture"]
+        self.assertEqual(lecture["terms"][0]["number"], 1)
+        self.assertEqual(lecture["owner"], self.user.pk)
+        self.assertEqual(lecture["schedules"], [])
+
+        response = self.client.get(reverse("registration-list"), {"expand": ""})
+        self.assertEqual(response.data[0]["lecture"], str(self.lecture.pk))
+
+    def test_write_ignores_fields(self):
+        """書き込み時は fields の指定に関わらず更新されることを確認"""
+        url = reverse("lecture-detail", args=[self.lecture.pk])
+        response = self.client.patch(f"{url}?fields=id", {"room": "B202"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.lecture.refresh_from_db()
+        self.assertEqual(self.lecture.room, "B202")
+
+
+class LectureSearchTest(TestCase):
+    """講義のキーワード検索のテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="password123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        syllabus = Syllabus.objects.create(
+            id="S0001",
+            name="データベース",
+            description="relational database normalization and indexing",
+        )
+        self.database = Lecture.objects.create(
+            syllabus=syllabus, name="データベース", instructor="山田"
+        )
+        self.algorithm = Lecture.objects.create(
+            name="アルゴリズムとデータ構造", instructor="佐藤"
+        )
+        self.english = Lecture.objects.create(name="English", instructor="Smith")
+
+    def search(self, query, **params):
+        response = self.client.get(reverse("lecture-list"), {"q": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [lecture["name"] for lecture in response.data]
+
+    def test_search_name_and_instructor(self):
+        """講義名・担当教員の部分一致で検索できることを確認"""
+        self.assertCountEqual(
+            self.search("データ"), ["データベース", "アルゴリズムとデータ構造"]
+        )
+        self.assertEqual(self.search("山田"), ["データベース"])
+        self.assertEqual(self.search("english"), ["English"])
+
+    def test_search_syllabus(self):
+        """シラバスの本文で検索できることを確認"""
+        self.assertEqual(self.search("normalization"), ["データベース"])
+
+    def test_search_syllabus_japanese(self):
+        """空白で区切られていない日本語の文の途中の語で検索できることを確認"""
+        syllabus = self.database.syllabus
+        syllabus.purpose = "関係データベースの正規化と索引の設計を学ぶ。"
+        syllabus.save()
+        self.assertEqual(self.search("正規化"), ["データベース"])
+        self.assertEqual(self.search("索引の設計"), ["データベース"])
+
+    def test_search_reflects_syllabus_update(self):
+        """シラバスの更新が検索に反映されることを確認"""
+        syllabus = self.database.syllabus
+        syllabus.textbook = "textbook transactions"
+        syllabus.save()
+        self.assertEqual(self.search("transactions"), ["データベース"])
+
+    def test_search_paginated(self):
+        """ページングしても関連度順に並ぶことを確認"""
+        # 作成順では最後だが最も関連度が高い
+        Lecture.objects.create(name="データ", instructor="鈴木")
+        expected = self.search("データ")
+        self.assertEqual(expected[0], "データ")
+
+        names = []
+        response = self.client.get(
+            reverse("lecture-list"), {"q": "データ", "page_size": 1}
+        )
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names += [lecture["name"] for lecture in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(names, expected)
+
+    def test_search_with_filters(self):
+        """他のフィルタと併用できることを確認"""
+        self.assertEqual(
+            self.search("データ", instructor="佐藤"), ["アルゴリズムとデータ構造"]
+        )
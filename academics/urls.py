@@ -2,10 +2,13 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     AttendanceView,
+    BulkAttendanceView,
     LectureViewSet,
     RegistrationViewSet,
     ScheduleListView,
     CurrentTermView,
+    FreeScheduleView,
+    TimetableView,
 )
 
 router = DefaultRouter()
@@ -15,6 +18,17 @@ router.register(r"registrations", RegistrationViewSet, basename="registration")
 urlpatterns = [
     path("schedules/", ScheduleListView.as_view(), name="schedule"),
     path("now/", CurrentTermView.as_view(), name="now"),
+    path("timetable/<int:year>/<int:term>/", TimetableView.as_view(), name="timetable"),
+    path(
+        "timetable/<int:year>/<int:term>/free/",
+        FreeScheduleView.as_view(),
+        name="timetable-free",
+    ),
+    path(
+        "registrations/attendance/",
+        BulkAttendanceView.as_view(),
+        name="registration-bulk-attendance",
+    ),
     path(
         "registrations/<str:registration_id>/attendance/",
         AttendanceView.as_view(),
@@ -1,17 +1,71 @@
+import time
+from collections import defaultdict
+from django.core.cache import cache
 from django.utils import timezone
-from .models import Term
-from django.db.models import Q
+from academics.constants import (
+    CURRENT_TERM_CACHE_TIMEOUT,
+    CURRENT_TERM_LOCAL_CACHE_TIMEOUT,
+    DAY_CHOICES,
+    MAX_TIME,
+    SCHEDULES_PER_TERM,
+    TIMETABLE_CACHE_TIMEOUT,
+)
+from academics.cache import get_timetable_cache_key
+from .models import Lecture, Registration, Term, TimetableOccupancy
+from django.db.models import Q, Subquery
 
+# 日付をキーにした現在のタームのプロセス内キャッシュ
+# 他プロセスでのターム更新は CURRENT_TERM_LOCAL_CACHE_TIMEOUT 以内に反映される
+_current_term_cache = {}
 
-def get_current_term_and_year():
+# 共有キャッシュのキーに含めるバージョン。ターム更新時に変え、全日付のキャッシュを破棄する
+CURRENT_TERM_VERSION_KEY = "academics:current_term:version"
+
+
+def get_current_term_cache_key(today, version):
+    return f"academics:current_term:{version}:{today.isoformat()}"
+
+
+def clear_current_term_cache():
+    """現在のタームのキャッシュを削除する（ターム更新時に呼ばれる）"""
+    _current_term_cache.clear()
+    cache.set(CURRENT_TERM_VERSION_KEY, time.time_ns(), None)
+
+
+def get_current_term_and_year(today=None):
     """
     現在のタームと年度を取得する共通関数
 
+    結果は日付をキーにプロセス内と共有キャッシュの両方に保持し、
+    Term の保存・削除時に破棄される。
+
+    Args:
+        today: 基準にする日付（省略時は TIME_ZONE での今日）
+
     Returns:
         tuple: (現在のターム, 年度) のタプル、タームが見つからない場合は (None, None)
     """
-    today = timezone.now().date()
+    today = today or timezone.localdate()
+    now = time.monotonic()
+
+    local = _current_term_cache.get(today)
+    if local and local[0] > now:
+        return local[1]
+
+    version = cache.get_or_set(CURRENT_TERM_VERSION_KEY, time.time_ns, None)
+    key = get_current_term_cache_key(today, version)
+    result = cache.get(key)
+    if result is None:
+        result = _query_current_term_and_year(today)
+        cache.set(key, result, CURRENT_TERM_CACHE_TIMEOUT)
+
+    # 日付が変わったら古いエントリは不要
+    _current_term_cache.clear()
+    _current_term_cache[today] = (now + CURRENT_TERM_LOCAL_CACHE_TIMEOUT, result)
+    return result
 
+
+def _query_current_term_and_year(today):
     current_term = Term.objects.filter(
         Q(start_date__lte=today) & Q(end_date__gte=today)
     ).first()
@@ -28,3 +82,200 @@ def get_current_term_and_year():
         fiscal_year -= 1
 
     return current_term, fiscal_year
+
+
+def get_slot_bit(term_number, schedule_id):
+    """
+    ターム・スケジュールの組に対応するビットを返す
+
+    Schedule.id は (曜日-1)*MAX_TIME+時限 で1から始まる連番なので、
+    ターム毎に SCHEDULES_PER_TERM ビットずつ割り当てる。
+    """
+    return 1 << ((term_number - 1) * SCHEDULES_PER_TERM + schedule_id - 1)
+
+
+def find_schedule_conflicts(user, year, lectures):
+    """
+    登録候補の講義と既存の登録との時間割の重複を調べる
+
+    候補同士の重複も検出し、先に並んでいる候補を優先する。
+    ユーザーの時間割ビットマップ（TimetableOccupancy）がある場合は、候補の
+    スケジュールとビットマップを1クエリで読んでビット演算で判定し、重複が
+    あったときだけ重複相手の講義名を得るために既存の登録を読む。
+
+    Args:
+        user: 登録するユーザー
+        year: 登録する年度
+        lectures: 登録候補の講義のリスト
+
+    Returns:
+        dict: 重複がある講義IDをキー、重複相手の講義名のリストを値とする辞書
+    """
+    candidate_ids = [str(lecture.pk) for lecture in lectures]
+    if not candidate_ids:
+        return {}
+
+    occupied_slots = TimetableOccupancy.objects.filter(user=user, year=year).values(
+        "slots"
+    )[:1]
+    rows = (
+        Lecture.objects.filter(pk__in=candidate_ids)
+        .annotate(occupied_slots=Subquery(occupied_slots))
+        .values_list("id", "terms", "schedules", "occupied_slots")
+    )
+    masks = defaultdict(int)
+    occupied = None
+    for lecture_id, term_number, schedule_id, slots in rows:
+        if slots is not None:
+            occupied = TimetableOccupancy(slots=slots).mask
+        if term_number is None or schedule_id is None:
+            continue
+        masks[lecture_id] |= get_slot_bit(term_number, schedule_id)
+
+    if occupied is not None:
+        for lecture_id in candidate_ids:
+            if masks[lecture_id] & occupied:
+                break
+            occupied |= masks[lecture_id]
+        else:
+            return {}
+
+    # ビットマップがない（未構築の）場合や重複がある場合は登録を読んで調べる
+    return _query_schedule_conflicts(user, year, lectures)
+
+
+def _query_schedule_conflicts(user, year, lectures):
+    """既存の登録と候補の講義を読んで時間割の重複を調べる"""
+    candidate_ids = [str(lecture.pk) for lecture in lectures]
+    # 講義テーブル全体を走査しないよう、登録済みの講義IDを先に索引で取得する
+    registered_ids = set(
+        Registration.objects.filter(user=user, year=year).values_list(
+            "lecture_id", flat=True
+        )
+    )
+    rows = Lecture.objects.filter(
+        pk__in=registered_ids | set(candidate_ids)
+    ).values_list("id", "name", "terms", "schedules")
+
+    names = {}
+    masks = {}
+    for lecture_id, name, term_number, schedule_id in rows:
+        names[lecture_id] = name
+        if term_number is None or schedule_id is None:
+            continue
+        masks[lecture_id] = masks.get(lecture_id, 0) | get_slot_bit(
+            term_number, schedule_id
+        )
+
+    occupied = [(lecture_id, masks.get(lecture_id, 0)) for lecture_id in registered_ids]
+    conflicts = {}
+    for lecture, lecture_id in zip(lectures, candidate_ids):
+        mask = masks.get(lecture_id, 0)
+        overlapping = [
+            names[other_id] for other_id, other_mask in occupied if mask & other_mask
+        ]
+        if overlapping:
+            conflicts[lecture.pk] = overlapping
+        else:
+            occupied.append((lecture_id, mask))
+
+    return conflicts
+
+
+def rebuild_timetable_occupancies(keys):
+    """
+    指定した (ユーザー, 年度) の時間割ビットマップを再計算して保存する
+
+    Args:
+        keys: 再計算の対象となる (ユーザーID, 年度) の組の集合
+
+    Returns:
+        int: 更新した (ユーザー, 年度) の数
+    """
+    keys = set(keys)
+    if not keys:
+        return 0
+
+    masks = defaultdict(int)
+    rows = Registration.objects.filter(
+        user_id__in={user_id for user_id, _ in keys},
+        year__in={year for _, year in keys},
+    ).values_list("user_id", "year", "lecture__terms", "lecture__schedules")
+    for user_id, year, term_number, schedule_id in rows:
+        if term_number is None or schedule_id is None:
+            continue
+        masks[(user_id, year)] |= get_slot_bit(term_number, schedule_id)
+
+    occupancies = []
+    for user_id, year in keys:
+        occupancy = TimetableOccupancy(user_id=user_id, year=year)
+        occupancy.mask = masks[(user_id, year)]
+        occupancies.append(occupancy)
+
+    TimetableOccupancy.objects.bulk_create(
+        occupancies,
+        update_conflicts=True,
+        unique_fields=["user", "year"],
+        update_fields=["slots", "updated_at"],
+    )
+    return len(occupancies)
+
+
+def get_free_schedule_ids(user, year, term_number):
+    """
+    指定したターム・年度でユーザーが登録していないスケジュールIDのリストを返す
+
+    時間割ビットマップがまだない場合はその場で構築する。
+    """
+    occupancy = TimetableOccupancy.objects.filter(user=user, year=year).first()
+    if occupancy is None:
+        rebuild_timetable_occupancies({(user.pk, year)})
+        occupancy = TimetableOccupancy.objects.get(user=user, year=year)
+    return occupancy.free_schedule_ids(term_number)
+
+
+def build_timetable(user, year, term_number):
+    """
+    指定したターム・年度の時間割グリッドを1クエリで組み立てる
+
+    Returns:
+        list: grid[曜日-1][時限-1] に講義の情報（空きコマは None）を持つ二次元リスト
+    """
+    grid = [[None] * MAX_TIME for _ in DAY_CHOICES]
+    rows = (
+        Registration.objects.filter(
+            user=user, year=year, lecture__terms__number=term_number
+        )
+        .order_by("registered_at")
+        .values_list(
+            "id",
+            "attendance_count",
+            "lecture_id",
+            "lecture__name",
+            "lecture__room",
+            "lecture__schedules",
+        )
+    )
+    for registration_id, attendance_count, lecture_id, name, room, schedule_id in rows:
+        if schedule_id is None:
+            continue
+        day, time = divmod(schedule_id - 1, MAX_TIME)
+        if grid[day][time] is None:
+            grid[day][time] = {
+                "id": lecture_id,
+                "registration_id": registration_id,
+                "name": name,
+                "room": room,
+                "attendance_count": attendance_count,
+            }
+    return grid
+
+
+def get_cached_timetable(user, year, term_number):
+    """キャッシュ済みの時間割グリッドを返す。なければ組み立ててキャッシュする"""
+    key = get_timetable_cache_key(user.pk, year, term_number)
+    grid = cache.get(key)
+    if grid is None:
+        grid = build_timetable(user, year, term_number)
+        cache.set(key, grid, TIMETABLE_CACHE_TIMEOUT)
+    return grid
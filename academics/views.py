@@ -1,20 +1,32 @@
+import hashlib
+import json
+from collections import Counter
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import generics
 import logging
 from academics.filters import RegistrationFilter, LectureFilter
-from .utils import get_current_term_and_year
+from .constants import CURRENT_TERM_MAX_AGE, TERM_CHOICES
+from .utils import (
+    get_cached_timetable,
+    get_current_term_and_year,
+    get_free_schedule_ids,
+)
 from .models import Lecture, Registration, Schedule
 from rest_framework import viewsets, permissions
 from .serializers import (
+    BulkAttendanceSerializer,
     LectureSerializer,
     RegistrationSerializer,
     ScheduleSerializer,
 )
-from django.db.models import Q
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
+from rest_framework.pagination import CursorPagination
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
@@ -32,28 +44,44 @@ class IsOwnerOrPublicEditable(permissions.BasePermission):
         return False
 
 
+class LecturePagination(CursorPagination):
+    """
+    講義一覧のカーソルページネーション
+
+    cursor または page_size が指定された場合のみページングし、
+    指定がない場合は従来通り全件を返す。キーワード検索（q）の場合は
+    関連度順のままページングする。
+    """
+
+    page_size = settings.APP_SETTINGS["DEFAULT_PAGE_SIZE"]
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = ("created_at", "id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (
+            self.cursor_query_param not in request.query_params
+            and self.page_size_query_param not in request.query_params
+        ):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get("q"):
+            # LectureQuerySet.search() の並び順（関連度順）
+            return tuple(queryset.query.order_by)
+        return super().get_ordering(request, queryset, view)
+
+
 class LectureViewSet(viewsets.ModelViewSet):
     serializer_class = LectureSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LecturePagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = LectureFilter
 
     def get_queryset(self):
-        user = self.request.user
-
-        # 基本クエリ: 自分が所有者か、公開されている講義
-        base_query = Q(owner=user) | Q(is_public=True)
-
-        # ユーザーの所属学科に関連する講義
-        dept_faculty_query = (
-            Q(syllabus__isnull=False)
-            & Q(syllabus__departments=user.profile.department)
-            & Q(syllabus__departments__faculty=user.profile.faculty)
-        ) | Q(
-            syllabus__isnull=True
-        )  # シラバスがない講義はすべて表示
-
-        return Lecture.objects.filter(base_query & dept_faculty_query).distinct()
+        return Lecture.objects.visible_to(self.request.user).for_listing()
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -73,7 +101,7 @@ class RegistrationViewSet(viewsets.ModelViewSet):
     filterset_class = RegistrationFilter
 
     def get_queryset(self):
-        return Registration.objects.filter(user=self.request.user)
+        return Registration.objects.filter(user=self.request.user).for_listing()
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -105,7 +133,56 @@ class CurrentTermView(APIView):
             },
         }
 
-        return Response(response_data)
+        # 内容が変わらない限りクライアントは 304 で済むようにする
+        etag = quote_etag(
+            hashlib.md5(json.dumps(response_data, sort_keys=True).encode()).hexdigest()
+        )
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(response_data)
+
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, max_age=CURRENT_TERM_MAX_AGE)
+        return response
+
+
+class TimetableView(APIView):
+    """
+    指定した年度・タームの時間割グリッドを返すAPI
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, year, term):
+        if term not in dict(TERM_CHOICES):
+            return Response(
+                {"error": "タームは1から4の間でなければなりません。"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        grid = get_cached_timetable(request.user, year, term)
+
+        return Response({"year": year, "term": term, "grid": grid})
+
+
+class FreeScheduleView(APIView):
+    """
+    指定した年度・タームで登録していない（空いている）スケジュールIDを返すAPI
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, year, term):
+        if term not in dict(TERM_CHOICES):
+            return Response(
+                {"error": "タームは1から4の間でなければなりません。"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        schedule_ids = get_free_schedule_ids(request.user, year, term)
+
+        return Response({"year": year, "term": term, "schedule_ids": schedule_ids})
 
 
 class AttendanceView(APIView):
@@ -121,7 +198,7 @@ class AttendanceView(APIView):
         """
         # 自分の登録情報のみ更新可能
         registration = get_object_or_404(
-            Registration, id=registration_id, user=request.user
+            Registration.objects.for_listing(), id=registration_id, user=request.user
         )
 
         # 出席回数をインクリメント
@@ -136,7 +213,7 @@ class AttendanceView(APIView):
         """
         # 自分の登録情報のみ更新可能
         registration = get_object_or_404(
-            Registration, id=registration_id, user=request.user
+            Registration.objects.for_listing(), id=registration_id, user=request.user
         )
 
         # 出席回数をデクリメント
@@ -144,3 +221,32 @@ class AttendanceView(APIView):
 
         serializer = RegistrationSerializer(registration)
         return Response(serializer.data)
+
+
+class BulkAttendanceView(APIView):
+    """
+    複数の出席をまとめて記録するAPI
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """
+        指定した登録の出席回数をまとめてインクリメントする
+        """
+        serializer = BulkAttendanceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        counts = Counter(serializer.validated_data["registration_ids"])
+
+        # 自分の登録情報のみ更新可能
+        registrations = Registration.objects.filter(user=request.user, pk__in=counts)
+        if registrations.count() != len(counts):
+            return Response(
+                {"error": "登録情報が見つかりません。"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        registrations.add_attendance(counts)
+
+        serializer = RegistrationSerializer(registrations.for_listing(), many=True)
+        return Response(serializer.data)
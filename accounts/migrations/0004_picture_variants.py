@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_alter_userprofile_picture"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="picture_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -44,6 +44,8 @@ class UserProfile(models.Model):
         choices=GRADE_CHOICES, null=True, blank=True
     )
     picture = models.URLField(null=True, blank=True)
+    # picture から生成した縮小・再圧縮済みの派生画像（common.images が生成する）
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_profile_complete = models.BooleanField(default=False)
 
     def __str__(self):
@@ -1,17 +1,18 @@
 from rest_framework import serializers
 from .models import Faculty, Department
 from common.exceptions import BusinessLogicError, ValidationError
+from common.serializers import SparseFieldsetMixin, SrcsetField
 from .models import UserProfile
 from django.contrib.auth.models import User
 
 
-class FacultySerializer(serializers.ModelSerializer):
+class FacultySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Faculty
         fields = ["id", "name"]
 
 
-class DepartmentSerializer(serializers.ModelSerializer):
+class DepartmentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     faculty = FacultySerializer(read_only=True)
 
     class Meta:
@@ -37,6 +38,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         allow_null=True,
     )
     email = serializers.EmailField(source="user.email", read_only=True)
+    picture_srcset = SrcsetField("picture", "picture_variants")
 
     class Meta:
         model = UserProfile
@@ -51,6 +53,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
             "department_id",
             "grade",
             "picture",
+            "picture_srcset",
             "is_profile_complete",
         ]
         read_only_fields = ["is_profile_complete"]
@@ -93,7 +96,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return instance
 
 
-class UserWithProfileSerializer(serializers.ModelSerializer):
+class UserWithProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 
     # プロフィール情報をネストして表示
     profile_id = serializers.CharField(source="profile.profile_id", read_only=True)
@@ -103,6 +106,7 @@ class UserWithProfileSerializer(serializers.ModelSerializer):
     department = DepartmentSerializer(source="profile.department", read_only=True)
     grade = serializers.IntegerField(source="profile.grade", read_only=True)
     picture = serializers.CharField(source="profile.picture", read_only=True)
+    picture_srcset = SrcsetField("profile.picture", "profile.picture_variants")
     is_profile_complete = serializers.BooleanField(
         source="profile.is_profile_complete", read_only=True
     )
@@ -117,5 +121,6 @@ class UserWithProfileSerializer(serializers.ModelSerializer):
             "department",
             "grade",
             "picture",
+            "picture_srcset",
             "is_profile_complete",
         ]
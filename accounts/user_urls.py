@@ -1,4 +1,5 @@
 from django.urls import path
+from common.views import ConfirmUploadView, PresignedUploadView
 from .views import (
     DepartmentListView,
     FacultyListView,
@@ -15,4 +16,10 @@ urlpatterns = [
     path("faculties/", FacultyListView.as_view(), name="faculty-list"),
     path("departments/", DepartmentListView.as_view(), name="department-list"),
     path("upload/", UploadImageView.as_view(), name="upload-image"),
+    path(
+        "upload/presign/",
+        PresignedUploadView.as_view(upload_prefix="profile"),
+        name="upload-image-presign",
+    ),
+    path("upload/confirm/", ConfirmUploadView.as_view(), name="upload-image-confirm"),
 ]
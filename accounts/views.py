@@ -17,6 +17,7 @@ from .serializers import (
 from rest_framework.permissions import AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.core.files.storage import default_storage
+from common.uploads import get_upload_content_type, validate_upload_size
 from rest_framework.views import APIView
 from rest_framework import status
 
@@ -52,6 +53,10 @@ class UploadImageView(APIView):
         if not file_obj:
             return Response({"error": "No file uploaded."}, status=400)
 
+        # 従来のアップロードでもサイズと拡張子の制限を守らせる
+        get_upload_content_type(file_obj.name)
+        validate_upload_size(file_obj.size)
+
         ext = file_obj.name.split(".")[-1]
         filename = f"{uuid.uuid4()}.{ext}"
         saved_path = default_storage.save(f"profile/{filename}", file_obj)
@@ -0,0 +1,5 @@
+# 記事一覧に表示する抜粋の文字数
+EXCERPT_LENGTH = 120
+
+# 読了時間の計算に使う1分あたりに読める文字数
+READING_CHARS_PER_MINUTE = 500
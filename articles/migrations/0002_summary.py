@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0001_initial"),
+    ]
+
+    # 既存の記事の要約は 0003 で本文の HTML と一緒に埋める
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="cover_image",
+            field=models.CharField(
+                blank=True, editable=False, max_length=500, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="excerpt",
+            field=models.TextField(blank=True, default="", editable=False),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="reading_time",
+            field=models.PositiveSmallIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0003_rendered_content"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["-created_at", "-id"],
+                name="article_public_feed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="article",
+            index=models.Index(
+                fields=["author", "-created_at", "-id"], name="article_author_feed_idx"
+            ),
+        ),
+    ]
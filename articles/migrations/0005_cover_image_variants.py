@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0004_feed_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="cover_image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
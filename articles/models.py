@@ -2,6 +2,13 @@ import uuid
 import shortuuid
 from django.db import models
 from django.contrib.auth.models import User
+from .querysets import ArticleQuerySet
+from .tiptap import build_summary, compute_content_hash, render_html
+
+# 本文から作る一覧表示用のフィールド
+SUMMARY_FIELDS = ("excerpt", "reading_time", "cover_image")
+# 本文の JSON から生成するフィールド
+RENDERED_FIELDS = ("content_html", "content_hash", *SUMMARY_FIELDS)
 
 
 def generate_short_uuid():
@@ -26,14 +33,62 @@ class Article(models.Model):
     )
     title = models.CharField(max_length=64)
     content_json = models.JSONField()  # TiptapエディタのJSON本文を格納
-    content_html = models.TextField(null=True)
+    content_html = models.TextField(null=True)  # content_json からサーバーで生成
+    # 生成元の content_json のハッシュ（変わっていなければ生成し直さない）
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # 一覧表示用に本文から作る要約（保存時に更新する）
+    excerpt = models.TextField(blank=True, default="", editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=1, editable=False)  # 分
+    cover_image = models.CharField(
+        max_length=500, null=True, blank=True, editable=False
+    )
+    # cover_image から生成した派生画像（common.images が生成する）
+    cover_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_public = models.BooleanField(default=False)  # 公開
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ArticleQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "記事"
         unique_together = ['author', 'slug']  # 著者ごとにslugをユニークに
+        indexes = [
+            # 公開記事のフィードを新しい順に辿るため
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="article_public_feed_idx",
+                condition=models.Q(is_public=True),
+            ),
+            # 著者毎の記事（自分の下書きを含む）を新しい順に辿るため
+            models.Index(
+                fields=["author", "-created_at", "-id"],
+                name="article_author_feed_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "content_json" in update_fields:
+            if self.render_content() and update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *RENDERED_FIELDS}
+        super().save(*args, **kwargs)
+
+    def render_content(self):
+        """
+        本文の JSON から HTML と要約を生成する
+
+        Returns:
+            bool: 本文が変わっていて生成し直したかどうか
+        """
+        content_hash = compute_content_hash(self.content_json)
+        if content_hash == self.content_hash and self.content_html is not None:
+            return False
+        self.content_html = render_html(self.content_json)
+        self.content_hash = content_hash
+        for name, value in build_summary(self.content_json).items():
+            setattr(self, name, value)
+        return True
@@ -0,0 +1,42 @@
+from django.db import models
+
+
+class ArticleQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """公開記事と自分の記事"""
+        return self.filter(models.Q(is_public=True) | models.Q(author=user))
+
+    def feed_branches(self, user):
+        """
+        visible_to(user) を重複のない2つのクエリセットに分けたもの
+
+        OR の条件では1つのインデックスで辿れないため、公開記事と自分の非公開記事を
+        別々のインデックスで辿り、UNION ALL で結合する。
+        """
+        return [
+            self.filter(is_public=True),
+            self.filter(author=user, is_public=False),
+        ]
+
+    def for_listing(self):
+        """
+        一覧表示用に、本文を除いた列のみを著者のプロフィールと合わせて取得する
+
+        本文（content_json, content_html）は大きく TOAST に置かれるため読み込まない。
+        """
+        return self.select_related("author__profile").only(
+            "id",
+            "slug",
+            "title",
+            "excerpt",
+            "reading_time",
+            "cover_image",
+            "cover_image_variants",
+            "is_public",
+            "created_at",
+            "updated_at",
+            "author__profile__profile_id",
+            "author__profile__display_name",
+            "author__profile__picture",
+            "author__profile__picture_variants",
+        )
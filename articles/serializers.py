@@ -1,10 +1,13 @@
+from django.contrib.auth.models import User
 from rest_framework import serializers
 from accounts.serializers import UserWithProfileSerializer
+from common.serializers import SrcsetField
 from .models import Article
 
 
 class ArticleSerializer(serializers.ModelSerializer):
     author = UserWithProfileSerializer(read_only=True)
+    cover_image_srcset = SrcsetField("cover_image", "cover_image_variants")
 
     class Meta:
         model = Article
@@ -14,9 +17,71 @@ class ArticleSerializer(serializers.ModelSerializer):
             "title",
             "content_json",
             "content_html",
+            "excerpt",
+            "reading_time",
+            "cover_image",
+            "cover_image_srcset",
             "author",
             "is_public",
             "created_at",
             "updated_at",
         )
-        read_only_fields = ("id", "author", "created_at", "updated_at")
+        read_only_fields = (
+            "id",
+            "author",
+            "content_html",
+            "excerpt",
+            "reading_time",
+            "cover_image",
+            "created_at",
+            "updated_at",
+        )
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # 編集用の JSON は著者にのみ返し、読者には生成済みの HTML のみを返す
+        request = self.context.get("request")
+        if request is None or request.user.pk != instance.author_id:
+            data.pop("content_json", None)
+        return data
+
+
+class ArticleAuthorSerializer(serializers.ModelSerializer):
+    """記事一覧に表示する著者の情報"""
+
+    profile_id = serializers.CharField(source="profile.profile_id", read_only=True)
+    display_name = serializers.CharField(source="profile.display_name", read_only=True)
+    picture = serializers.CharField(source="profile.picture", read_only=True)
+    picture_srcset = SrcsetField("profile.picture", "profile.picture_variants")
+
+    class Meta:
+        model = User
+        fields = ["profile_id", "display_name", "picture", "picture_srcset"]
+
+
+class ArticleListSerializer(serializers.ModelSerializer):
+    """
+    記事一覧のシリアライザ
+
+    本文（content_json, content_html）の代わりに保存時に作った要約を返す。
+    """
+
+    author = ArticleAuthorSerializer(read_only=True)
+    cover_image_srcset = SrcsetField("cover_image", "cover_image_variants")
+
+    class Meta:
+        model = Article
+        fields = (
+            "id",
+            "slug",
+            "title",
+            "excerpt",
+            "reading_time",
+            "cover_image",
+            "cover_image_srcset",
+            "author",
+            "is_public",
+            "created_at",
+            "updated_at",
+        )
+        read_only_fields = fields
@@ -0,0 +1,193 @@
+import io
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import UserProfile
+from articles.models import Article
+from common.images import (
+    generate_image_variants,
+    get_srcset,
+    get_variant_key,
+    process_image_variants,
+    render_variants,
+)
+
+
+def make_image(size, image_format="PNG", mode="RGB"):
+    output = io.BytesIO()
+    image = Image.new(mode, size, "red")
+    if image_format == "JPEG":
+        exif = Image.Exif()
+        exif[0x010F] = "Camera"  # Make
+        image.save(output, image_format, exif=exif)
+    else:
+        image.save(output, image_format)
+    return output.getvalue()
+
+
+class RenderVariantsTest(TestCase):
+    """派生画像の生成のテスト"""
+
+    def test_widths_and_formats(self):
+        """元の画像より小さい幅のみ、WebP と JPEG で生成されることを確認"""
+        variants = render_variants(make_image((1000, 500)), (480, 960, 1600))
+
+        self.assertEqual(
+            [(width, image_format) for width, image_format, _ in variants],
+            [(480, "webp"), (480, "jpeg"), (960, "webp"), (960, "jpeg")],
+        )
+        with Image.open(io.BytesIO(variants[0][2])) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (480, 240)))
+
+    def test_small_image(self):
+        """最小の幅より小さい画像は元の幅で生成されることを確認"""
+        variants = render_variants(make_image((40, 40)), (64, 128))
+        self.assertEqual({width for width, _, _ in variants}, {40})
+
+    def test_strip_metadata_and_alpha(self):
+        """メタデータを除き、透過画像も JPEG にできることを確認"""
+        for data in [
+            make_image((200, 100), "JPEG"),
+            make_image((200, 100), "PNG", mode="RGBA"),
+        ]:
+            variants = render_variants(data, (64,))
+            for _, _, content in variants:
+                with Image.open(io.BytesIO(content)) as image:
+                    self.assertFalse(image.getexif())
+
+    def test_variant_key(self):
+        self.assertEqual(
+            get_variant_key("profile/abc.png", 64, "jpeg"), "profile/abc_w64.jpg"
+        )
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE="django.core.files.storage.InMemoryStorage",
+    MEDIA_URL="https://cdn.example.com/",
+)
+class ProcessImageVariantsTest(TestCase):
+    """派生画像を生成するワーカーのテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, key, size):
+        default_storage.save(key, ContentFile(make_image(size)))
+        return default_storage.url(key)
+
+    def test_profile_picture(self):
+        """プロフィール画像の派生画像が生成され、srcset で返されることを確認"""
+        url = self.upload("profile/abc.png", (300, 300))
+        UserProfile.objects.filter(user=self.user).update(picture=url)
+
+        self.assertIsNone(
+            self.client.get("/api/v1/users/me/profile/").data["picture_srcset"]
+        )
+        self.assertEqual(process_image_variants(), 1)
+        # 生成済みの画像は処理し直さない
+        self.assertEqual(process_image_variants(), 0)
+
+        self.assertTrue(default_storage.exists("profile/abc_w64.webp"))
+        self.assertTrue(default_storage.exists("profile/abc_w256.jpg"))
+        srcset = self.client.get("/api/v1/users/me/profile/").data["picture_srcset"]
+        self.assertEqual(
+            srcset["webp"],
+            "https://cdn.example.com/profile/abc_w64.webp 64w, "
+            "https://cdn.example.com/profile/abc_w128.webp 128w, "
+            "https://cdn.example.com/profile/abc_w256.webp 256w",
+        )
+        self.assertIn("abc_w64.jpg 64w", srcset["jpeg"])
+
+    def test_picture_changed(self):
+        """画像が変わると古い派生画像は返さず、生成し直すことを確認"""
+        profile = self.user.profile
+        profile.picture = self.upload("profile/old.png", (300, 300))
+        profile.save()
+        process_image_variants()
+
+        profile.refresh_from_db()
+        profile.picture = self.upload("profile/new.png", (300, 300))
+        profile.save()
+        self.assertIsNone(get_srcset(profile.picture_variants, profile.picture))
+
+        self.assertEqual(process_image_variants(), 1)
+        profile.refresh_from_db()
+        self.assertIn(
+            "new_w64.webp",
+            get_srcset(profile.picture_variants, profile.picture)["webp"],
+        )
+
+    def test_regenerate_variants(self):
+        """生成し直すと同じキーの派生画像が置き換わり、その URL を返すことを確認"""
+        url = self.upload("profile/regenerate/abc.png", (300, 300))
+        default_storage.save("profile/regenerate/abc_w64.webp", ContentFile(b"old"))
+
+        variants = generate_image_variants(url, "profile")
+        self.assertEqual(
+            variants["webp"]["64"],
+            "https://cdn.example.com/profile/regenerate/abc_w64.webp",
+        )
+        with default_storage.open("profile/regenerate/abc_w64.webp", "rb") as file:
+            self.assertNotEqual(file.read(), b"old")
+        self.assertEqual(generate_image_variants(url, "profile"), variants)
+        # 別名のファイルが残らない（元の画像と 3 幅 x 2 形式）
+        self.assertEqual(len(default_storage.listdir("profile/regenerate")[1]), 7)
+
+    def test_external_and_broken_images(self):
+        """ストレージ外の画像や壊れた画像は元の画像のみを使うことを確認"""
+        self.user.profile.picture = "https://lh3.googleusercontent.com/a/photo"
+        self.user.profile.save()
+        default_storage.save("articles/broken.png", ContentFile(b"not an image"))
+        Article.objects.create(
+            author=self.user,
+            title="記事",
+            content_json={
+                "type": "doc",
+                "content": [
+                    {
+                        "type": "image",
+                        "attrs": {"src": default_storage.url("articles/broken.png")},
+                    }
+                ],
+            },
+        )
+
+        with self.assertLogs("common.images", "ERROR"):
+            self.assertEqual(process_image_variants(), 2)
+        self.assertEqual(process_image_variants(), 0)
+        self.user.profile.refresh_from_db()
+        self.assertEqual(
+            self.user.profile.picture_variants,
+            {"source": "https://lh3.googleusercontent.com/a/photo"},
+        )
+
+    def test_article_cover_image(self):
+        """記事一覧でカバー画像の srcset が返されることを確認"""
+        url = self.upload("articles/cover.png", (2000, 1000))
+        Article.objects.create(
+            author=self.user,
+            title="記事",
+            content_json={
+                "type": "doc",
+                "content": [{"type": "image", "attrs": {"src": url}}],
+            },
+            is_public=True,
+        )
+        process_image_variants()
+
+        article = self.client.get(reverse("article-list")).data["results"][0]
+        self.assertEqual(article["cover_image"], url)
+        self.assertEqual(
+            article["cover_image_srcset"]["jpeg"],
+            "https://cdn.example.com/articles/cover_w480.jpg 480w, "
+            "https://cdn.example.com/articles/cover_w960.jpg 960w, "
+            "https://cdn.example.com/articles/cover_w1600.jpg 1600w",
+        )
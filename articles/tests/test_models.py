@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from articles.models import Article
+
+
+class ArticleSummaryTest(TestCase):
+    """記事の要約のテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice")
+
+    def test_summary_from_content(self):
+        """保存時に本文から抜粋・読了時間・カバー画像が作られることを確認"""
+        content = {
+            "type": "doc",
+            "content": [
+                {"type": "heading", "content": [{"type": "text", "text": "見出し"}]},
+                {
+                    "type": "paragraph",
+                    "content": [
+                        {"type": "text", "text": "一段落目"},
+                        {"type": "hardBreak"},
+                        {"type": "text", "text": "改行後", "marks": [{"type": "bold"}]},
+                    ],
+                },
+                {"type": "image", "attrs": {"src": "data:image/png;base64,AAAA"}},
+                {"type": "image", "attrs": {"src": "https://example.com/a.png"}},
+                {
+                    "type": "paragraph",
+                    "content": [{"type": "text", "text": "あ" * 1000}],
+                },
+            ],
+        }
+        article = Article.objects.create(
+            author=self.user, title="記事", content_json=content
+        )
+
+        self.assertTrue(article.excerpt.startswith("見出し 一段落目 改行後 あ"))
+        self.assertEqual(len(article.excerpt), 121)
+        self.assertEqual(article.reading_time, 3)
+        self.assertEqual(article.cover_image, "https://example.com/a.png")
+
+    def test_summary_updated_with_update_fields(self):
+        """update_fields で本文を保存した場合も要約が更新されることを確認"""
+        article = Article.objects.create(
+            author=self.user, title="記事", content_json={"type": "doc"}
+        )
+        self.assertEqual(article.excerpt, "")
+
+        article.content_json = {
+            "type": "doc",
+            "content": [
+                {"type": "paragraph", "content": [{"type": "text", "text": "本文"}]}
+            ],
+        }
+        article.save(update_fields=["content_json"])
+
+        article.refresh_from_db()
+        self.assertEqual(article.excerpt, "本文")
+
+
+class ArticleRenderTest(TestCase):
+    """本文の HTML の生成のテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice")
+        self.content = {
+            "type": "doc",
+            "content": [
+                {"type": "paragraph", "content": [{"type": "text", "text": "本文"}]}
+            ],
+        }
+
+    def test_render_on_save(self):
+        """保存時に本文の HTML が生成されることを確認"""
+        article = Article.objects.create(
+            author=self.user,
+            title="記事",
+            content_json=self.content,
+            content_html="<script>alert(1)</script>",
+        )
+
+        article.refresh_from_db()
+        self.assertEqual(article.content_html, "<p>本文</p>")
+        self.assertEqual(len(article.content_hash), 64)
+
+    def test_skip_unchanged_content(self):
+        """本文が変わっていなければ生成し直さないことを確認"""
+        article = Article.objects.create(
+            author=self.user, title="記事", content_json=self.content
+        )
+
+        with mock.patch("articles.models.render_html") as render_html:
+            article.title = "タイトル変更"
+            article.save()
+            article.content_json = dict(reversed(list(self.content.items())))
+            article.save()
+            render_html.assert_not_called()
+
+            article.content_json = {"type": "doc", "content": []}
+            render_html.return_value = ""
+            article.save()
+            render_html.assert_called_once()
@@ -0,0 +1,132 @@
+from django.test import SimpleTestCase
+
+from articles.tiptap import compute_content_hash, is_safe_url, render_html
+
+
+def doc(*content):
+    return {"type": "doc", "content": list(content)}
+
+
+def paragraph(*content):
+    return {"type": "paragraph", "content": list(content)}
+
+
+def text(value, *marks):
+    node = {"type": "text", "text": value}
+    if marks:
+        node["marks"] = list(marks)
+    return node
+
+
+class RenderHtmlTest(SimpleTestCase):
+    """Tiptap の JSON から HTML への変換のテスト"""
+
+    def test_nodes(self):
+        """対応するノードが HTML に変換されることを確認"""
+        content = doc(
+            {"type": "heading", "attrs": {"level": 2}, "content": [text("見出し")]},
+            paragraph(text("一行目"), {"type": "hardBreak"}, text("二行目")),
+            {
+                "type": "bulletList",
+                "content": [{"type": "listItem", "content": [paragraph(text("項目"))]}],
+            },
+            {
+                "type": "orderedList",
+                "attrs": {"start": 3},
+                "content": [{"type": "listItem", "content": [paragraph(text("三"))]}],
+            },
+            {"type": "blockquote", "content": [paragraph(text("引用"))]},
+            {
+                "type": "codeBlock",
+                "attrs": {"language": "python"},
+                "content": [text("print('<hi>')")],
+            },
+            {"type": "horizontalRule"},
+            {"type": "image", "attrs": {"src": "/media/a.png", "alt": "画像"}},
+        )
+
+        self.assertEqual(
+            render_html(content),
+            "<h2>見出し</h2>"
+            "<p>一行目<br>二行目</p>"
+            "<ul><li><p>項目</p></li></ul>"
+            '<ol start="3"><li><p>三</p></li></ol>'
+            "<blockquote><p>引用</p></blockquote>"
+            '<pre><code class="language-python">'
+            "print(&#x27;&lt;hi&gt;&#x27;)</code></pre>"
+            "<hr>"
+            '<img src="/media/a.png" alt="画像">',
+        )
+
+    def test_marks(self):
+        """マークが入れ子のタグに変換されることを確認"""
+        content = doc(
+            paragraph(
+                text("太字斜体", {"type": "bold"}, {"type": "italic"}),
+                text(
+                    "リンク",
+                    {"type": "link", "attrs": {"href": "https://example.com/?a=1&b=2"}},
+                ),
+            )
+        )
+
+        self.assertEqual(
+            render_html(content),
+            "<p><strong><em>太字斜体</em></strong>"
+            '<a href="https://example.com/?a=1&amp;b=2" '
+            'rel="noopener noreferrer nofollow">リンク</a></p>',
+        )
+
+    def test_sanitize(self):
+        """JSON に HTML や危険な URL が含まれていても無害化されることを確認"""
+        content = doc(
+            paragraph(text("<script>alert(1)</script>")),
+            paragraph(
+                text(
+                    "リンク", {"type": "link", "attrs": {"href": "javascript:alert(1)"}}
+                )
+            ),
+            {"type": "image", "attrs": {"src": "java\tscript:alert(1)"}},
+            {"type": "image", "attrs": {"src": '/a.png" onerror="alert(1)'}},
+            {"type": "heading", "attrs": {"level": "1 onclick=x"}, "content": []},
+            {
+                "type": "codeBlock",
+                "attrs": {"language": '" onmouseover="x'},
+                "content": [],
+            },
+            {"type": "iframe", "content": [text("中身")]},
+        )
+
+        html = render_html(content)
+
+        self.assertNotIn("<script", html)
+        self.assertNotIn("javascript", html)
+        self.assertNotIn('" onerror="', html)
+        self.assertNotIn("onclick", html)
+        self.assertNotIn("onmouseover", html)
+        self.assertNotIn("iframe", html)
+        self.assertIn("&lt;script&gt;", html)
+        self.assertIn("<p>リンク</p>", html)
+        self.assertIn("中身", html)
+
+    def test_is_safe_url(self):
+        for url in ["https://example.com", "/media/a.png", "mailto:a@example.com"]:
+            self.assertTrue(is_safe_url(url), url)
+        for url in [
+            "javascript:alert(1)",
+            "JAVASCRIPT:x",
+            "data:text/html,x",
+            "",
+            None,
+        ]:
+            self.assertFalse(is_safe_url(url), url)
+
+    def test_content_hash(self):
+        """キーの順序に依らず、内容が変われば変わることを確認"""
+        self.assertEqual(
+            compute_content_hash({"a": 1, "b": [1, 2]}),
+            compute_content_hash({"b": [1, 2], "a": 1}),
+        )
+        self.assertNotEqual(
+            compute_content_hash({"a": 1}), compute_content_hash({"a": 2})
+        )
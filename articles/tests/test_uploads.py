@@ -0,0 +1,245 @@
+import base64
+import io
+import json
+from datetime import timedelta
+
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from common.uploads import delete_expired_uploads
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 8
+WEBP = b"RIFF\x24\x00\x00\x00WEBPVP8 "
+
+APP_SETTINGS = {
+    **settings.APP_SETTINGS,
+    "MAX_UPLOAD_SIZE": 1024,
+    "ALLOWED_FILE_EXTENSIONS": ["jpg", "jpeg", "png", "webp"],
+}
+
+
+@override_settings(APP_SETTINGS=APP_SETTINGS)
+class PresignedUploadTest(TestCase):
+    """ストレージへの直接アップロードのテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.storage_client = default_storage.connection.meta.client
+        self.bucket = default_storage.bucket_name
+
+    def presign(self, filename="photo.PNG", size=100, url_name="upload_image_presign"):
+        return self.client.post(
+            reverse(url_name), {"filename": filename, "size": size}, format="json"
+        )
+
+    def confirm(self, upload_id):
+        return self.client.post(
+            reverse("upload_image_confirm"), {"upload_id": upload_id}, format="json"
+        )
+
+    def stub_uploaded(
+        self, stubber, key, body=PNG, size=None, content_type="image/png", read=True
+    ):
+        """
+        検証前のファイルの確認への応答を登録する
+
+        read が真の場合はファイルの先頭の取得への応答も登録する
+        """
+        pending_key = f"pending/{key}"
+        stubber.add_response(
+            "head_object",
+            {"ContentLength": size or len(body), "ContentType": content_type},
+            {"Bucket": self.bucket, "Key": pending_key},
+        )
+        if read:
+            stubber.add_response(
+                "get_object",
+                {"Body": StreamingBody(io.BytesIO(body), len(body))},
+                {"Bucket": self.bucket, "Key": pending_key, "Range": "bytes=0-15"},
+            )
+
+    def stub_published(self, stubber, key, content_type="image/png"):
+        stubber.add_response(
+            "copy_object",
+            {},
+            {
+                "Bucket": self.bucket,
+                "Key": key,
+                "CopySource": {"Bucket": self.bucket, "Key": f"pending/{key}"},
+                "ContentType": content_type,
+                "MetadataDirective": "REPLACE",
+                "ACL": settings.AWS_DEFAULT_ACL,
+            },
+        )
+
+    def stub_deleted(self, stubber, key):
+        stubber.add_response(
+            "delete_object", {}, {"Bucket": self.bucket, "Key": f"pending/{key}"}
+        )
+
+    def get_key(self, presigned):
+        """検証後に公開されるキー"""
+        return presigned["fields"]["key"].removeprefix("pending/")
+
+    def test_presign(self):
+        """サイズの上限と Content-Type を含む署名付きの POST が返されることを確認"""
+        response = self.presign()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        fields = response.data["fields"]
+        # 検証するまでは非公開のプレフィックスに置く
+        self.assertRegex(fields["key"], r"^pending/articles/[0-9a-f-]{36}\.png$")
+        self.assertEqual(fields["Content-Type"], "image/png")
+        self.assertEqual(fields["acl"], "private")
+        policy = json.loads(base64.b64decode(fields["policy"]))
+        self.assertIn(["content-length-range", 1, 1024], policy["conditions"])
+        self.assertIn({"Content-Type": "image/png"}, policy["conditions"])
+        self.assertIn({"acl": "private"}, policy["conditions"])
+        self.assertIn("upload_id", response.data)
+
+    def test_profile_prefix(self):
+        """プロフィール画像は profile/ 以下にアップロードされることを確認"""
+        response = self.presign(url_name="upload-image-presign")
+        self.assertTrue(response.data["fields"]["key"].startswith("pending/profile/"))
+
+    def test_presign_rejects_invalid_file(self):
+        """許可されていない拡張子や大きすぎるファイルは拒否されることを確認"""
+        self.assertEqual(
+            self.presign(filename="script.svg").status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            self.presign(size=1025).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.presign(size="abc").status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_confirm(self):
+        """アップロードされたファイルを確認して公開し、公開 URL を返すことを確認"""
+        presigned = self.presign().data
+        key = self.get_key(presigned)
+
+        with Stubber(self.storage_client) as stubber:
+            self.stub_uploaded(stubber, key)
+            self.stub_published(stubber, key)
+            self.stub_deleted(stubber, key)
+            response = self.confirm(presigned["upload_id"])
+            stubber.assert_no_pending_responses()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["url"], default_storage.url(key))
+
+    def test_confirm_webp(self):
+        """WebP もファイルの先頭のバイト列を確認して公開することを確認"""
+        presigned = self.presign(filename="photo.webp").data
+        key = self.get_key(presigned)
+
+        with Stubber(self.storage_client) as stubber:
+            self.stub_uploaded(stubber, key, body=WEBP, content_type="image/webp")
+            self.stub_published(stubber, key, content_type="image/webp")
+            self.stub_deleted(stubber, key)
+            response = self.confirm(presigned["upload_id"])
+            stubber.assert_no_pending_responses()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_confirm_rejects_invalid_file(self):
+        """中身が画像でないファイルは削除して拒否されることを確認"""
+        presigned = self.presign().data
+        key = self.get_key(presigned)
+
+        with Stubber(self.storage_client) as stubber:
+            self.stub_uploaded(stubber, key, body=b"<svg onload=alert(1)>")
+            self.stub_deleted(stubber, key)
+            response = self.confirm(presigned["upload_id"])
+            stubber.assert_no_pending_responses()
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_confirm_rejects_other_content_type(self):
+        """署名と異なる Content-Type のファイルは削除して拒否されることを確認"""
+        presigned = self.presign().data
+        key = self.get_key(presigned)
+
+        with Stubber(self.storage_client) as stubber:
+            self.stub_uploaded(stubber, key, content_type="text/html", read=False)
+            self.stub_deleted(stubber, key)
+            response = self.confirm(presigned["upload_id"])
+            stubber.assert_no_pending_responses()
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_confirm_not_uploaded(self):
+        """アップロードされていない場合は拒否されることを確認"""
+        presigned = self.presign().data
+
+        with Stubber(self.storage_client) as stubber:
+            stubber.add_client_error("head_object", http_status_code=404)
+            response = self.confirm(presigned["upload_id"])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_expired_uploads(self):
+        """確認されないまま期限を過ぎた検証前のファイルが削除されることを確認"""
+        now = timezone.now()
+        with Stubber(self.storage_client) as stubber:
+            stubber.add_response(
+                "list_objects_v2",
+                {
+                    "Contents": [
+                        {
+                            "Key": "pending/articles/old.png",
+                            "LastModified": now - timedelta(hours=2),
+                        },
+                        {"Key": "pending/articles/new.png", "LastModified": now},
+                    ],
+                    "IsTruncated": False,
+                },
+                {"Bucket": self.bucket, "Prefix": "pending/"},
+            )
+            stubber.add_response(
+                "delete_objects",
+                {},
+                {
+                    "Bucket": self.bucket,
+                    "Delete": {
+                        "Objects": [{"Key": "pending/articles/old.png"}],
+                        "Quiet": True,
+                    },
+                },
+            )
+            self.assertEqual(delete_expired_uploads(now=now), 1)
+            stubber.assert_no_pending_responses()
+
+    def test_confirm_other_user(self):
+        """他のユーザーの upload_id や改ざんした upload_id は拒否されることを確認"""
+        upload_id = self.presign().data["upload_id"]
+
+        self.client.force_authenticate(User.objects.create_user(username="bob"))
+        self.assertEqual(
+            self.confirm(upload_id).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.confirm(upload_id + "x").status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_multipart_upload_limits(self):
+        """従来のアップロードでもサイズと拡張子が制限されることを確認"""
+        for name, size in [("large.png", 2048), ("page.html", 10)]:
+            file_obj = io.BytesIO(b"x" * size)
+            file_obj.name = name
+            response = self.client.post(
+                reverse("upload_image"), {"file": file_obj}, format="multipart"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
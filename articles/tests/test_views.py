@@ -0,0 +1,281 @@
+import base64
+import json
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from articles.models import Article
+
+
+def make_content(*paragraphs, image=None):
+    content = [
+        {"type": "paragraph", "content": [{"type": "text", "text": text}]}
+        for text in paragraphs
+    ]
+    if image:
+        content.insert(1, {"type": "image", "attrs": {"src": image}})
+    return {"type": "doc", "content": content}
+
+
+class ArticleListTest(TestCase):
+    """記事一覧のテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice")
+        self.user.profile.display_name = "アリス"
+        self.user.profile.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_articles(self, count, author=None):
+        author = author or self.user
+        for i in range(count):
+            Article.objects.create(
+                author=author,
+                title=f"記事{i}",
+                content_json=make_content("本文" * 100, image="/media/cover.png"),
+                is_public=True,
+            )
+
+    def test_list_returns_summary(self):
+        """一覧では本文の代わりに要約と著者の情報を返すことを確認"""
+        self.create_articles(1)
+
+        response = self.client.get(reverse("article-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        article = response.data["results"][0]
+        self.assertNotIn("content_json", article)
+        self.assertNotIn("content_html", article)
+        self.assertEqual(article["excerpt"], "本文" * 60 + "…")
+        self.assertEqual(article["reading_time"], 1)
+        self.assertEqual(article["cover_image"], "/media/cover.png")
+        self.assertEqual(article["author"]["display_name"], "アリス")
+        self.assertEqual(article["author"]["profile_id"], self.user.profile.profile_id)
+
+    def test_list_does_not_load_content(self):
+        """一覧のクエリが本文の列を読み込まず、件数に依らないことを確認"""
+        other = User.objects.create_user(username="bob")
+        self.create_articles(3)
+        self.create_articles(3, author=other)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("article-list"))
+
+        self.assertEqual(len(response.data["results"]), 6)
+        # 1ページ分の ID の取得、本体の取得、件数の取得のみ
+        self.assertEqual(len(queries), 3)
+        for query in queries:
+            self.assertNotIn("content_json", query["sql"])
+            self.assertNotIn("content_html", query["sql"])
+
+    def test_user_article_list(self):
+        """ユーザー毎の記事一覧も要約を返すことを確認"""
+        self.create_articles(2)
+
+        response = self.client.get(
+            reverse(
+                "user-article-list",
+                kwargs={"profile_id": self.user.profile.profile_id},
+            )
+        )
+
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertNotIn("content_json", response.data["results"][0])
+
+    def test_retrieve_returns_content(self):
+        """詳細では本文を返すことを確認"""
+        self.create_articles(1)
+        article = Article.objects.get()
+
+        response = self.client.get(reverse("article-detail", kwargs={"id": article.id}))
+
+        self.assertEqual(response.data["content_html"], article.content_html)
+        self.assertTrue(response.data["content_html"].startswith("<p>本文"))
+        self.assertEqual(response.data["content_json"], article.content_json)
+
+
+class ArticleDetailTest(TestCase):
+    """記事の詳細のテスト"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="alice")
+        self.reader = User.objects.create_user(username="bob")
+        self.article = Article.objects.create(
+            author=self.author,
+            title="記事",
+            content_json=make_content("本文"),
+            is_public=True,
+        )
+        self.url = reverse("article-detail", kwargs={"id": self.article.id})
+        self.client = APIClient()
+
+    def test_content_json_only_for_author(self):
+        """編集用の JSON は著者にのみ返すことを確認"""
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(self.url)
+        self.assertNotIn("content_json", response.data)
+        self.assertEqual(response.data["content_html"], "<p>本文</p>")
+
+        self.client.force_authenticate(user=self.author)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["content_json"], self.article.content_json)
+
+    def test_content_html_generated_on_create(self):
+        """クライアントが送った HTML は使わずに生成することを確認"""
+        self.client.force_authenticate(user=self.author)
+        response = self.client.post(
+            reverse("article-list"),
+            {
+                "title": "新しい記事",
+                "content_json": make_content("安全な本文"),
+                "content_html": "<img src=x onerror=alert(1)>",
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["content_html"], "<p>安全な本文</p>")
+
+    def test_etag(self):
+        """内容が変わらなければ 304 を返し、変われば ETag が変わることを確認"""
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertIn("private", response["Cache-Control"])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # 著者には JSON を含めて返すので別の ETag になる
+        self.client.force_authenticate(user=self.author)
+        self.assertNotEqual(self.client.get(self.url)["ETag"], etag)
+
+        self.article.content_json = make_content("更新した本文")
+        self.article.save()
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class ArticleFeedTest(TestCase):
+    """記事一覧のキーセットページネーションのテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice")
+        self.other = User.objects.create_user(username="bob")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        now = timezone.now()
+        self.expected = []
+        for i in range(9):
+            author = self.user if i % 3 == 0 else self.other
+            is_public = i % 2 == 0
+            article = Article.objects.create(
+                author=author,
+                title=f"記事{i}",
+                content_json=make_content("本文"),
+                is_public=is_public,
+            )
+            # 同じ時刻の記事も ID で順序が決まる
+            created_at = now - timedelta(minutes=i // 2)
+            Article.objects.filter(pk=article.pk).update(created_at=created_at)
+            if is_public or author == self.user:
+                self.expected.append((created_at, article.id, article.title))
+        self.expected = [title for *_, title in sorted(self.expected, reverse=True)]
+
+    def walk(self, url):
+        titles = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            titles += [article["title"] for article in response.data["results"]]
+            url = response.data["next"]
+        return titles, response
+
+    def test_feed(self):
+        """公開記事と自分の非公開記事を新しい順に重複なく辿れることを確認"""
+        titles, response = self.walk(reverse("article-list") + "?size=2")
+
+        self.assertEqual(titles, self.expected)
+        self.assertEqual(response.data["count"], len(self.expected))
+        self.assertIsNone(response.data["previous"])
+
+    def test_feed_uses_union(self):
+        """公開記事と自分の記事を UNION ALL で結合して取得することを確認"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("article-list"), {"size": 2})
+
+        self.assertIn("UNION ALL", queries[0]["sql"])
+        self.assertNotIn(" OR ", queries[0]["sql"])
+
+    def test_skip_count(self):
+        """count=false の場合は全件数を数えないことを確認"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("article-list"), {"size": 2, "count": "false"}
+            )
+
+        self.assertIsNone(response.data["count"])
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any("COUNT(" in query["sql"] for query in queries))
+
+    def test_page_number(self):
+        """page を指定した場合は従来通りページ番号でページングすることを確認"""
+        response = self.client.get(reverse("article-list"), {"size": 2, "page": 2})
+
+        self.assertEqual(response.data["count"], len(self.expected))
+        self.assertEqual(
+            [article["title"] for article in response.data["results"]],
+            self.expected[2:4],
+        )
+        self.assertIn("page=3", response.data["next"])
+
+    def test_user_feed(self):
+        """ユーザー毎の記事一覧も新しい順に辿れることを確認"""
+        titles, _ = self.walk(
+            reverse(
+                "user-article-list",
+                kwargs={"profile_id": self.other.profile.profile_id},
+            )
+            + "?size=2"
+        )
+
+        expected = [
+            title
+            for title in self.expected
+            if Article.objects.get(title=title).author == self.other
+        ]
+        self.assertEqual(titles, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("article-list"), {"cursor": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_malformed_cursor(self):
+        """形の正しくないカーソルでも 404 が返されることを確認"""
+        for position in [
+            ["2024-01-01T00:00:00", 2],
+            {"created_at": "2024-01-01T00:00:00"},
+            ["2024-01-01T00:00:00"],
+            "2024-01-01T00:00:00",
+            ["2024-01-01T00:00:00", "not-a-uuid"],
+            ["yesterday", str(uuid.uuid4())],
+        ]:
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            response = self.client.get(reverse("article-list"), {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        cursor = base64.urlsafe_b64encode(b"\xff\xfe").decode()
+        response = self.client.get(reverse("article-list"), {"cursor": cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
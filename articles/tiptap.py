@@ -0,0 +1,226 @@
+import hashlib
+import json
+import math
+import re
+from html import escape
+from urllib.parse import urlsplit
+
+from .constants import EXCERPT_LENGTH, READING_CHARS_PER_MINUTE
+
+# 前後の文章とつなげずに改行で区切るノード
+BLOCK_NODE_TYPES = {
+    "paragraph",
+    "heading",
+    "blockquote",
+    "codeBlock",
+    "listItem",
+    "hardBreak",
+    "horizontalRule",
+}
+
+
+def iter_nodes(node):
+    """ノードとその子孫を文書順に返す"""
+    if not isinstance(node, dict):
+        return
+    yield node
+    for child in node.get("content") or []:
+        yield from iter_nodes(child)
+
+
+def extract_text(content_json):
+    """本文のテキストのみを取り出す（ブロック毎に改行で区切る）"""
+    parts = []
+    for node in iter_nodes(content_json):
+        if node.get("type") == "text":
+            parts.append(node.get("text") or "")
+        elif node.get("type") in BLOCK_NODE_TYPES and parts and parts[-1] != "\n":
+            parts.append("\n")
+    return "".join(parts).strip()
+
+
+def find_first_image(content_json):
+    """本文中の最初の画像の URL（なければ None）"""
+    for node in iter_nodes(content_json):
+        if node.get("type") == "image":
+            src = (node.get("attrs") or {}).get("src")
+            # 埋め込みの data URI は一覧に載せるには大きすぎるため使わない
+            if src and not src.startswith("data:") and len(src) <= 500:
+                return src
+    return None
+
+
+def build_summary(content_json):
+    """
+    記事一覧に表示する要約を本文から作る
+
+    Returns:
+        dict: 抜粋（excerpt）、読了時間の分数（reading_time）、
+            カバー画像の URL（cover_image）
+    """
+    text = extract_text(content_json)
+    flat = " ".join(text.split())
+    excerpt = flat[:EXCERPT_LENGTH]
+    if len(flat) > EXCERPT_LENGTH:
+        excerpt = excerpt.rstrip() + "…"
+    return {
+        "excerpt": excerpt,
+        "reading_time": max(1, math.ceil(len(flat) / READING_CHARS_PER_MINUTE)),
+        "cover_image": find_first_image(content_json),
+    }
+
+
+# HTML に変換するノード（ここにないノードは中身のみを出力する）
+NODE_TAGS = {
+    "paragraph": "p",
+    "bulletList": "ul",
+    "orderedList": "ol",
+    "listItem": "li",
+    "blockquote": "blockquote",
+    "horizontalRule": "hr",
+    "hardBreak": "br",
+}
+VOID_TAGS = {"hr", "br", "img"}
+
+# HTML に変換するマーク（ここにないマークは無視する）
+MARK_TAGS = {
+    "bold": "strong",
+    "italic": "em",
+    "strike": "s",
+    "underline": "u",
+    "code": "code",
+    "highlight": "mark",
+    "subscript": "sub",
+    "superscript": "sup",
+    "link": "a",
+}
+
+SAFE_URL_SCHEMES = {"", "http", "https", "mailto"}
+LANGUAGE_PATTERN = re.compile(r"^[\w+#-]{1,32}$")
+
+
+def compute_content_hash(content_json):
+    """本文の JSON の内容から決まるハッシュ（キーの順序や空白に依らない）"""
+    canonical = json.dumps(
+        content_json, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def is_safe_url(url):
+    """リンクや画像に使ってよい URL かどうか（javascript: などを除く）"""
+    if not isinstance(url, str) or not url:
+        return False
+    if any(ord(char) <= 0x20 or ord(char) == 0x7F for char in url):
+        return False
+    try:
+        return urlsplit(url).scheme.lower() in SAFE_URL_SCHEMES
+    except ValueError:
+        return False
+
+
+def _start_tag(tag, attrs=None):
+    rendered = "".join(
+        f' {name}="{escape(str(value))}"'
+        for name, value in (attrs or {}).items()
+        if value is not None
+    )
+    return f"<{tag}{rendered}>"
+
+
+def _render_mark(mark):
+    """マークの開始タグと終了タグ"""
+    mark_type = mark.get("type") if isinstance(mark, dict) else None
+    tag = MARK_TAGS.get(mark_type)
+    if tag is None:
+        return "", ""
+    attrs = None
+    if tag == "a":
+        href = (mark.get("attrs") or {}).get("href")
+        if not is_safe_url(href):
+            return "", ""
+        attrs = {"href": href, "rel": "noopener noreferrer nofollow"}
+        if (mark.get("attrs") or {}).get("target") == "_blank":
+            attrs["target"] = "_blank"
+    return _start_tag(tag, attrs), f"</{tag}>"
+
+
+def _render_node(node, out):
+    if not isinstance(node, dict):
+        return
+    node_type = node.get("type")
+    attrs = node.get("attrs") or {}
+
+    if node_type == "text":
+        text = escape(str(node.get("text") or ""))
+        closes = []
+        for mark in node.get("marks") or []:
+            start, end = _render_mark(mark)
+            out.append(start)
+            closes.append(end)
+        out.append(text)
+        out.extend(reversed(closes))
+        return
+
+    if node_type == "image":
+        if is_safe_url(attrs.get("src")):
+            out.append(
+                _start_tag(
+                    "img",
+                    {
+                        "src": attrs["src"],
+                        "alt": attrs.get("alt") or "",
+                        "title": attrs.get("title"),
+                    },
+                )
+            )
+        return
+
+    if node_type == "heading":
+        level = attrs.get("level")
+        tag = f"h{level}" if level in (1, 2, 3, 4, 5, 6) else "h2"
+        tag_attrs = None
+    elif node_type == "orderedList":
+        tag = "ol"
+        start = attrs.get("start")
+        tag_attrs = {"start": start} if isinstance(start, int) and start != 1 else None
+    elif node_type == "codeBlock":
+        language = attrs.get("language")
+        code_attrs = None
+        if isinstance(language, str) and LANGUAGE_PATTERN.match(language):
+            code_attrs = {"class": f"language-{language}"}
+        out.append("<pre>" + _start_tag("code", code_attrs))
+        _render_children(node, out)
+        out.append("</code></pre>")
+        return
+    else:
+        tag = NODE_TAGS.get(node_type)
+        tag_attrs = None
+
+    if tag is None:
+        # 未対応のノードはタグを出さずに中身のみを出力する
+        _render_children(node, out)
+        return
+
+    out.append(_start_tag(tag, tag_attrs))
+    if tag in VOID_TAGS:
+        return
+    _render_children(node, out)
+    out.append(f"</{tag}>")
+
+
+def _render_children(node, out):
+    for child in node.get("content") or []:
+        _render_node(child, out)
+
+
+def render_html(content_json):
+    """
+    本文の JSON を HTML に変換する
+
+    許可したノードとマーク、属性のみを出力し、テキストと属性値はエスケープするので、
+    JSON の内容に依らず安全な HTML になる。
+    """
+    out = []
+    _render_node(content_json, out)
+    return "".join(out)
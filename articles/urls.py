@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from common.views import ConfirmUploadView, PresignedUploadView
 from .views import ArticleViewSet, UploadImageView, UserArticleViewSet
 
 router = DefaultRouter()
@@ -11,5 +12,11 @@ user_router.register(r"", UserArticleViewSet, basename="user-article")
 urlpatterns = [
     path("", include(router.urls)),
     path("upload/", UploadImageView.as_view(), name="upload_image"),
+    path(
+        "upload/presign/",
+        PresignedUploadView.as_view(upload_prefix="articles"),
+        name="upload_image_presign",
+    ),
+    path("upload/confirm/", ConfirmUploadView.as_view(), name="upload_image_confirm"),
     path("by-user/<str:profile_id>/", include(user_router.urls)),
 ]
@@ -1,16 +1,25 @@
+import base64
+import binascii
+import datetime
+import hashlib
+import json
 import logging
 import uuid
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import permissions
+from rest_framework import permissions, status
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.core.files.storage import default_storage
+from common.uploads import get_upload_content_type, validate_upload_size
 from rest_framework import viewsets, permissions
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from accounts.models import UserProfile
 from .models import Article
-from .serializers import ArticleSerializer
-from django.db import models
+from .serializers import ArticleListSerializer, ArticleSerializer
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +30,136 @@ class ArticlePagination(PageNumberPagination):
     max_page_size = 100
 
 
+class ArticleFeedPagination(ArticlePagination):
+    """
+    記事一覧のキーセットページネーション
+
+    (created_at, id) の降順に並べ、前のページの最後の記事より後ろを取得するので、
+    深いページでも OFFSET で読み飛ばさない。次のページは next の URL（cursor）で
+    取得する。page が指定された場合は従来通りページ番号でページングする。
+
+    ビューが get_feed_branches() を持つ場合は、その各クエリセットをそれぞれの
+    インデックスで辿って UNION ALL で結合する。
+
+    ?count=false
+        全件数（count）を数えずに null を返す
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    ordering = ("-created_at", "-id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.page_query_param not in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        if hasattr(view, "get_feed_branches"):
+            branches = view.get_feed_branches()
+        else:
+            branches = [queryset]
+
+        if len(branches) == 1:
+            results = list(self.after(branches[0], cursor)[: page_size + 1])
+        else:
+            # 各ブランチから1ページ分の ID のみを取り出して結合し、本体は後で取得する
+            parts = [
+                self.after(branch.order_by(), cursor).values_list("id", "created_at")[
+                    : page_size + 1
+                ]
+                for branch in branches
+            ]
+            rows = parts[0].union(*parts[1:], all=True).order_by(*self.ordering)
+            ids = [pk for pk, _ in rows[: page_size + 1]]
+            articles = queryset.filter(pk__in=ids).in_bulk()
+            results = [articles[pk] for pk in ids if pk in articles]
+
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        if self.get_count_enabled(request):
+            self.count = self.count_branches(branches)
+        else:
+            self.count = None
+        return self.page
+
+    def count_branches(self, branches):
+        """全ブランチの件数の合計を1回のクエリで数える"""
+        parts = [branch.order_by().values("id") for branch in branches]
+        return parts[0].union(*parts[1:], all=True).count()
+
+    def after(self, queryset, cursor):
+        """cursor の記事より後ろの記事を新しい順に並べたクエリセット"""
+        queryset = queryset.order_by(*self.ordering)
+        if cursor is None:
+            return queryset
+        created_at, pk = cursor
+        return queryset.filter(created_at__lte=created_at).exclude(
+            created_at=created_at, id__gte=pk
+        )
+
+    def get_count_enabled(self, request):
+        value = request.query_params.get(self.count_query_param, "")
+        return value.lower() not in ("false", "0")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (binascii.Error, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        # 改ざんされたカーソルで 500 にならないよう、形を確かめてから解釈する
+        if not (
+            isinstance(position, list)
+            and len(position) == 2
+            and all(isinstance(value, str) for value in position)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return datetime.datetime.fromisoformat(position[0]), uuid.UUID(position[1])
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, article):
+        position = [article.created_at.isoformat(), str(article.id)]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        # フィードは前に進むのみ
+        return None
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(
+            {
+                "count": self.count,
+                "next": self.get_next_link(),
+                "previous": None,
+                "results": data,
+            }
+        )
+
+
 class AuthorPermission(permissions.BasePermission):
     def has_permission(self, request, view):
         # 全ての操作に認証が必要
@@ -44,6 +183,10 @@ class UploadImageView(APIView):
         if not file_obj:
             return Response({"error": "No file uploaded."}, status=400)
 
+        # 従来のアップロードでもサイズと拡張子の制限を守らせる
+        get_upload_content_type(file_obj.name)
+        validate_upload_size(file_obj.size)
+
         ext = file_obj.name.split(".")[-1]
         filename = f"{uuid.uuid4()}.{ext}"
         try:
@@ -56,29 +199,78 @@ class UploadImageView(APIView):
         return Response({"url": url}, status=200)
 
 
-class ArticleViewSet(viewsets.ModelViewSet):
+class ArticleResponseMixin:
+    """
+    一覧では本文を除いた要約のみを返し、詳細では本文を含めて返す
+
+    詳細には本文のハッシュから作った ETag を付け、変わっていなければ 304 を返す。
+    """
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return ArticleListSerializer
+        return ArticleSerializer
+
+    def get_queryset(self):
+        queryset = self.get_base_queryset()
+        if self.action == "list":
+            return queryset.for_listing()
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        data = self.get_serializer(instance).data
+
+        # 本文は HTML 全体ではなく生成元の JSON のハッシュで代表させる
+        fingerprint = {
+            key: value
+            for key, value in data.items()
+            if key not in ("content_json", "content_html")
+        }
+        fingerprint["content_hash"] = instance.content_hash
+        fingerprint["with_content_json"] = "content_json" in data
+        etag = quote_etag(
+            hashlib.md5(
+                json.dumps(fingerprint, sort_keys=True, default=str).encode()
+            ).hexdigest()
+        )
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+
+        response["ETag"] = etag
+        # 下書きや著者向けの内容を含むため共有キャッシュには置かず、毎回検証させる
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class ArticleViewSet(ArticleResponseMixin, viewsets.ModelViewSet):
     serializer_class = ArticleSerializer
     permission_classes = [AuthorPermission]
-    pagination_class = ArticlePagination
+    pagination_class = ArticleFeedPagination
     lookup_field = "id"  # slugからidに変更
 
-    def get_queryset(self):
-        return Article.objects.filter(
-            models.Q(is_public=True) | models.Q(author=self.request.user)
-        ).order_by("-created_at")
+    def get_base_queryset(self):
+        return Article.objects.visible_to(self.request.user).order_by(
+            "-created_at", "-id"
+        )
+
+    def get_feed_branches(self):
+        return Article.objects.feed_branches(self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
 
-class UserArticleViewSet(viewsets.ReadOnlyModelViewSet):
+class UserArticleViewSet(ArticleResponseMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ArticleSerializer
     permission_classes = [AuthorPermission]
-    pagination_class = ArticlePagination
+    pagination_class = ArticleFeedPagination
     lookup_field = "slug"
     lookup_url_kwarg = "slug"
 
-    def get_queryset(self):
+    def get_base_queryset(self):
         profile_id = self.kwargs.get("profile_id")
         try:
             profile = UserProfile.objects.get(profile_id=profile_id)
@@ -91,7 +283,7 @@ class UserArticleViewSet(viewsets.ReadOnlyModelViewSet):
             if self.request.user != user:
                 queryset = queryset.filter(is_public=True)
 
-            return queryset.order_by("-created_at")
+            return queryset.order_by("-created_at", "-id")
 
         except UserProfile.DoesNotExist:
             return Article.objects.none()
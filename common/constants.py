@@ -0,0 +1,42 @@
+# 署名付きアップロード URL の有効期間（秒）
+PRESIGNED_UPLOAD_EXPIRES = 60 * 10
+
+# アップロードの完了を通知できる期間（秒）
+UPLOAD_TOKEN_MAX_AGE = 60 * 60
+
+# 拡張子毎の Content-Type
+UPLOAD_CONTENT_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+}
+
+# 直接アップロードされたファイルを検証するまで置いておく非公開のプレフィックス
+PENDING_UPLOAD_PREFIX = "pending"
+
+# Content-Type 毎のファイルの先頭のバイト列の正規表現（"." は任意の1バイト）
+FILE_SIGNATURES = {
+    "image/jpeg": [rb"\xff\xd8\xff"],
+    "image/png": [rb"\x89PNG\r\n\x1a\n"],
+    "image/gif": [rb"GIF87a", rb"GIF89a"],
+    "image/webp": [rb"RIFF....WEBP"],
+}
+
+# 画像の種類毎に生成する派生画像の幅（px）
+IMAGE_VARIANT_WIDTHS = {
+    "profile": (64, 128, 256),
+    "articles": (480, 960, 1600),
+}
+
+# 派生画像の形式と Content-Type
+IMAGE_VARIANT_FORMATS = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+IMAGE_VARIANT_QUALITY = 80
+
+# ワーカーが1回に処理する画像の件数
+IMAGE_VARIANT_BATCH_SIZE = 20
@@ -0,0 +1,180 @@
+import io
+import logging
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F, TextField, Value
+from django.db.models.fields.json import KT
+from django.db.models.functions import Coalesce
+from PIL import Image, ImageOps
+
+from common.constants import (
+    IMAGE_VARIANT_BATCH_SIZE,
+    IMAGE_VARIANT_FORMATS,
+    IMAGE_VARIANT_QUALITY,
+    IMAGE_VARIANT_WIDTHS,
+)
+
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+# 派生画像を生成する (モデル, 画像の URL のフィールド, 派生画像のフィールド, 種類)
+IMAGE_VARIANT_TARGETS = [
+    ("accounts.UserProfile", "picture", "picture_variants", "profile"),
+    ("articles.Article", "cover_image", "cover_image_variants", "articles"),
+]
+
+
+def get_storage_key(url):
+    """ストレージの公開 URL からキーを返す（ストレージ外の URL の場合は None）"""
+    if not url:
+        return None
+    base = default_storage.url("")
+    if not url.startswith(base) or len(url) == len(base):
+        return None
+    return url[len(base) :]
+
+
+def get_variant_key(key, width, image_format):
+    """
+    派生画像のキー
+
+    元の画像のキーと幅、形式のみから決まるので、生成し直しても同じキーに保存する。
+    """
+    stem = key.rsplit(".", 1)[0]
+    return f"{stem}_w{width}.{FORMAT_EXTENSIONS[image_format]}"
+
+
+def render_variants(data, widths):
+    """
+    画像を各幅に縮小し、メタデータを除いて各形式で圧縮し直す
+
+    元の画像より大きな幅には拡大しない（元の画像が最小の幅より小さい場合は
+    元の幅で1つだけ作る）。
+
+    Returns:
+        list: (幅, 形式, 画像のバイト列) のリスト
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        # JPEG は縮小して読み込めるので、必要な最大の幅に近い解像度でデコードする
+        original.draft("RGB", (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        targets = [width for width in widths if width < image.width] or [image.width]
+        variants = []
+        for width in targets:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            for image_format in IMAGE_VARIANT_FORMATS:
+                output = io.BytesIO()
+                if image_format == "jpeg":
+                    if resized.mode == "RGBA":
+                        # JPEG は透過できないため白背景に合成する
+                        background = Image.new("RGB", resized.size, "white")
+                        background.paste(resized, mask=resized.getchannel("A"))
+                        flattened = background
+                    else:
+                        flattened = resized
+                    flattened.save(
+                        output,
+                        "JPEG",
+                        quality=IMAGE_VARIANT_QUALITY,
+                        optimize=True,
+                        progressive=True,
+                    )
+                else:
+                    resized.save(output, "WEBP", quality=IMAGE_VARIANT_QUALITY)
+                variants.append((width, image_format, output.getvalue()))
+        return variants
+
+
+def generate_image_variants(url, kind):
+    """
+    ストレージにある画像の派生画像を生成して保存する
+
+    Returns:
+        dict: 生成元の URL（source）と、形式毎の幅をキーとする派生画像の URL。
+            ストレージ外の画像や生成に失敗した場合は source のみ
+    """
+    variants = {"source": url}
+    key = get_storage_key(url)
+    if key is None:
+        return variants
+
+    try:
+        with default_storage.open(key, "rb") as file:
+            data = file.read()
+        rendered = render_variants(data, IMAGE_VARIANT_WIDTHS[kind])
+    except Exception as e:
+        # 壊れた画像などは生成し直しても失敗するため、元の画像のみを使う
+        logger.error(f"派生画像の生成に失敗しました ({key}): {str(e)}")
+        return variants
+
+    for width, image_format, content in rendered:
+        variant_key = get_variant_key(key, width, image_format)
+        file = ContentFile(content)
+        file.content_type = IMAGE_VARIANT_FORMATS[image_format]
+        # 既存のキーには別名で保存するストレージもあるため、古い派生画像を消してから
+        # 保存し、実際に保存された名前の URL を使う
+        default_storage.delete(variant_key)
+        name = default_storage.save(variant_key, file)
+        variants.setdefault(image_format, {})[str(width)] = default_storage.url(name)
+    return variants
+
+
+def get_srcset(variants, source):
+    """
+    派生画像から形式毎の srcset を返す
+
+    派生画像が今の画像（source）から生成したものでない場合は None
+    """
+    if not source or not variants or variants.get("source") != source:
+        return None
+    srcset = {}
+    for image_format in IMAGE_VARIANT_FORMATS:
+        urls = variants.get(image_format)
+        if urls:
+            srcset[image_format] = ", ".join(
+                f"{url} {width}w"
+                for width, url in sorted(urls.items(), key=lambda item: int(item[0]))
+            )
+    return srcset or None
+
+
+def process_image_variants(batch_size=IMAGE_VARIANT_BATCH_SIZE):
+    """
+    派生画像がまだない（画像が変わった）行の派生画像を生成する
+
+    Returns:
+        int: 処理した画像の件数
+    """
+    processed = 0
+    for model_label, url_field, variants_field, kind in IMAGE_VARIANT_TARGETS:
+        model = apps.get_model(model_label)
+        rows = (
+            model.objects.exclude(**{f"{url_field}__isnull": True})
+            .exclude(**{url_field: ""})
+            # 派生画像がない行は source が NULL になり比較できないため空文字にする
+            .alias(
+                variants_source=Coalesce(
+                    KT(f"{variants_field}__source"), Value(""), output_field=TextField()
+                )
+            )
+            .exclude(variants_source=F(url_field))
+            .values_list("pk", url_field)[: batch_size - processed]
+        )
+        for pk, url in rows:
+            variants = generate_image_variants(url, kind)
+            # 処理中に画像が変わった場合は次回に生成し直す
+            model.objects.filter(pk=pk, **{url_field: url}).update(
+                **{variants_field: variants}
+            )
+            processed += 1
+        if processed >= batch_size:
+            break
+    return processed
@@ -0,0 +1,112 @@
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework import permissions, serializers
+from rest_framework.fields import get_attribute
+
+from common.images import get_srcset
+
+
+class SparseFieldsetMixin:
+    """
+    クエリパラメータでレスポンスの形を絞り込めるようにするミックスイン
+
+    ?fields=id,name,lecture.room
+        指定したフィールドのみを返す。ネストしたフィールドは "." で区切って指定し、
+        ネスト先を名前だけで指定した場合はネスト先の全フィールドを返す。
+    ?expand=lecture,lecture.owner
+        指定した場合、列挙したネストのみを展開し、それ以外のネストは主キーで返す。
+        ネスト先を名前だけで指定した場合はネスト先をすべて展開する。
+
+    どちらも指定しない場合や、GET 以外のリクエストでは従来通りの形で返す。
+    ネスト先でも絞り込むには、ネスト先のシリアライザにもこのミックスインを使う。
+    """
+
+    fields_query_param = "fields"
+    expand_query_param = "expand"
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        selected = self._get_selected_names(self.fields_query_param)
+        if selected is not None:
+            fields = {name: field for name, field in fields.items() if name in selected}
+
+        expanded = self._get_selected_names(self.expand_query_param)
+        if expanded is not None:
+            for name, field in fields.items():
+                if (
+                    isinstance(field, serializers.BaseSerializer)
+                    and name not in expanded
+                ):
+                    fields[name] = self._collapse(name, field)
+
+        return fields
+
+    def _collapse(self, name, field):
+        """ネストしたシリアライザを主キーのフィールドに置き換える"""
+        kwargs = {"read_only": True}
+        if field.source and field.source != name:
+            kwargs["source"] = field.source
+        if isinstance(field, serializers.ListSerializer):
+            kwargs["many"] = True
+        return serializers.PrimaryKeyRelatedField(**kwargs)
+
+    def _get_path(self):
+        """ルートのシリアライザからこのシリアライザまでのフィールド名のリスト"""
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.insert(0, node.field_name)
+            node = node.parent
+        return path
+
+    def _get_selected_names(self, param):
+        """
+        クエリパラメータのうち、このシリアライザの階層で指定された名前の集合を返す
+
+        パラメータが指定されていない場合や、この階層全体が指定された場合は None
+        """
+        request = self.root.context.get("request") if self.root else None
+        # 書き込み時に入力フィールドが落ちないよう、読み取り時のみ適用する
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return None
+
+        value = request.query_params.get(param)
+        if value is None:
+            return None
+
+        path = ".".join(self._get_path())
+        prefix = f"{path}." if path else ""
+        names = set()
+        for entry in value.split(","):
+            entry = entry.strip()
+            # この階層かその祖先が名前だけで指定された場合は全体を返す
+            if path and (entry == path or path.startswith(f"{entry}.")):
+                return None
+            if entry and entry.startswith(prefix):
+                names.add(entry[len(prefix) :].split(".")[0])
+        return names
+
+
+class SrcsetField(serializers.Field):
+    """
+    画像の派生画像の形式毎の srcset を返す読み取り専用のフィールド
+
+    例: {"webp": "https://.../a_w64.webp 64w, ...", "jpeg": "..."}
+    派生画像をまだ生成していない場合は null を返し、クライアントは元の画像を使う。
+    """
+
+    def __init__(self, url_source, variants_source, **kwargs):
+        self.url_attrs = url_source.split(".")
+        self.variants_attrs = variants_source.split(".")
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        try:
+            url = get_attribute(instance, self.url_attrs)
+            variants = get_attribute(instance, self.variants_attrs)
+        except (AttributeError, ObjectDoesNotExist):
+            return None
+        return get_srcset(variants, url)
@@ -0,0 +1,16 @@
+from django.core.management import call_command
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+
+@receiver(post_migrate)
+def create_cache_table(sender, using, **kwargs):
+    """
+    DB キャッシュ（dbcache://）のテーブルを作成する
+
+    academics の初期データ作成など、他のアプリの post_migrate でもキャッシュを
+    使うため、INSTALLED_APPS で先に読み込まれる common で受け取り、各アプリの
+    post_migrate の最初に作成する。作成済みの場合や DB キャッシュ以外の
+    バックエンドでは何もしない。
+    """
+    call_command("createcachetable", database=using, verbosity=0)
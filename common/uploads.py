@@ -0,0 +1,186 @@
+import datetime
+import mimetypes
+import re
+import uuid
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from common.constants import (
+    FILE_SIGNATURES,
+    PENDING_UPLOAD_PREFIX,
+    PRESIGNED_UPLOAD_EXPIRES,
+    UPLOAD_CONTENT_TYPES,
+    UPLOAD_TOKEN_MAX_AGE,
+)
+from common.exceptions import ValidationError
+
+UPLOAD_SIGNING_SALT = "common.uploads"
+
+
+def get_upload_content_type(filename):
+    """
+    アップロードを許可するファイルの Content-Type を返す
+
+    拡張子が ALLOWED_FILE_EXTENSIONS にない場合は ValidationError
+    """
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if ext not in settings.APP_SETTINGS["ALLOWED_FILE_EXTENSIONS"]:
+        raise ValidationError("このファイル形式はアップロードできません")
+    return (
+        UPLOAD_CONTENT_TYPES.get(ext)
+        or mimetypes.guess_type(filename)[0]
+        or "application/octet-stream"
+    )
+
+
+def validate_upload_size(size):
+    if not size or size > settings.APP_SETTINGS["MAX_UPLOAD_SIZE"]:
+        raise ValidationError("ファイルサイズが大きすぎます")
+
+
+def _get_client():
+    return default_storage.connection.meta.client
+
+
+def get_pending_key(key):
+    """検証前のファイルを置くキー"""
+    return f"{PENDING_UPLOAD_PREFIX}/{key}"
+
+
+def has_valid_signature(content_type, head_bytes):
+    """ファイルの先頭のバイト列が Content-Type に合っているかどうか"""
+    # 検証方法のない形式は受け付けない
+    return any(
+        re.match(signature, head_bytes, re.DOTALL)
+        for signature in FILE_SIGNATURES.get(content_type, [])
+    )
+
+
+def create_presigned_upload(user, prefix, filename, size):
+    """
+    ストレージに直接アップロードするための署名付きの POST を作る
+
+    サイズの上限と Content-Type はストレージ側でも検証されるよう署名に含める。
+    アップロード先は非公開の PENDING_UPLOAD_PREFIX 以下とし、confirm_upload で
+    検証してから公開する。
+
+    Returns:
+        dict: POST 先の URL（url）、フォームに含めるフィールド（fields）、
+            アップロード後に confirm_upload に渡すID（upload_id）
+    """
+    content_type = get_upload_content_type(filename)
+    validate_upload_size(size)
+
+    ext = filename.rsplit(".", 1)[-1].lower()
+    key = f"{prefix}/{uuid.uuid4()}.{ext}"
+    fields = {"Content-Type": content_type, "acl": "private"}
+    conditions = [
+        {"Content-Type": content_type},
+        {"acl": "private"},
+        ["content-length-range", 1, settings.APP_SETTINGS["MAX_UPLOAD_SIZE"]],
+    ]
+
+    presigned = _get_client().generate_presigned_post(
+        default_storage.bucket_name,
+        get_pending_key(key),
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=PRESIGNED_UPLOAD_EXPIRES,
+    )
+    upload_id = signing.dumps(
+        {"key": key, "content_type": content_type, "user": user.pk},
+        salt=UPLOAD_SIGNING_SALT,
+    )
+    return {
+        "url": presigned["url"],
+        "fields": presigned["fields"],
+        "upload_id": upload_id,
+    }
+
+
+def confirm_upload(user, upload_id):
+    """
+    直接アップロードされたファイルを検証して公開し、公開 URL を返す
+
+    サイズ、Content-Type とファイルの先頭のバイト列を確認し、問題がなければ
+    公開するキーにコピーする。検証前のファイルはいずれの場合も削除する。
+    不正なファイルの場合は ValidationError とする。
+    """
+    try:
+        upload = signing.loads(
+            upload_id, salt=UPLOAD_SIGNING_SALT, max_age=UPLOAD_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        raise ValidationError("アップロードIDが無効です")
+    if upload["user"] != user.pk:
+        raise ValidationError("アップロードIDが無効です")
+
+    client = _get_client()
+    bucket = default_storage.bucket_name
+    key = upload["key"]
+    pending_key = get_pending_key(key)
+    try:
+        head = client.head_object(Bucket=bucket, Key=pending_key)
+    except ClientError:
+        raise ValidationError("ファイルがアップロードされていません")
+
+    valid = (
+        head["ContentLength"] <= settings.APP_SETTINGS["MAX_UPLOAD_SIZE"]
+        and head.get("ContentType") == upload["content_type"]
+    )
+    if valid:
+        # 拡張子を偽ったファイルでないか、先頭のバイト列のみを取得して確認する
+        head_bytes = client.get_object(
+            Bucket=bucket, Key=pending_key, Range="bytes=0-15"
+        )["Body"].read()
+        valid = has_valid_signature(upload["content_type"], head_bytes)
+    if valid:
+        extra = {"ACL": settings.AWS_DEFAULT_ACL} if settings.AWS_DEFAULT_ACL else {}
+        client.copy_object(
+            Bucket=bucket,
+            Key=key,
+            CopySource={"Bucket": bucket, "Key": pending_key},
+            ContentType=upload["content_type"],
+            MetadataDirective="REPLACE",
+            **extra,
+        )
+    client.delete_object(Bucket=bucket, Key=pending_key)
+    if not valid:
+        raise ValidationError("アップロードされたファイルが不正です")
+
+    return default_storage.url(key)
+
+
+def delete_expired_uploads(now=None):
+    """
+    確認されないまま UPLOAD_TOKEN_MAX_AGE を過ぎた検証前のファイルを削除する
+
+    Returns:
+        int: 削除したファイルの数
+    """
+    expires_at = (now or timezone.now()) - datetime.timedelta(
+        seconds=UPLOAD_TOKEN_MAX_AGE
+    )
+    client = _get_client()
+    bucket = default_storage.bucket_name
+    deleted = 0
+    pages = client.get_paginator("list_objects_v2").paginate(
+        Bucket=bucket, Prefix=f"{PENDING_UPLOAD_PREFIX}/"
+    )
+    for page in pages:
+        # 1ページは最大1000件で、delete_objects の上限と同じ
+        expired = [
+            {"Key": obj["Key"]}
+            for obj in page.get("Contents", [])
+            if obj["LastModified"] < expires_at
+        ]
+        if expired:
+            client.delete_objects(
+                Bucket=bucket, Delete={"Objects": expired, "Quiet": True}
+            )
+            deleted += len(expired)
+    return deleted
@@ -0,0 +1,45 @@
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from common.exceptions import ValidationError
+from common.uploads import confirm_upload, create_presigned_upload
+
+
+class PresignedUploadView(APIView):
+    """
+    ストレージに直接アップロードするための署名付き URL を発行するAPI
+
+    クライアントは返された url に fields とファイルをフォームで POST し、
+    upload_id を ConfirmUploadView に送って公開 URL を受け取る。
+    """
+
+    permission_classes = [IsAuthenticated]
+    # アップロード先のディレクトリ（as_view で指定する）
+    upload_prefix = None
+
+    def post(self, request, *args, **kwargs):
+        filename = request.data.get("filename")
+        try:
+            size = int(request.data.get("size"))
+        except (TypeError, ValueError):
+            size = None
+        if not filename or size is None:
+            raise ValidationError("filename と size を指定してください")
+
+        return Response(
+            create_presigned_upload(request.user, self.upload_prefix, filename, size)
+        )
+
+
+class ConfirmUploadView(APIView):
+    """直接アップロードしたファイルを検証して公開 URL を返すAPI"""
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        upload_id = request.data.get("upload_id")
+        if not upload_id:
+            raise ValidationError("upload_id を指定してください")
+
+        return Response({"url": confirm_upload(request.user, upload_id)})
@@ -53,6 +53,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "corsheaders",
     "rest_framework",
     "rest_framework.authtoken",
@@ -68,6 +69,7 @@ INSTALLED_APPS = [
     "django_filters",
     "storages",
     "whitenoise",
+    "common",
     "api",
     "accounts",
     "academics",
@@ -186,6 +188,11 @@ DATABASES = {
     "default": dj_database_url.config(default=env("DATABASE_URL"), conn_max_age=600)
 }
 
+# 時間割や現在のタームのキャッシュは保存時のシグナルで破棄するため、web の各ワーカーと
+# scheduler で共有するバックエンドを使う（locmemcache:// はプロセス毎になるので不可）。
+# 既定の dbcache のテーブルは migrate 時に作成される（common.signals）
+CACHES = {"default": env.cache("CACHE_URL", default="dbcache://django_cache")}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -210,6 +217,35 @@ VAPID_PRIVATE_KEY = env("VAPID_PRIVATE_KEY")
 VAPID_PUBLIC_KEY = env("VAPID_PUBLIC_KEY")
 VAPID_CLAIMS_EMAIL = env("VAPID_CLAIMS_EMAIL", default="main@ichipiroplus.com")
 
+WEBPUSH_SETTINGS = {
+    # 送信に使うスレッド数
+    "MAX_WORKERS": env.int("WEBPUSH_MAX_WORKERS", default=32),
+    # プッシュサービスのオリジン毎の同時接続数
+    "MAX_CONNECTIONS_PER_ORIGIN": env.int(
+        "WEBPUSH_MAX_CONNECTIONS_PER_ORIGIN", default=16
+    ),
+    # プッシュサービスのオリジン毎の送信レート（件/秒、0 は無制限）
+    "RATE_LIMIT_PER_ORIGIN": env.float("WEBPUSH_RATE_LIMIT_PER_ORIGIN", default=0),
+    "TIMEOUT": env.float("WEBPUSH_TIMEOUT", default=10),
+    # ペイロードの暗号化に使うプロセス数（0 は送信スレッド内で暗号化する）
+    "ENCRYPTION_PROCESSES": env.int(
+        "WEBPUSH_ENCRYPTION_PROCESSES", default=os.cpu_count() or 1
+    ),
+    # この件数以上を一度に送信する場合にプロセスで暗号化する
+    "ENCRYPTION_POOL_THRESHOLD": env.int(
+        "WEBPUSH_ENCRYPTION_POOL_THRESHOLD", default=200
+    ),
+    "TTL": 60 * 60 * 12,
+    # 通知ログを bulk_create する際の1回あたりの件数
+    "LOG_BATCH_SIZE": env.int("WEBPUSH_LOG_BATCH_SIZE", default=500),
+    # 通知ログを保存する日数（過ぎたものは日毎に集計して削除する）
+    "LOG_RETENTION_DAYS": env.int("WEBPUSH_LOG_RETENTION_DAYS", default=90),
+    # ワーカーが送信キューから1回に取り出す件数
+    "QUEUE_BATCH_SIZE": env.int("WEBPUSH_QUEUE_BATCH_SIZE", default=500),
+    # ワーカーが送信キューを確認する間隔（秒）
+    "QUEUE_POLL_INTERVAL": env.int("WEBPUSH_QUEUE_POLL_INTERVAL", default=2),
+}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -3,75 +3,171 @@ import django
 import logging
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from django.core.management import call_command
 from django.conf import settings
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 django.setup()
 
+from common.constants import IMAGE_VARIANT_BATCH_SIZE
+from common.images import process_image_variants
+from common.uploads import delete_expired_uploads
+from webpush.broadcast import process_broadcasts
+from webpush.queue import get_push_queue_stats, process_push_queue
+from webpush.retention import delete_old_scheduled_notifications
 
 logger = logging.getLogger(__name__)
 scheduler = BlockingScheduler()
 
 
-def send_lecture_notification_job(time_slot):
-    """講義通知を送信するジョブ"""
-    logger.info(f"時限 {time_slot} の講義通知ジョブを実行します")
+def build_notification_schedule_job():
+    """今日の講義開始通知の予定を生成するジョブ"""
+    logger.info("講義開始通知の予定を生成します")
     try:
-        call_command("send_lecture_notifications", time_slot=time_slot)
-        logger.info(f"時限 {time_slot} の講義通知ジョブが完了しました")
+        call_command("build_notification_schedule")
     except Exception as e:
-        logger.error(
-            f"時限 {time_slot} の講義通知ジョブでエラーが発生しました: {str(e)}"
-        )
+        logger.error(f"講義開始通知の予定の生成でエラーが発生しました: {str(e)}")
+
+
+def send_scheduled_notifications_job():
+    """送信時刻を過ぎた予約通知を送信するジョブ"""
+    try:
+        call_command("send_scheduled_notifications")
+    except Exception as e:
+        logger.error(f"予約通知の送信でエラーが発生しました: {str(e)}")
+
+
+def process_push_queue_job():
+    """送信キューの通知を送信するジョブ"""
+    try:
+        # 管理画面から登録された一斉通知を送信キューに積む
+        process_broadcasts()
+
+        # 1回で取り出しきれない場合は続けて送信する
+        while True:
+            result = process_push_queue()
+            if result["processed"] < settings.WEBPUSH_SETTINGS["QUEUE_BATCH_SIZE"]:
+                break
+        if result["processed"]:
+            stats = get_push_queue_stats()
+            logger.info(
+                f"通知を送信しました: 送信済み={result['sent']}, "
+                f"再送待ち={result['retried']}, 送信失敗={result['dead']}, "
+                f"送信待ち={stats['pending']}"
+            )
+    except Exception as e:
+        logger.error(f"送信キューの処理でエラーが発生しました: {str(e)}")
+
+
+def rollup_push_notification_logs_job():
+    """保存期間を過ぎた通知ログを集計して削除するジョブ"""
+    logger.info("保存期間を過ぎた通知ログを集計します")
+    try:
+        call_command("rollup_push_notification_logs")
+    except Exception as e:
+        logger.error(f"通知ログの集計でエラーが発生しました: {str(e)}")
+
+
+def delete_old_scheduled_notifications_job():
+    """送信済みや送信されなかった予約通知を削除するジョブ"""
+    try:
+        deleted = delete_old_scheduled_notifications()
+        if deleted:
+            logger.info(f"予約通知{deleted}件を削除しました")
+    except Exception as e:
+        logger.error(f"予約通知の削除でエラーが発生しました: {str(e)}")
+
+
+def process_image_variants_job():
+    """アップロードされた画像の派生画像（縮小・再圧縮版）を生成するジョブ"""
+    try:
+        processed = 0
+        while True:
+            count = process_image_variants()
+            processed += count
+            if count < IMAGE_VARIANT_BATCH_SIZE:
+                break
+        if processed:
+            logger.info(f"{processed}件の画像の派生画像を生成しました")
+    except Exception as e:
+        logger.error(f"派生画像の生成でエラーが発生しました: {str(e)}")
+
+
+def delete_expired_uploads_job():
+    """確認されなかった直接アップロードのファイルを削除するジョブ"""
+    try:
+        deleted = delete_expired_uploads()
+        if deleted:
+            logger.info(f"確認されなかったアップロード{deleted}件を削除しました")
+    except Exception as e:
+        logger.error(f"アップロードの削除でエラーが発生しました: {str(e)}")
 
 
 def main():
     """スケジューラのメイン関数"""
     logger.info("スケジューラを開始します")
 
-    # 1限
+    # 起動時と毎日0時過ぎに、その日の講義開始通知の予定を生成する
+    build_notification_schedule_job()
+    scheduler.add_job(
+        build_notification_schedule_job,
+        CronTrigger(hour=0, minute=5, timezone="Asia/Tokyo"),
+        id="build_notification_schedule",
+        replace_existing=True,
+    )
+
+    # 予定の送信時刻（講義開始時刻や、ユーザー毎に設定した何分前）に送信する
     scheduler.add_job(
-        send_lecture_notification_job,
-        CronTrigger(hour=9, minute=0, timezone="Asia/Tokyo"),
-        args=[1],
-        id="notify_first_period",
+        send_scheduled_notifications_job,
+        CronTrigger(minute="*", timezone="Asia/Tokyo"),
+        id="send_scheduled_notifications",
         replace_existing=True,
+        max_instances=1,
+        coalesce=True,
     )
 
-    # 2限
+    # 送信キューに積まれた通知を送信する
     scheduler.add_job(
-        send_lecture_notification_job,
-        CronTrigger(hour=10, minute=40, timezone="Asia/Tokyo"),
-        args=[2],
-        id="notify_second_period",
+        process_push_queue_job,
+        IntervalTrigger(seconds=settings.WEBPUSH_SETTINGS["QUEUE_POLL_INTERVAL"]),
+        id="process_push_queue",
         replace_existing=True,
+        max_instances=1,
+        coalesce=True,
     )
 
-    # 3限
+    # アップロードされたプロフィール画像と記事のカバー画像の派生画像を生成する
     scheduler.add_job(
-        send_lecture_notification_job,
-        CronTrigger(hour=13, minute=0, timezone="Asia/Tokyo"),
-        args=[3],
-        id="notify_third_period",
+        process_image_variants_job,
+        IntervalTrigger(minutes=1),
+        id="process_image_variants",
         replace_existing=True,
+        max_instances=1,
+        coalesce=True,
     )
 
-    # 4限
+    # 直接アップロードされたまま確認されなかったファイルを削除する
     scheduler.add_job(
-        send_lecture_notification_job,
-        CronTrigger(hour=14, minute=40, timezone="Asia/Tokyo"),
-        args=[4],
-        id="notify_fourth_period",
+        delete_expired_uploads_job,
+        IntervalTrigger(hours=1),
+        id="delete_expired_uploads",
         replace_existing=True,
+        max_instances=1,
+        coalesce=True,
     )
 
-    # 5限
+    # 通知の少ない深夜に、保存期間を過ぎた通知ログと使い終わった予約通知を削除する
+    scheduler.add_job(
+        rollup_push_notification_logs_job,
+        CronTrigger(hour=3, minute=30, timezone="Asia/Tokyo"),
+        id="rollup_push_notification_logs",
+        replace_existing=True,
+    )
     scheduler.add_job(
-        send_lecture_notification_job,
-        CronTrigger(hour=16, minute=20, timezone="Asia/Tokyo"),
-        args=[5],
-        id="notify_fifth_period",
+        delete_old_scheduled_notifications_job,
+        CronTrigger(hour=3, minute=30, timezone="Asia/Tokyo"),
+        id="delete_old_scheduled_notifications",
         replace_existing=True,
     )
 
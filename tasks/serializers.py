@@ -2,10 +2,11 @@ from rest_framework import serializers
 
 from academics.models import Registration
 from academics.serializers import RegistrationSerializer
+from common.serializers import SparseFieldsetMixin
 from .models import Task
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     registration = RegistrationSerializer(read_only=True)
     registration_id = serializers.PrimaryKeyRelatedField(
         queryset=Registration.objects.all(),
@@ -3,6 +3,7 @@ from rest_framework import viewsets
 from tasks.filters import TaskFilter
 from .serializers import TaskSerializer
 from .models import Task
+from academics.querysets import lecture_related_lookups
 from django_filters.rest_framework import DjangoFilterBackend
 
 logger = logging.getLogger(__name__)
@@ -16,7 +17,14 @@ class TaskViewSet(viewsets.ModelViewSet):
     filterset_class = TaskFilter
 
     def get_queryset(self):
-        return Task.objects.filter(user=self.request.user)
+        select_related, prefetch_related = lecture_related_lookups(
+            "registration__lecture__"
+        )
+        return (
+            Task.objects.filter(user=self.request.user)
+            .select_related(*select_related)
+            .prefetch_related(*prefetch_related)
+        )
 
     def perform_create(self, serializer):
         return serializer.save(user=self.request.user)
@@ -1,12 +1,25 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from django.urls import path
-from django.shortcuts import render, redirect
+from django.urls import path, reverse
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render, redirect
 from django import forms
 from django.contrib import messages
+from django.utils import timezone
 
-from .models import PushSubscription, PushNotificationLog
-from .views import send_push_notification
+from .constants import DELIVERY_PENDING
+from .models import (
+    NotificationInbox,
+    NotificationPreference,
+    PushBroadcast,
+    PushDelivery,
+    PushNotificationDailyStat,
+    PushNotificationLog,
+    PushSubscription,
+    ScheduledNotification,
+)
+from .broadcast import get_broadcast_progress
+from .queue import get_push_queue_stats
 from django.contrib.auth.models import User
 
 
@@ -57,6 +70,14 @@ class PushNotificationForm(forms.Form):
         widget=forms.SelectMultiple(attrs={"class": "vSelectMultiple"}),
     )
 
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("recipient_type") == "selected" and not cleaned_data.get(
+            "users"
+        ):
+            self.add_error("users", "送信先のユーザーを選択してください")
+        return cleaned_data
+
 
 @admin.register(PushSubscription)
 class PushSubscriptionAdmin(admin.ModelAdmin):
@@ -87,10 +108,21 @@ class PushSubscriptionAdmin(admin.ModelAdmin):
 class PushNotificationLogAdmin(admin.ModelAdmin):
     """プッシュ通知ログの管理画面"""
 
-    list_display = ("title", "user", "notification_type", "status", "sent_at")
+    list_display = (
+        "title",
+        "user",
+        "notification_type",
+        "status",
+        "success_count",
+        "failure_count",
+        "sent_at",
+    )
     list_filter = ("notification_type", "status", "sent_at")
     search_fields = ("title", "body", "user__username", "user__email")
     date_hierarchy = "sent_at"
+    list_select_related = ("user",)
+    # ログの件数が多いため、絞り込み前の全件数は数えない
+    show_full_result_count = False
     readonly_fields = (
         "title",
         "body",
@@ -98,6 +130,8 @@ class PushNotificationLogAdmin(admin.ModelAdmin):
         "user",
         "notification_type",
         "status",
+        "success_count",
+        "failure_count",
         "sent_at",
     )
 
@@ -119,6 +153,11 @@ class PushNotificationLogAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.send_notification_view),
                 name="send-notification",
             ),
+            path(
+                "broadcast/<int:pk>/",
+                self.admin_site.admin_view(self.broadcast_progress_view),
+                name="broadcast-progress",
+            ),
         ]
         return custom_urls + urls
 
@@ -134,33 +173,22 @@ class PushNotificationLogAdmin(admin.ModelAdmin):
                 recipient_type = form.cleaned_data["recipient_type"]
                 selected_users = form.cleaned_data["users"]
 
-                success_count = 0
-                failure_count = 0
-
-                if recipient_type == "all":
-                    # 全ユーザーに送信
-                    users = User.objects.all()
-                else:
-                    # 選択したユーザーに送信
-                    users = selected_users
-
-                for user in users:
-                    result = send_push_notification(
-                        user=user,
-                        title=title,
-                        body=body,
-                        url=url,
-                        notification_type=notification_type,
-                    )
-                    success_count += result["success"]
-                    failure_count += result["failed"]
+                # 送信はワーカーが行うので、一斉通知を登録してすぐに進捗画面を表示する
+                broadcast = PushBroadcast.objects.create(
+                    title=title,
+                    body=body,
+                    url=url,
+                    notification_type=notification_type,
+                    to_all_users=recipient_type == "all",
+                    created_by=request.user,
+                )
+                if recipient_type != "all":
+                    broadcast.users.set(selected_users)
 
                 self.message_user(
-                    request,
-                    f"通知を送信しました。成功: {success_count}, 失敗: {failure_count}",
-                    level=messages.SUCCESS if success_count > 0 else messages.WARNING,
+                    request, "通知の送信を開始しました。", level=messages.SUCCESS
                 )
-                return redirect("admin:webpush_pushnotificationlog_changelist")
+                return redirect("admin:broadcast-progress", broadcast.pk)
         else:
             form = PushNotificationForm()
 
@@ -172,8 +200,146 @@ class PushNotificationLogAdmin(admin.ModelAdmin):
         }
         return render(request, "admin/webpush/send_notification.html", context)
 
+    def broadcast_progress_view(self, request, pk):
+        """一斉通知の進捗画面。?format=json の場合は進捗のみを返す"""
+        broadcast = get_object_or_404(PushBroadcast, pk=pk)
+        progress = get_broadcast_progress(broadcast)
+        if request.GET.get("format") == "json":
+            return JsonResponse(progress)
+
+        context = {
+            "broadcast": broadcast,
+            "progress": progress,
+            "title": "通知の送信状況",
+            "opts": self.model._meta,
+        }
+        return render(request, "admin/webpush/broadcast_progress.html", context)
+
     def changelist_view(self, request, extra_context=None):
         """一覧画面に通知送信ボタンを追加"""
         extra_context = extra_context or {}
         extra_context["show_send_notification_button"] = True
         return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(PushBroadcast)
+class PushBroadcastAdmin(admin.ModelAdmin):
+    """一斉通知の管理画面"""
+
+    list_display = (
+        "title",
+        "notification_type",
+        "to_all_users",
+        "status",
+        "queued_count",
+        "created_by",
+        "created_at",
+        "progress_link",
+    )
+    list_filter = ("notification_type", "status", "created_at")
+    search_fields = ("title", "body")
+    list_select_related = ("created_by",)
+
+    def has_add_permission(self, request):
+        """追加は通知送信画面から行う"""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def progress_link(self, obj):
+        return format_html(
+            '<a href="{}">送信状況</a>',
+            reverse("admin:broadcast-progress", args=[obj.pk]),
+        )
+
+    progress_link.short_description = "送信状況"
+
+
+@admin.register(PushDelivery)
+class PushDeliveryAdmin(admin.ModelAdmin):
+    """送信キューの管理画面"""
+
+    list_display = (
+        "log",
+        "subscription",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "last_status_code",
+    )
+    list_filter = ("status", "last_status_code")
+    search_fields = ("log__title", "log__user__username", "last_error")
+    list_select_related = ("log", "subscription__user")
+    raw_id_fields = ("log", "subscription")
+    actions = ["retry_deliveries"]
+
+    @admin.action(description="選択した通知を再送する")
+    def retry_deliveries(self, request, queryset):
+        updated = queryset.exclude(subscription=None).update(
+            status=DELIVERY_PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{updated}件を送信キューに戻しました")
+
+    def changelist_view(self, request, extra_context=None):
+        """一覧画面に送信キューの状況を表示"""
+        stats = get_push_queue_stats()
+        extra_context = extra_context or {}
+        extra_context["title"] = (
+            f"送信キュー（送信待ち: {stats['pending']}, "
+            f"送信時刻を過ぎたもの: {stats['due']}, 送信失敗: {stats['dead']}）"
+        )
+        return super().changelist_view(request, extra_context=extra_context)
+
+
+@admin.register(NotificationPreference)
+class NotificationPreferenceAdmin(admin.ModelAdmin):
+    """ユーザー単位の通知設定の管理画面"""
+
+    list_display = ("user", "lecture_lead_minutes")
+    list_filter = ("lecture_lead_minutes",)
+    search_fields = ("user__username", "user__email")
+
+
+@admin.register(NotificationInbox)
+class NotificationInboxAdmin(admin.ModelAdmin):
+    """ユーザー毎の通知の未読件数の管理画面"""
+
+    list_display = ("user", "unread_count", "last_read_at")
+    search_fields = ("user__username", "user__email")
+    raw_id_fields = ("user",)
+
+
+@admin.register(ScheduledNotification)
+class ScheduledNotificationAdmin(admin.ModelAdmin):
+    """送信予定の講義開始通知の管理画面"""
+
+    list_display = ("title", "user", "lecture", "send_at", "sent_at")
+    list_filter = ("notification_type", "send_at")
+    search_fields = ("title", "body", "user__username")
+    date_hierarchy = "send_at"
+    raw_id_fields = ("user", "lecture")
+
+
+@admin.register(PushNotificationDailyStat)
+class PushNotificationDailyStatAdmin(admin.ModelAdmin):
+    """削除した通知ログの日次集計の管理画面"""
+
+    list_display = (
+        "date",
+        "notification_type",
+        "status",
+        "count",
+        "success_count",
+        "failure_count",
+    )
+    list_filter = ("notification_type", "status")
+    date_hierarchy = "date"
+
+    def has_add_permission(self, request):
+        """追加権限を無効化"""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """変更権限を無効化"""
+        return False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WebpushConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'webpush'
+
+    def ready(self):
+        import webpush.signals
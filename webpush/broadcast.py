@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from webpush.constants import (
+    BROADCAST_CHUNK_SIZE,
+    BROADCAST_PENDING,
+    BROADCAST_QUEUED,
+    DELIVERY_DEAD,
+    DELIVERY_PENDING,
+    DELIVERY_SENT,
+)
+from webpush.models import PushBroadcast, PushDelivery, PushSubscription
+from webpush.queue import enqueue_push_notifications
+from webpush.views import filter_subscriptions_by_type
+
+
+def get_broadcast_subscriptions(broadcast):
+    """一斉通知の送信先のサブスクリプション（通知設定でオフにしたものを除く）"""
+    subscriptions = filter_subscriptions_by_type(
+        PushSubscription.objects.all(), broadcast.notification_type
+    )
+    if not broadcast.to_all_users:
+        subscriptions = subscriptions.filter(
+            Exists(
+                PushBroadcast.users.through.objects.filter(
+                    pushbroadcast=broadcast, user=OuterRef("user")
+                )
+            )
+        )
+    return subscriptions
+
+
+def enqueue_broadcast_chunk(broadcast_id):
+    """
+    一斉通知の送信先を BROADCAST_CHUNK_SIZE 件だけ送信キューに積む
+
+    サブスクリプションのID順に積み、どこまで積んだかを保存するので、
+    ワーカーが中断しても続きから再開できる。
+
+    Returns:
+        bool: まだ積んでいない送信先が残っているかどうか
+    """
+    with transaction.atomic():
+        broadcast = (
+            PushBroadcast.objects.select_for_update(skip_locked=True)
+            .filter(pk=broadcast_id, status=BROADCAST_PENDING)
+            .first()
+        )
+        if broadcast is None:
+            return False
+
+        chunk = list(
+            get_broadcast_subscriptions(broadcast)
+            .filter(pk__gt=broadcast.last_subscription_id)
+            .order_by("pk")[:BROADCAST_CHUNK_SIZE]
+        )
+        notification = {
+            "title": broadcast.title,
+            "body": broadcast.body,
+            "url": broadcast.url,
+            "notification_type": broadcast.notification_type,
+            "broadcast_id": broadcast.pk,
+            "idempotency_key": f"broadcast:{broadcast.pk}",
+        }
+        broadcast.queued_count += enqueue_push_notifications(
+            (subscription, notification) for subscription in chunk
+        )
+
+        if len(chunk) < BROADCAST_CHUNK_SIZE:
+            broadcast.status = BROADCAST_QUEUED
+            broadcast.queued_at = timezone.now()
+        else:
+            broadcast.last_subscription_id = chunk[-1].pk
+        broadcast.save(
+            update_fields=[
+                "queued_count",
+                "status",
+                "queued_at",
+                "last_subscription_id",
+            ]
+        )
+        return broadcast.status == BROADCAST_PENDING
+
+
+def process_broadcasts():
+    """送信キューに積み終わっていない一斉通知を積む"""
+    broadcast_ids = PushBroadcast.objects.filter(status=BROADCAST_PENDING).values_list(
+        "pk", flat=True
+    )
+    for broadcast_id in broadcast_ids:
+        while enqueue_broadcast_chunk(broadcast_id):
+            pass
+
+
+def get_broadcast_progress(broadcast):
+    """一斉通知の送信状況を返す"""
+    counts = PushDelivery.objects.filter(log__broadcast=broadcast).aggregate(
+        pending=Count("pk", filter=Q(status=DELIVERY_PENDING)),
+        sent=Count("pk", filter=Q(status=DELIVERY_SENT)),
+        failed=Count("pk", filter=Q(status=DELIVERY_DEAD)),
+    )
+    return {
+        "status": broadcast.status,
+        "queued": broadcast.queued_count,
+        **counts,
+        "finished": broadcast.status == BROADCAST_QUEUED and not counts["pending"],
+    }
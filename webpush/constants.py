@@ -0,0 +1,64 @@
+# 講義開始通知を何分前に送るかの選択肢
+LECTURE_LEAD_MINUTES_CHOICES = [
+    (0, "開始時"),
+    (5, "5分前"),
+    (10, "10分前"),
+    (15, "15分前"),
+    (30, "30分前"),
+]
+
+# 送信予定時刻を過ぎた予約通知を送信する猶予（秒）
+# これより古い予約通知はワーカーの停止などで送れなかったものとして送信しない
+SCHEDULED_NOTIFICATION_GRACE_PERIOD = 60 * 15
+
+# 1回の実行で送信する予約通知の最大件数
+SCHEDULED_NOTIFICATION_BATCH_SIZE = 5000
+
+# 通知ログの状態
+LOG_STATUS_QUEUED = "queued"
+LOG_STATUS_SENT = "sent"
+LOG_STATUS_FAILED = "failed"
+
+# 送信キューの状態
+DELIVERY_PENDING = "pending"
+DELIVERY_SENT = "sent"
+DELIVERY_DEAD = "dead"
+
+DELIVERY_STATUS_CHOICES = [
+    (DELIVERY_PENDING, "送信待ち"),
+    (DELIVERY_SENT, "送信済み"),
+    (DELIVERY_DEAD, "送信失敗"),
+]
+
+# 再送するステータスコード（それ以外の 4xx は再送しても成功しない）
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+
+# 送信に失敗した場合の再送間隔（秒）。試行毎に2倍にする
+DELIVERY_RETRY_BASE_DELAY = 30
+DELIVERY_RETRY_MAX_DELAY = 60 * 60
+
+# この回数送信に失敗したら再送をやめる
+DELIVERY_MAX_ATTEMPTS = 6
+
+# 取り出した行を他のワーカーが取り出さないようにする時間（秒）
+# 送信中にワーカーが停止した場合は、この時間の経過後に再送される
+DELIVERY_LEASE_TIMEOUT = 60 * 5
+
+# 一斉通知の状態
+BROADCAST_PENDING = "pending"
+BROADCAST_QUEUED = "queued"
+
+BROADCAST_STATUS_CHOICES = [
+    (BROADCAST_PENDING, "送信キューに追加中"),
+    (BROADCAST_QUEUED, "送信キューに追加済み"),
+]
+
+# 一斉通知を送信キューに積む際の1回あたりのサブスクリプション数
+BROADCAST_CHUNK_SIZE = 1000
+
+# VAPID の JWT の有効期間（秒）。RFC 8292 により24時間を超えてはならない
+VAPID_TOKEN_LIFETIME = 60 * 60 * 12
+
+# 有効期限のこの時間前（秒）になったら署名し直す
+# プッシュサービスとの時計のずれや、送信キューでの待ち時間を見込む
+VAPID_TOKEN_REFRESH_MARGIN = 60 * 60
@@ -0,0 +1,80 @@
+import base64
+import time
+
+from django.core.management.base import BaseCommand
+from py_vapid import Vapid
+
+from webpush.sender import VapidHeaderCache
+
+# 主要なプッシュサービスのオリジン
+AUDIENCES = [
+    "https://fcm.googleapis.com",
+    "https://updates.push.services.mozilla.com",
+    "https://web.push.apple.com",
+]
+
+
+class Command(BaseCommand):
+    help = "VAPID ヘッダーのキャッシュの有無による署名の CPU 時間を比較するコマンド"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sends", type=int, default=1000, help="送信数 (デフォルト: 1000)"
+        )
+
+    def handle(self, *args, **options):
+        sends = options["sends"]
+
+        # 設定の鍵を使わないよう、計測用の鍵を生成する
+        vapid = Vapid()
+        vapid.generate_keys()
+        private_key = (
+            base64.urlsafe_b64encode(
+                vapid.private_key.private_numbers().private_value.to_bytes(32, "big")
+            )
+            .rstrip(b"=")
+            .decode()
+        )
+        subject = "mailto:benchmark@example.com"
+
+        def sign_per_send(i):
+            # 以前の webpush() 呼び出しと同じく、送信毎に鍵を読み込んで署名する
+            claims = {
+                "sub": subject,
+                "aud": AUDIENCES[i % len(AUDIENCES)],
+                "exp": int(time.time()) + 12 * 60 * 60,
+            }
+            Vapid.from_string(private_key=private_key).sign(claims)
+
+        def sign_with_parsed_key(i):
+            claims = {
+                "sub": subject,
+                "aud": AUDIENCES[i % len(AUDIENCES)],
+                "exp": int(time.time()) + 12 * 60 * 60,
+            }
+            vapid.sign(claims)
+
+        cache = VapidHeaderCache(vapid, subject)
+
+        def cached(i):
+            cache.get(AUDIENCES[i % len(AUDIENCES)])
+
+        results = [
+            ("送信毎に鍵の読み込みと署名", self.measure(sign_per_send, sends)),
+            ("送信毎に署名", self.measure(sign_with_parsed_key, sends)),
+            ("オリジン毎にキャッシュ", self.measure(cached, sends)),
+        ]
+
+        baseline = results[0][1]
+        self.stdout.write(f"{sends}件の送信あたりの CPU 時間:")
+        for label, elapsed in results:
+            self.stdout.write(
+                f"  {label}: {elapsed * 1000:.1f}ms "
+                f"(削減: {(baseline - elapsed) * 1000:.1f}ms)"
+            )
+
+    def measure(self, func, sends):
+        started = time.process_time()
+        for i in range(sends):
+            func(i)
+        return time.process_time() - started
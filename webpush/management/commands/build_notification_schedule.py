@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from webpush.schedule import build_lecture_notification_schedule
+
+
+class Command(BaseCommand):
+    help = "今日の講義開始通知の予定を生成するコマンド"
+
+    def handle(self, *args, **options):
+        count = build_lecture_notification_schedule()
+        self.stdout.write(f"講義開始通知の予定を生成しました: {count}件")
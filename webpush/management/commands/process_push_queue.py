@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from webpush.queue import get_push_queue_stats, process_push_queue
+
+
+class Command(BaseCommand):
+    help = "送信キューの通知を送信するコマンド"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stats", action="store_true", help="送信キューの状況のみを表示する"
+        )
+
+    def handle(self, *args, **options):
+        if not options["stats"]:
+            # 送信時刻を過ぎた通知がなくなるまで送信する
+            while True:
+                result = process_push_queue()
+                if not result["processed"]:
+                    break
+                self.stdout.write(
+                    f"送信済み={result['sent']}, 再送待ち={result['retried']}, "
+                    f"送信失敗={result['dead']}"
+                )
+
+        stats = get_push_queue_stats()
+        self.stdout.write(
+            f"送信待ち={stats['pending']} (送信時刻を過ぎたもの={stats['due']}), "
+            f"送信失敗={stats['dead']}, 最も古い送信待ち={stats['oldest_age']:.0f}秒前"
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from webpush.retention import rollup_push_notification_logs
+
+
+class Command(BaseCommand):
+    help = "保存期間を過ぎた通知ログを日毎に集計して削除するコマンド"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="通知ログを保存する日数（省略時は WEBPUSH_LOG_RETENTION_DAYS）",
+        )
+
+    def handle(self, *args, **options):
+        deleted = rollup_push_notification_logs(retention_days=options["days"])
+        self.stdout.write(f"{deleted}件の通知ログを集計して削除しました")
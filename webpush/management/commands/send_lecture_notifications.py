@@ -1,9 +1,10 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from academics.constants import TIME_SLOTS
-from academics.models import Registration, Schedule
+from django.db.models import F
 from academics.utils import get_current_term_and_year
-from webpush.views import send_push_notification
+from webpush.models import PushSubscription
+from webpush.schedule import build_lecture_notification
+from webpush.queue import enqueue_push_notifications, get_lecture_notification_key
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,51 +43,47 @@ class Command(BaseCommand):
         )
         self.stdout.write(f"年度: {fiscal_year}, ターム: {current_term.number}")
 
-        # 該当する講義のスケジュールを取得
-        schedule_ids = Schedule.objects.filter(
-            day=day_of_week, time=current_time_slot
-        ).values_list("id", flat=True)
-
-        if not schedule_ids:
-            self.stdout.write("該当するスケジュールはありません")
-            return
-
-        # 該当する登録情報を取得（現在のタームも考慮）
-        registrations = (
-            Registration.objects.filter(
-                lecture__schedules__id__in=schedule_ids,
-                lecture__terms__number=current_term.number,  # 現在のタームの講義のみ
-                year=fiscal_year,
+        # 該当する講義を登録しているユーザーのサブスクリプションを1クエリで取得する
+        subscriptions = (
+            PushSubscription.objects.filter(
+                user__registrations__year=fiscal_year,
+                user__registrations__lecture__terms__number=current_term.number,
+                user__registrations__lecture__schedules__day=day_of_week,
+                user__registrations__lecture__schedules__time=current_time_slot,
+            )
+            # filter と同じ結合を使って講義の情報を取得する
+            .annotate(
+                lecture_id=F("user__registrations__lecture_id"),
+                lecture_name=F("user__registrations__lecture__name"),
+                lecture_room=F("user__registrations__lecture__room"),
             )
-            .select_related("user", "lecture")
-            .distinct()
         )
 
-        self.stdout.write(f"通知対象の登録数: {registrations.count()}")
-
-        # 各ユーザーに通知を送信
-        success_count = 0
-        failed_count = 0
-
-        for registration in registrations:
-            user = registration.user
-            lecture = registration.lecture
-
-            # 講義開始通知の送信
-            time_info = TIME_SLOTS[current_time_slot]
-            title = f"出席を登録しよう！"
-            body = f"{lecture.name}（{time_info['start']}〜{time_info['end']}）が {lecture.room or '未設定'} で始まります"
-            url = f"/timetable/{fiscal_year}/{current_term.number}/{(day_of_week - 1) * 5 + current_time_slot}"
-
-            result = send_push_notification(
-                user=user, title=title, body=body, url=url, notification_type="lecture"
+        deliveries = []
+        users = set()
+        for subscription in subscriptions:
+            users.add(subscription.user_id)
+            notification = build_lecture_notification(
+                subscription.lecture_name,
+                subscription.lecture_room,
+                fiscal_year,
+                current_term.number,
+                day_of_week,
+                current_time_slot,
+            )
+            # 予約通知と同じ講義・日付の通知を二重に送らないようにする
+            notification["idempotency_key"] = get_lecture_notification_key(
+                timezone.localdate(now), subscription.lecture_id
             )
+            deliveries.append((subscription, notification))
 
-            success_count += result["success"]
-            failed_count += result["failed"]
+        self.stdout.write(
+            f"通知対象: ユーザー数={len(users)}, 送信数={len(deliveries)}"
+        )
 
-            self.stdout.write(
-                f"ユーザー {user.username} への通知: 成功={result['success']}, 失敗={result['failed']}"
-            )
+        if not deliveries:
+            return
+
+        queued = enqueue_push_notifications(deliveries)
 
-        self.stdout.write(f"通知送信完了: 成功={success_count}, 失敗={failed_count}")
+        self.stdout.write(f"通知を送信キューに追加しました: {queued}件")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from webpush.schedule import send_due_notifications
+
+
+class Command(BaseCommand):
+    help = "送信時刻を過ぎた予約通知を送信キューに積むコマンド"
+
+    def handle(self, *args, **options):
+        queued = send_due_notifications()
+        if queued is None:
+            return
+
+        self.stdout.write(f"予約通知を送信キューに追加しました: {queued}件")
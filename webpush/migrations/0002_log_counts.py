@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:08
+
+from django.db import migrations, models
+
+
+def populate_counts(apps, schema_editor):
+    # 既存のログはサブスクリプション毎に1件ずつ保存されている
+    PushNotificationLog = apps.get_model("webpush", "PushNotificationLog")
+    PushNotificationLog.objects.filter(status="sent").update(success_count=1)
+    PushNotificationLog.objects.filter(status="failed").update(failure_count=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webpush", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pushnotificationlog",
+            name="failure_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="pushnotificationlog",
+            name="success_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("academics", "0020_search"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("webpush", "0002_log_counts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationPreference",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "lecture_lead_minutes",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "開始時"),
+                            (5, "5分前"),
+                            (10, "10分前"),
+                            (15, "15分前"),
+                            (30, "30分前"),
+                        ],
+                        default=0,
+                    ),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notification_preference",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "通知設定",
+                "verbose_name_plural": "通知設定",
+            },
+        ),
+        migrations.CreateModel(
+            name="ScheduledNotification",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("send_at", models.DateTimeField()),
+                ("title", models.CharField(max_length=255)),
+                ("body", models.TextField()),
+                ("url", models.CharField(blank=True, max_length=500, null=True)),
+                (
+                    "notification_type",
+                    models.CharField(default="lecture", max_length=50),
+                ),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "lecture",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="scheduled_notifications",
+                        to="academics.lecture",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="scheduled_notifications",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "予約通知",
+                "verbose_name_plural": "予約通知",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("sent_at__isnull", True)),
+                        fields=["send_at"],
+                        name="scheduled_notification_due_idx",
+                    )
+                ],
+                "unique_together": {("user", "lecture", "send_at")},
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webpush", "0003_scheduled_notifications"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pushnotificationlog",
+            name="idempotency_key",
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name="PushDelivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "送信待ち"),
+                            ("sent", "送信済み"),
+                            ("dead", "送信失敗"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "last_status_code",
+                    models.PositiveSmallIntegerField(blank=True, null=True),
+                ),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "log",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deliveries",
+                        to="webpush.pushnotificationlog",
+                    ),
+                ),
+                (
+                    "subscription",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="deliveries",
+                        to="webpush.pushsubscription",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "送信キュー",
+                "verbose_name_plural": "送信キュー",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "pending")),
+                        fields=["next_attempt_at"],
+                        name="push_delivery_pending_idx",
+                    )
+                ],
+                "unique_together": {("log", "subscription")},
+            },
+        ),
+    ]
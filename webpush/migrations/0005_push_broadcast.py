@@ -0,0 +1,81 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("webpush", "0004_push_delivery"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PushBroadcast",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("title", models.CharField(max_length=255)),
+                ("body", models.TextField()),
+                ("url", models.CharField(blank=True, max_length=500, null=True)),
+                ("notification_type", models.CharField(max_length=50)),
+                ("to_all_users", models.BooleanField(default=False)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "送信キューに追加中"),
+                            ("queued", "送信キューに追加済み"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("queued_count", models.PositiveIntegerField(default=0)),
+                ("last_subscription_id", models.BigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("queued_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "users",
+                    models.ManyToManyField(
+                        blank=True, related_name="+", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "一斉通知",
+                "verbose_name_plural": "一斉通知",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.AddField(
+            model_name="pushnotificationlog",
+            name="broadcast",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="logs",
+                to="webpush.pushbroadcast",
+            ),
+        ),
+    ]
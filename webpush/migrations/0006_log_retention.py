@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("webpush", "0005_push_broadcast"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PushNotificationDailyStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("notification_type", models.CharField(max_length=50)),
+                ("status", models.CharField(max_length=50)),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("success_count", models.PositiveIntegerField(default=0)),
+                ("failure_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "プッシュ通知の日次集計",
+                "verbose_name_plural": "プッシュ通知の日次集計",
+                "ordering": ["-date", "notification_type", "status"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="pushnotificationlog",
+            index=models.Index(fields=["-sent_at"], name="push_log_sent_at_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="pushnotificationlog",
+            index=models.Index(
+                fields=["user", "-sent_at"], name="push_log_user_sent_at_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pushnotificationlog",
+            index=models.Index(
+                fields=["notification_type", "status"], name="push_log_type_status_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="pushnotificationdailystat",
+            unique_together={("date", "notification_type", "status")},
+        ),
+    ]
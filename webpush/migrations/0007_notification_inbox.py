@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("webpush", "0006_log_retention"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationInbox",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="notification_inbox",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("unread_count", models.PositiveIntegerField(default=0)),
+                ("last_read_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "通知の未読件数",
+                "verbose_name_plural": "通知の未読件数",
+            },
+        ),
+    ]
@@ -1,5 +1,14 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
+from django.utils import timezone
+from webpush.constants import (
+    BROADCAST_PENDING,
+    BROADCAST_STATUS_CHOICES,
+    DELIVERY_PENDING,
+    DELIVERY_STATUS_CHOICES,
+    LECTURE_LEAD_MINUTES_CHOICES,
+)
 
 
 class PushSubscription(models.Model):
@@ -40,11 +49,223 @@ class PushNotificationLog(models.Model):
     )  # 'task', 'article', 'system' など
     sent_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=50, default="sent")  # 'sent', 'failed' など
+    # ユーザーの端末（サブスクリプション）毎の送信結果の件数
+    success_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    # 同じ通知を二重に送らないためのキー
+    idempotency_key = models.CharField(
+        max_length=255, unique=True, null=True, blank=True
+    )
+    # 管理画面からの一斉通知の場合はその一斉通知
+    broadcast = models.ForeignKey(
+        "PushBroadcast",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="logs",
+    )
 
     class Meta:
         verbose_name = "プッシュ通知ログ"
         verbose_name_plural = "プッシュ通知ログ"
         ordering = ["-sent_at"]
+        indexes = [
+            # 管理画面の一覧（date_hierarchy）と保存期間を過ぎたログの削除のため
+            models.Index(fields=["-sent_at"], name="push_log_sent_at_idx"),
+            # ユーザー毎の通知履歴のため
+            models.Index(fields=["user", "-sent_at"], name="push_log_user_sent_at_idx"),
+            # 管理画面の絞り込みのため
+            models.Index(
+                fields=["notification_type", "status"], name="push_log_type_status_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.sent_at.strftime('%Y-%m-%d %H:%M')})"
+
+
+class PushBroadcast(models.Model):
+    """
+    管理画面から送信する一斉通知
+
+    ワーカーが対象のサブスクリプションを少しずつ送信キューに積む。
+    """
+
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    url = models.CharField(max_length=500, blank=True, null=True)
+    notification_type = models.CharField(max_length=50)
+    to_all_users = models.BooleanField(default=False)
+    # to_all_users が False の場合の送信先
+    users = models.ManyToManyField(User, blank=True, related_name="+")
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    status = models.CharField(
+        max_length=20, choices=BROADCAST_STATUS_CHOICES, default=BROADCAST_PENDING
+    )
+    queued_count = models.PositiveIntegerField(default=0)
+    # 送信キューに積み終わったサブスクリプションのID（中断しても続きから再開する）
+    last_subscription_id = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    queued_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "一斉通知"
+        verbose_name_plural = "一斉通知"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.title} ({self.created_at.strftime('%Y-%m-%d %H:%M')})"
+
+
+class PushDelivery(models.Model):
+    """
+    送信キューに積まれたサブスクリプション毎の通知
+
+    ワーカーが送信し、一時的な失敗は間隔を空けて再送する。
+    通知の内容は PushNotificationLog に保存する。
+    """
+
+    log = models.ForeignKey(
+        PushNotificationLog, on_delete=models.CASCADE, related_name="deliveries"
+    )
+    subscription = models.ForeignKey(
+        PushSubscription,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="deliveries",
+    )
+    status = models.CharField(
+        max_length=20, choices=DELIVERY_STATUS_CHOICES, default=DELIVERY_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "送信キュー"
+        verbose_name_plural = "送信キュー"
+        unique_together = ("log", "subscription")
+        indexes = [
+            # ワーカーが送信待ちの行を送信時刻順に取り出すため
+            models.Index(
+                fields=["next_attempt_at"],
+                name="push_delivery_pending_idx",
+                condition=Q(status=DELIVERY_PENDING),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.log.title} ({self.get_status_display()})"
+
+
+class NotificationPreference(models.Model):
+    """端末に依らないユーザー単位の通知設定"""
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="notification_preference"
+    )
+    # 講義開始の何分前に通知するか
+    lecture_lead_minutes = models.PositiveSmallIntegerField(
+        choices=LECTURE_LEAD_MINUTES_CHOICES, default=0
+    )
+
+    class Meta:
+        verbose_name = "通知設定"
+        verbose_name_plural = "通知設定"
+
+    def __str__(self):
+        return f"{self.user.username}の通知設定"
+
+
+class NotificationInbox(models.Model):
+    """
+    ユーザー毎の通知履歴の未読件数
+
+    通知が届く（送信済みになる）度に加算し、ユーザーが既読にしたら 0 に戻す。
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="notification_inbox",
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "通知の未読件数"
+        verbose_name_plural = "通知の未読件数"
+
+    def __str__(self):
+        return f"{self.user.username}の未読通知: {self.unread_count}件"
+
+
+class ScheduledNotification(models.Model):
+    """
+    送信予定の講義開始通知
+
+    1日分をまとめて生成しておき、スケジューラは送信時刻を過ぎた未送信の行を送信する。
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="scheduled_notifications"
+    )
+    lecture = models.ForeignKey(
+        "academics.Lecture",
+        on_delete=models.CASCADE,
+        related_name="scheduled_notifications",
+    )
+    send_at = models.DateTimeField()
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    url = models.CharField(max_length=500, blank=True, null=True)
+    notification_type = models.CharField(max_length=50, default="lecture")
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "予約通知"
+        verbose_name_plural = "予約通知"
+        unique_together = ("user", "lecture", "send_at")
+        indexes = [
+            # 未送信の行を送信時刻の範囲で取得するため
+            models.Index(
+                fields=["send_at"],
+                name="scheduled_notification_due_idx",
+                condition=Q(sent_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.send_at.strftime('%Y-%m-%d %H:%M')})"
+
+
+class PushNotificationDailyStat(models.Model):
+    """
+    保存期間を過ぎて削除した PushNotificationLog の日毎の集計
+
+    日付は TIME_ZONE での送信日。
+    """
+
+    date = models.DateField()
+    notification_type = models.CharField(max_length=50)
+    status = models.CharField(max_length=50)
+    # 集計したログ（ユーザー毎の通知）の件数
+    count = models.PositiveIntegerField(default=0)
+    # 端末（サブスクリプション）毎の送信結果の件数の合計
+    success_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "プッシュ通知の日次集計"
+        verbose_name_plural = "プッシュ通知の日次集計"
+        unique_together = ("date", "notification_type", "status")
+        ordering = ["-date", "notification_type", "status"]
+
+    def __str__(self):
+        return f"{self.date} {self.notification_type} {self.status}: {self.count}件"
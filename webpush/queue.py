@@ -0,0 +1,352 @@
+import datetime
+import json
+import logging
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    F,
+    Min,
+    OuterRef,
+    PositiveIntegerField,
+    Q,
+    When,
+)
+from django.utils import timezone
+
+from webpush.constants import (
+    DELIVERY_DEAD,
+    DELIVERY_LEASE_TIMEOUT,
+    DELIVERY_MAX_ATTEMPTS,
+    DELIVERY_PENDING,
+    DELIVERY_RETRY_BASE_DELAY,
+    DELIVERY_RETRY_MAX_DELAY,
+    DELIVERY_SENT,
+    LOG_STATUS_FAILED,
+    LOG_STATUS_QUEUED,
+    LOG_STATUS_SENT,
+    RETRYABLE_STATUS_CODES,
+)
+from webpush.models import (
+    NotificationInbox,
+    PushDelivery,
+    PushNotificationLog,
+    PushSubscription,
+)
+from webpush.sender import get_push_sender
+
+logger = logging.getLogger(__name__)
+
+
+def build_payload(title, body, url=None, notification_type="general"):
+    """Service Worker に送る通知のデータ"""
+    return json.dumps(
+        {"title": title, "body": body, "url": url or "/", "type": notification_type}
+    )
+
+
+def get_lecture_notification_key(date, lecture_id):
+    """
+    講義開始通知の idempotency_key
+
+    予約通知と時限毎のコマンドのどちらから積んでも同じキーになるため、同じ日の
+    同じ講義の通知は一度しか送られない。enqueue_push_notifications がユーザーIDを
+    付けるので、実際のキーは lecture:{日付}:{講義ID}:{ユーザーID} になる。
+    """
+    return f"lecture:{date.isoformat()}:{lecture_id}"
+
+
+def enqueue_push_notifications(deliveries):
+    """
+    サブスクリプション毎の通知を送信キューに積む
+
+    通知はユーザー毎に1件の PushNotificationLog にまとめ、端末毎の送信を
+    PushDelivery として保存する。通知に idempotency_key を指定した場合、
+    同じキーの通知を再度積んでも二重には送信しない。
+
+    Args:
+        deliveries: (サブスクリプション, 通知) の組のイテラブル。通知は title,
+            body, url, notification_type と、オプションの idempotency_key を
+            キーに持つ辞書
+
+    Returns:
+        int: 新たに送信キューに積んだ件数
+    """
+    batch_id = uuid.uuid4().hex
+    logs = {}
+    subscriptions = {}
+    for subscription, notification in deliveries:
+        notification = dict(notification)
+        base_key = notification.pop("idempotency_key", None)
+        group = (subscription.user_id, frozenset(notification.items()))
+        if group not in logs:
+            base_key = base_key or f"{batch_id}:{len(logs)}"
+            logs[group] = PushNotificationLog(
+                user_id=subscription.user_id,
+                status=LOG_STATUS_QUEUED,
+                idempotency_key=f"{base_key}:{subscription.user_id}",
+                **notification,
+            )
+            subscriptions[group] = []
+        subscriptions[group].append(subscription)
+
+    if not logs:
+        return 0
+
+    now = timezone.now()
+    batch_size = settings.WEBPUSH_SETTINGS["LOG_BATCH_SIZE"]
+    with transaction.atomic():
+        # 同じキーのログが既にある場合はそれを使う
+        PushNotificationLog.objects.bulk_create(
+            logs.values(), batch_size=batch_size, ignore_conflicts=True
+        )
+        log_ids = dict(
+            PushNotificationLog.objects.filter(
+                idempotency_key__in=[log.idempotency_key for log in logs.values()]
+            ).values_list("idempotency_key", "pk")
+        )
+        # ignore_conflicts では積まなかった行も返されるため、既に積んである
+        # 端末を除いてから作成し、実際に積んだ件数を返す
+        existing = set(
+            PushDelivery.objects.filter(log_id__in=log_ids.values()).values_list(
+                "log_id", "subscription_id"
+            )
+        )
+        deliveries = [
+            PushDelivery(
+                log_id=log_ids[log.idempotency_key],
+                subscription=subscription,
+                next_attempt_at=now,
+            )
+            for group, log in logs.items()
+            for subscription in subscriptions[group]
+            if (log_ids[log.idempotency_key], subscription.pk) not in existing
+        ]
+        # 同時に同じ通知を積んだ場合に備えて重複は無視する
+        PushDelivery.objects.bulk_create(
+            deliveries, batch_size=batch_size, ignore_conflicts=True
+        )
+    return len(deliveries)
+
+
+def get_retry_delay(attempts, retry_after=None):
+    """attempts 回目の送信に失敗した後、再送するまでの秒数"""
+    delay = min(
+        DELIVERY_RETRY_BASE_DELAY * 2 ** (attempts - 1), DELIVERY_RETRY_MAX_DELAY
+    )
+    if retry_after:
+        delay = max(delay, min(retry_after, DELIVERY_RETRY_MAX_DELAY))
+    return delay
+
+
+def is_retryable(result):
+    """一時的な失敗で、再送すれば成功する見込みがあるかどうか"""
+    if result.status_code is None:
+        # タイムアウトや接続エラー
+        return True
+    return result.status_code in RETRYABLE_STATUS_CODES or result.status_code >= 500
+
+
+def process_push_queue(now=None):
+    """
+    送信キューから送信時刻を過ぎた通知を取り出して送信する
+
+    取り出した行は DELIVERY_LEASE_TIMEOUT の間は他のワーカーから取り出されない。
+    一時的な失敗（429, 5xx, 接続エラー）は間隔を空けて再送し、
+    DELIVERY_MAX_ATTEMPTS 回失敗するか、再送できない失敗の場合は送信失敗とする。
+
+    Returns:
+        dict: 送信済み・再送待ち・送信失敗の件数
+    """
+    now = now or timezone.now()
+    stats = {"processed": 0, "sent": 0, "retried": 0, "dead": 0}
+
+    with transaction.atomic():
+        jobs = list(
+            PushDelivery.objects.filter(
+                status=DELIVERY_PENDING, next_attempt_at__lte=now
+            )
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("log", "subscription__user")
+            .order_by("next_attempt_at")[
+                : settings.WEBPUSH_SETTINGS["QUEUE_BATCH_SIZE"]
+            ]
+        )
+        PushDelivery.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            attempts=F("attempts") + 1,
+            next_attempt_at=now + datetime.timedelta(seconds=DELIVERY_LEASE_TIMEOUT),
+        )
+
+    if not jobs:
+        return stats
+
+    expires_at = now - datetime.timedelta(seconds=settings.WEBPUSH_SETTINGS["TTL"])
+    sendable = []
+    for job in jobs:
+        job.attempts += 1
+        if job.subscription is None:
+            mark_dead(job, "Subscription removed")
+        elif job.log.sent_at < expires_at:
+            # 届いても意味のない古い通知は送らない
+            mark_dead(job, "Expired")
+        else:
+            sendable.append(job)
+
+    results = get_push_sender().send(
+        (
+            job.subscription,
+            build_payload(
+                job.log.title, job.log.body, job.log.url, job.log.notification_type
+            ),
+        )
+        for job in sendable
+    )
+
+    gone = []
+    for job, result in zip(sendable, results):
+        job.last_status_code = result.status_code
+        if result.success:
+            job.status = DELIVERY_SENT
+            job.last_error = ""
+            continue
+
+        if result.is_gone:
+            gone.append(job.subscription.pk)
+            mark_dead(job, result.error)
+        elif is_retryable(result) and job.attempts < DELIVERY_MAX_ATTEMPTS:
+            job.last_error = result.error
+            job.next_attempt_at = now + datetime.timedelta(
+                seconds=get_retry_delay(job.attempts, result.retry_after)
+            )
+        else:
+            mark_dead(job, result.error)
+
+        logger.error(
+            f"通知送信エラー (User: {job.subscription.user.username}, "
+            f"試行回数: {job.attempts}): {result.error}"
+        )
+
+    PushDelivery.objects.bulk_update(
+        jobs,
+        ["status", "attempts", "next_attempt_at", "last_status_code", "last_error"],
+    )
+
+    # 無効なサブスクリプションは削除
+    if gone:
+        deleted = PushSubscription.objects.filter(pk__in=gone).delete()
+        logger.info(f"Delete result: {deleted}")
+
+    successes = Counter(job.log_id for job in jobs if job.status == DELIVERY_SENT)
+    failures = Counter(job.log_id for job in jobs if job.status == DELIVERY_DEAD)
+    update_log_counts(successes, failures)
+
+    stats["processed"] = len(jobs)
+    stats["sent"] = sum(successes.values())
+    stats["dead"] = sum(failures.values())
+    stats["retried"] = stats["processed"] - stats["sent"] - stats["dead"]
+    return stats
+
+
+def mark_dead(job, error):
+    job.status = DELIVERY_DEAD
+    job.last_error = error
+
+
+def update_log_counts(successes, failures):
+    """
+    送信が終わった端末の件数を通知ログに加算し、状態を更新する
+
+    1端末でも届いていれば送信済み、全端末の送信が終わって1件も届いて
+    いなければ送信失敗とする。送信済みになった通知はユーザーの未読件数に加算する。
+    """
+    log_ids = set(successes) | set(failures)
+    if not log_ids:
+        return
+
+    PushNotificationLog.objects.filter(pk__in=log_ids).update(
+        success_count=Case(
+            *[
+                When(pk=log_id, then=F("success_count") + count)
+                for log_id, count in successes.items()
+            ],
+            default=F("success_count"),
+            output_field=PositiveIntegerField(),
+        ),
+        failure_count=Case(
+            *[
+                When(pk=log_id, then=F("failure_count") + count)
+                for log_id, count in failures.items()
+            ],
+            default=F("failure_count"),
+            output_field=PositiveIntegerField(),
+        ),
+    )
+
+    queued = PushNotificationLog.objects.filter(
+        pk__in=log_ids, status=LOG_STATUS_QUEUED
+    )
+    with transaction.atomic():
+        # 同じ通知を複数のワーカーが同時に送信済みにしても二重に数えないよう、
+        # ロックしてから状態を変える
+        delivered = list(
+            queued.filter(success_count__gt=0)
+            .select_for_update()
+            .values_list("pk", "user_id")
+        )
+        PushNotificationLog.objects.filter(
+            pk__in=[log_id for log_id, _ in delivered]
+        ).update(status=LOG_STATUS_SENT)
+        add_unread_counts(Counter(user_id for _, user_id in delivered))
+    queued.filter(success_count=0).exclude(
+        Exists(PushDelivery.objects.filter(log=OuterRef("pk"), status=DELIVERY_PENDING))
+    ).update(status=LOG_STATUS_FAILED)
+
+
+def add_unread_counts(counts):
+    """
+    ユーザー毎の未読件数に加算する
+
+    Args:
+        counts: ユーザーIDをキー、加算する件数を値とする辞書
+    """
+    if not counts:
+        return
+    NotificationInbox.objects.bulk_create(
+        [NotificationInbox(user_id=user_id) for user_id in counts],
+        ignore_conflicts=True,
+    )
+    NotificationInbox.objects.filter(user_id__in=counts).update(
+        unread_count=Case(
+            *[
+                When(user_id=user_id, then=F("unread_count") + count)
+                for user_id, count in counts.items()
+            ],
+            default=F("unread_count"),
+            output_field=PositiveIntegerField(),
+        )
+    )
+
+
+def get_push_queue_stats(now=None):
+    """
+    送信キューの状況を返す
+
+    Returns:
+        dict: 送信待ち（pending）、うち送信時刻を過ぎたもの（due）、
+            送信失敗（dead）の件数と、最も古い送信待ちの経過秒数（oldest_age）
+    """
+    now = now or timezone.now()
+    stats = PushDelivery.objects.aggregate(
+        pending=Count("pk", filter=Q(status=DELIVERY_PENDING)),
+        due=Count("pk", filter=Q(status=DELIVERY_PENDING, next_attempt_at__lte=now)),
+        dead=Count("pk", filter=Q(status=DELIVERY_DEAD)),
+        oldest=Min("created_at", filter=Q(status=DELIVERY_PENDING)),
+    )
+    oldest = stats.pop("oldest")
+    stats["oldest_age"] = (now - oldest).total_seconds() if oldest else 0
+    return stats
@@ -0,0 +1,105 @@
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Sum
+from django.utils import timezone
+
+from webpush.constants import SCHEDULED_NOTIFICATION_GRACE_PERIOD
+from webpush.models import (
+    PushNotificationDailyStat,
+    PushNotificationLog,
+    ScheduledNotification,
+)
+
+
+def _start_of_day(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+def rollup_push_notification_logs(today=None, retention_days=None):
+    """
+    保存期間を過ぎた通知ログを日毎に集計して削除する
+
+    集計は PushNotificationDailyStat に (日付, 通知タイプ, 状態) 毎に加算する。
+    1日分ずつ集計と削除を同じトランザクションで行うので、途中で中断しても
+    二重に集計することはない。
+
+    Returns:
+        int: 削除した通知ログの件数
+    """
+    today = today or timezone.localdate()
+    if retention_days is None:
+        retention_days = settings.WEBPUSH_SETTINGS["LOG_RETENTION_DAYS"]
+    cutoff = _start_of_day(today - datetime.timedelta(days=retention_days))
+
+    deleted = 0
+    while True:
+        oldest = PushNotificationLog.objects.filter(sent_at__lt=cutoff).aggregate(
+            oldest=Min("sent_at")
+        )["oldest"]
+        if oldest is None:
+            return deleted
+        date = timezone.localdate(oldest)
+        deleted += rollup_day(date, until=cutoff)
+
+
+def rollup_day(date, until=None):
+    """
+    date に送信した通知ログ（until より前のもの）を集計して削除する
+
+    Returns:
+        int: 削除した通知ログの件数
+    """
+    end = _start_of_day(date + datetime.timedelta(days=1))
+    if until is not None:
+        end = min(end, until)
+    logs = PushNotificationLog.objects.filter(
+        sent_at__gte=_start_of_day(date), sent_at__lt=end
+    )
+
+    with transaction.atomic():
+        rows = (
+            logs.order_by()
+            .values("notification_type", "status")
+            .annotate(
+                count=Count("pk"),
+                success_count=Sum("success_count"),
+                failure_count=Sum("failure_count"),
+            )
+        )
+        for row in rows:
+            counts = {
+                "count": row["count"],
+                "success_count": row["success_count"],
+                "failure_count": row["failure_count"],
+            }
+            stat, created = PushNotificationDailyStat.objects.get_or_create(
+                date=date,
+                notification_type=row["notification_type"],
+                status=row["status"],
+                defaults=counts,
+            )
+            if not created:
+                PushNotificationDailyStat.objects.filter(pk=stat.pk).update(
+                    **{name: F(name) + value for name, value in counts.items()}
+                )
+
+        # 送信キューの行（PushDelivery）も CASCADE で削除される
+        _, deleted = logs.delete()
+    return deleted.get(PushNotificationLog._meta.label, 0)
+
+
+def delete_old_scheduled_notifications(now=None):
+    """
+    送信済みの予約通知と、送信の猶予を過ぎて送信されない予約通知を削除する
+
+    予定の生成は送信時刻がこれからの予定のみを作るので、削除しても作り直されない。
+
+    Returns:
+        int: 削除した予約通知の件数
+    """
+    now = now or timezone.now()
+    since = now - datetime.timedelta(seconds=SCHEDULED_NOTIFICATION_GRACE_PERIOD)
+    deleted, _ = ScheduledNotification.objects.filter(send_at__lte=since).delete()
+    return deleted
@@ -0,0 +1,154 @@
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from academics.constants import DAY_FRIDAY, MAX_TIME, TIME_SLOTS
+from academics.models import Registration
+from academics.utils import get_current_term_and_year
+from webpush.constants import (
+    SCHEDULED_NOTIFICATION_BATCH_SIZE,
+    SCHEDULED_NOTIFICATION_GRACE_PERIOD,
+)
+from webpush.models import PushSubscription, ScheduledNotification
+from webpush.queue import enqueue_push_notifications, get_lecture_notification_key
+
+
+def build_lecture_notification(name, room, fiscal_year, term_number, day, time):
+    """講義開始通知の内容を組み立てる"""
+    time_info = TIME_SLOTS[time]
+    return {
+        "title": "出席を登録しよう！",
+        "body": f"{name}（{time_info['start']}〜{time_info['end']}）が {room or '未設定'} で始まります",
+        "url": f"/timetable/{fiscal_year}/{term_number}/{(day - 1) * MAX_TIME + time}",
+        "notification_type": "lecture",
+    }
+
+
+def build_lecture_notification_schedule(user_ids=None):
+    """
+    今日の講義開始通知の予定を生成する
+
+    送信時刻がこれからの未送信の予定のみを作り直し、送信済みの予定や送信時刻を
+    過ぎた予定はそのまま残す。通知を受け取るサブスクリプションは送信時に取得する
+    ので、予定の生成後に購読したユーザーにも送信される。
+
+    Args:
+        user_ids: 対象のユーザーIDのリスト（省略時は全ユーザー）
+
+    Returns:
+        int: 生成した予定の数
+    """
+    now = timezone.now()
+    today = timezone.localdate(now)
+    day = today.isoweekday()
+    # 送信時刻の索引を使えるよう、日付ではなく時刻の範囲で絞り込む
+    end = timezone.make_aware(
+        datetime.datetime.combine(today + datetime.timedelta(days=1), datetime.time.min)
+    )
+
+    pending = ScheduledNotification.objects.filter(
+        sent_at__isnull=True, send_at__gt=now, send_at__lt=end
+    )
+    registrations = Registration.objects.none()
+
+    current_term, fiscal_year = get_current_term_and_year(today)
+    # 土日は通知しない
+    if current_term and day <= DAY_FRIDAY:
+        registrations = Registration.objects.filter(
+            year=fiscal_year,
+            lecture__terms__number=current_term.number,
+            lecture__schedules__day=day,
+        )
+    if user_ids is not None:
+        pending = pending.filter(user_id__in=user_ids)
+        registrations = registrations.filter(user_id__in=user_ids)
+
+    notifications = []
+    rows = registrations.values_list(
+        "user_id",
+        "lecture_id",
+        "lecture__name",
+        "lecture__room",
+        "lecture__schedules__time",
+        "user__notification_preference__lecture_lead_minutes",
+    )
+    for user_id, lecture_id, name, room, time, lead_minutes in rows:
+        start = timezone.make_aware(
+            datetime.datetime.combine(
+                today, datetime.time.fromisoformat(TIME_SLOTS[time]["start"])
+            )
+        )
+        send_at = start - datetime.timedelta(minutes=lead_minutes or 0)
+        if send_at <= now:
+            continue
+        notifications.append(
+            ScheduledNotification(
+                user_id=user_id,
+                lecture_id=lecture_id,
+                send_at=send_at,
+                **build_lecture_notification(
+                    name, room, fiscal_year, current_term.number, day, time
+                ),
+            )
+        )
+
+    with transaction.atomic():
+        pending.delete()
+        # 送信済みの予定と重複するものは作らない
+        ScheduledNotification.objects.bulk_create(notifications, ignore_conflicts=True)
+    return len(notifications)
+
+
+def send_due_notifications(now=None):
+    """
+    送信時刻を過ぎた未送信の予定を送信キューに積む
+
+    複数のプロセスから同時に実行されても同じ予定が二重に送られないよう、
+    行をロックしたまま送信キューに積み、同じトランザクションで送信済みにする。
+    途中で失敗した場合は送信済みにならず、次回に積み直す（idempotency_key に
+    より既に積んだ通知は二重に積まれない）。
+
+    Returns:
+        int: 送信キューに積んだ件数。送信する予定がない場合は None
+    """
+    now = now or timezone.now()
+    since = now - datetime.timedelta(seconds=SCHEDULED_NOTIFICATION_GRACE_PERIOD)
+
+    with transaction.atomic():
+        due = list(
+            ScheduledNotification.objects.filter(
+                sent_at__isnull=True, send_at__gt=since, send_at__lte=now
+            )
+            .select_for_update(skip_locked=True)
+            .order_by("send_at")[:SCHEDULED_NOTIFICATION_BATCH_SIZE]
+        )
+        if not due:
+            return None
+
+        subscriptions = {}
+        for subscription in PushSubscription.objects.filter(
+            user_id__in={notification.user_id for notification in due}
+        ):
+            subscriptions.setdefault(subscription.user_id, []).append(subscription)
+
+        deliveries = []
+        for notification in due:
+            message = {
+                "title": notification.title,
+                "body": notification.body,
+                "url": notification.url,
+                "notification_type": notification.notification_type,
+                # 時限毎のコマンドと同じ講義・日付の通知を二重に送らないようにする
+                "idempotency_key": get_lecture_notification_key(
+                    timezone.localdate(notification.send_at), notification.lecture_id
+                ),
+            }
+            for subscription in subscriptions.get(notification.user_id, []):
+                deliveries.append((subscription, message))
+
+        queued = enqueue_push_notifications(deliveries)
+        ScheduledNotification.objects.filter(
+            pk__in=[notification.pk for notification in due]
+        ).update(sent_at=now)
+    return queued
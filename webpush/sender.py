@@ -0,0 +1,342 @@
+import multiprocessing
+import threading
+import time
+import urllib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import requests
+from django.conf import settings
+from py_vapid import Vapid
+from pywebpush import WebPusher
+from requests.adapters import HTTPAdapter
+
+from webpush.constants import VAPID_TOKEN_LIFETIME, VAPID_TOKEN_REFRESH_MARGIN
+
+
+def get_audience_from_endpoint(endpoint):
+    parsed_url = urllib.parse.urlparse(endpoint)
+    audience = f"{parsed_url.scheme}://{parsed_url.netloc}"
+    return audience
+
+
+def encrypt_payload(subscription_info, payload, ttl):
+    """
+    ペイロードを aes128gcm で暗号化する
+
+    ECDH と HKDF を含む CPU 負荷の高い処理なので、プロセスプールで
+    実行できるようモジュールのトップレベルに置き、Django に依存させない。
+
+    Returns:
+        tuple: (暗号化した本文, Content-Encoding と TTL のヘッダー)
+    """
+    encoded = WebPusher(subscription_info).encode(payload.encode(), "aes128gcm")
+    return encoded["body"], {"Content-Encoding": "aes128gcm", "TTL": str(ttl)}
+
+
+def _encrypt_or_error(job):
+    """
+    encrypt_payload の結果を (結果, None) で、失敗した場合は (None, エラー) で返す
+
+    プロセスプールの map は例外が起きるとそれ以降の結果を返さないため、
+    例外は送らずに値として返す。
+    """
+    try:
+        return encrypt_payload(*job), None
+    except Exception as e:  # 不正な鍵など
+        return None, f"Encryption failed: {e!r}"
+
+
+def _get_subscription_info(subscription):
+    return {
+        "endpoint": subscription.endpoint,
+        "keys": {"p256dh": subscription.p256dh, "auth": subscription.auth},
+    }
+
+
+class PushResult:
+    """1件のサブスクリプションへの送信結果"""
+
+    def __init__(self, subscription, status_code=None, error=None, retry_after=None):
+        self.subscription = subscription
+        self.status_code = status_code
+        self.error = error
+        # プッシュサービスが Retry-After で指定した再送までの秒数
+        self.retry_after = retry_after
+
+    @property
+    def success(self):
+        return self.error is None
+
+    @property
+    def is_gone(self):
+        """サブスクリプションが無効になっている（削除すべき）かどうか"""
+        return self.status_code in (404, 410)
+
+
+class OriginLimiter:
+    """プッシュサービスのオリジン毎の同時接続数と送信レートの制限"""
+
+    def __init__(self, max_connections, rate_limit=0):
+        self._semaphore = threading.BoundedSemaphore(max_connections)
+        self._interval = 1 / rate_limit if rate_limit else 0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def __enter__(self):
+        self._semaphore.acquire()
+        if self._interval:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._next_time - now
+                self._next_time = max(now, self._next_time) + self._interval
+            if wait > 0:
+                time.sleep(wait)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._semaphore.release()
+
+
+class VapidHeaderCache:
+    """
+    プッシュサービスのオリジン（aud）毎に署名済みの VAPID ヘッダーを使い回す
+
+    VAPID の JWT の内容はオリジンと有効期限だけで決まるため、サブスクリプション
+    毎に ES256 で署名し直す必要はない。有効期限の VAPID_TOKEN_REFRESH_MARGIN 秒前に
+    なったら署名し直す。
+    """
+
+    def __init__(self, vapid, subject, lifetime=None, refresh_margin=None):
+        self.vapid = vapid
+        self.subject = subject
+        self.lifetime = lifetime or VAPID_TOKEN_LIFETIME
+        self.refresh_margin = (
+            refresh_margin if refresh_margin is not None else VAPID_TOKEN_REFRESH_MARGIN
+        )
+        self._lock = threading.Lock()
+        self._headers = {}
+
+    def get(self, audience):
+        """audience 宛ての署名済みヘッダー（呼び出し側で変更してよいコピー）を返す"""
+        now = int(time.time())
+        with self._lock:
+            cached = self._headers.get(audience)
+            if cached is None or cached[0] - self.refresh_margin <= now:
+                expires_at = now + self.lifetime
+                claims = {"sub": self.subject, "aud": audience, "exp": expires_at}
+                cached = (expires_at, self.vapid.sign(claims))
+                self._headers[audience] = cached
+            return dict(cached[1])
+
+
+class PushSender:
+    """
+    複数のサブスクリプションへプッシュ通知を並行して送信する
+
+    プッシュサービスのオリジン（FCM, Mozilla, Apple など）毎に keep-alive の
+    コネクションプールを持つ requests.Session を使い回し、オリジン毎に
+    同時接続数と送信レートを制限する。DB へのアクセスは呼び出し側で行う。
+
+    一度に ENCRYPTION_POOL_THRESHOLD 件以上を送信する場合は、ペイロードの
+    暗号化をプロセスプールで全コアに分散し、暗号化できたものから順に
+    送信スレッドに渡す。
+    """
+
+    def __init__(
+        self,
+        max_workers=None,
+        max_connections_per_origin=None,
+        rate_limit_per_origin=None,
+        timeout=None,
+        encryption_processes=None,
+        encryption_pool_threshold=None,
+    ):
+        options = settings.WEBPUSH_SETTINGS
+        self.max_workers = max_workers or options["MAX_WORKERS"]
+        self.max_connections_per_origin = (
+            max_connections_per_origin or options["MAX_CONNECTIONS_PER_ORIGIN"]
+        )
+        self.rate_limit_per_origin = (
+            rate_limit_per_origin
+            if rate_limit_per_origin is not None
+            else options["RATE_LIMIT_PER_ORIGIN"]
+        )
+        self.timeout = timeout or options["TIMEOUT"]
+        self.ttl = options["TTL"]
+        self.encryption_processes = (
+            encryption_processes
+            if encryption_processes is not None
+            else options["ENCRYPTION_PROCESSES"]
+        )
+        self.encryption_pool_threshold = (
+            encryption_pool_threshold or options["ENCRYPTION_POOL_THRESHOLD"]
+        )
+
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._limiters = {}
+        self._vapid_headers = None
+        self._encryption_pool = None
+
+    def _get_encryption_pool(self):
+        """暗号化用のプロセスプール（起動に時間がかかるので使い回す）"""
+        with self._lock:
+            if self._encryption_pool is None:
+                # スケジューラーのスレッドを抱えたプロセスを fork しないよう、
+                # 使える場合は forkserver で起動する
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context(
+                    "forkserver" if "forkserver" in methods else "spawn"
+                )
+                self._encryption_pool = ProcessPoolExecutor(
+                    max_workers=self.encryption_processes, mp_context=context
+                )
+            return self._encryption_pool
+
+    def _reset_encryption_pool(self):
+        with self._lock:
+            pool, self._encryption_pool = self._encryption_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        """暗号化用のプロセスを終了する"""
+        self._reset_encryption_pool()
+
+    def _get_vapid_headers(self, audience):
+        with self._lock:
+            if self._vapid_headers is None:
+                self._vapid_headers = VapidHeaderCache(
+                    Vapid.from_string(private_key=settings.VAPID_PRIVATE_KEY),
+                    f"mailto:{settings.VAPID_CLAIMS_EMAIL}",
+                )
+        return self._vapid_headers.get(audience)
+
+    def _get_origin(self, origin):
+        """オリジン毎のセッションと制限を取得する"""
+        with self._lock:
+            if origin not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=self.max_connections_per_origin
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[origin] = session
+                self._limiters[origin] = OriginLimiter(
+                    self.max_connections_per_origin, self.rate_limit_per_origin
+                )
+            return self._sessions[origin], self._limiters[origin]
+
+    def _deliver(self, subscription, encrypted):
+        """
+        暗号化済みのペイロードを送信する
+
+        Args:
+            encrypted: _encrypt_or_error の戻り値
+        """
+        prepared, error = encrypted
+        if error is not None:
+            return PushResult(subscription, error=error)
+        body, headers = prepared
+
+        origin = get_audience_from_endpoint(subscription.endpoint)
+        session, limiter = self._get_origin(origin)
+        # pywebpush の webpush() は送信毎に VAPID の署名を行うため、
+        # オリジン毎に署名済みのヘッダーを使い回す
+        try:
+            headers = {**self._get_vapid_headers(origin), **headers}
+            with limiter:
+                response = session.post(
+                    subscription.endpoint,
+                    data=body,
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+        except requests.RequestException as e:
+            return PushResult(subscription, error=str(e))
+
+        if response.status_code > 202:
+            retry_after = response.headers.get("Retry-After", "")
+            return PushResult(
+                subscription,
+                status_code=response.status_code,
+                error=f"Push failed: {response.status_code} {response.reason}\n"
+                f"Response body:{response.text}",
+                retry_after=int(retry_after) if retry_after.isdigit() else None,
+            )
+        return PushResult(subscription, status_code=response.status_code)
+
+    def _encrypt_and_deliver(self, subscription, job):
+        return self._deliver(subscription, _encrypt_or_error(job))
+
+    def _encrypt_in_pool(self, jobs):
+        """
+        プロセスプールで暗号化し、暗号化できたものから入力の順に返す
+
+        プールのプロセスが異常終了した場合は、残りを呼び出し元のスレッドで暗号化する。
+        """
+        chunksize = max(1, len(jobs) // (self.encryption_processes * 4))
+        done = 0
+        try:
+            for encrypted in self._get_encryption_pool().map(
+                _encrypt_or_error, jobs, chunksize=chunksize
+            ):
+                yield encrypted
+                done += 1
+        except BrokenProcessPool:
+            self._reset_encryption_pool()
+            for job in jobs[done:]:
+                yield _encrypt_or_error(job)
+
+    def send(self, deliveries):
+        """
+        (サブスクリプション, ペイロード) の組を並行して送信する
+
+        Returns:
+            list: 入力と同じ順序の PushResult のリスト
+        """
+        deliveries = list(deliveries)
+        jobs = [
+            (_get_subscription_info(subscription), payload, self.ttl)
+            for subscription, payload in deliveries
+        ]
+        if len(deliveries) <= 1:
+            return [
+                self._encrypt_and_deliver(subscription, job)
+                for (subscription, _), job in zip(deliveries, jobs)
+            ]
+
+        workers = min(self.max_workers, len(deliveries))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            if (
+                self.encryption_processes
+                and len(deliveries) >= self.encryption_pool_threshold
+            ):
+                # 暗号化の終わったものから送信スレッドに渡し、暗号化と送信を重ねる
+                futures = [
+                    executor.submit(self._deliver, subscription, encrypted)
+                    for (subscription, _), encrypted in zip(
+                        deliveries, self._encrypt_in_pool(jobs)
+                    )
+                ]
+            else:
+                futures = [
+                    executor.submit(self._encrypt_and_deliver, subscription, job)
+                    for (subscription, _), job in zip(deliveries, jobs)
+                ]
+            return [future.result() for future in futures]
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def get_push_sender():
+    """プロセス内で共有する PushSender を返す（コネクションを使い回すため）"""
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            _sender = PushSender()
+        return _sender
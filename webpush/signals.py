@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from academics.models import Registration
+from .models import NotificationPreference
+from .schedule import build_lecture_notification_schedule
+
+
+@receiver(post_save, sender=Registration)
+def rebuild_schedule_on_registration_save(sender, instance, **kwargs):
+    """登録した講義を今日の講義開始通知の予定に反映する"""
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and not {"user", "lecture", "year"} & set(
+        update_fields
+    ):
+        return
+    build_lecture_notification_schedule(user_ids=[instance.user_id])
+
+
+@receiver(post_delete, sender=Registration)
+def rebuild_schedule_on_registration_delete(sender, instance, origin=None, **kwargs):
+    # ユーザー削除に伴うカスケード削除では予定も削除されるため再生成しない
+    if isinstance(origin, User) or getattr(origin, "model", None) is User:
+        return
+    build_lecture_notification_schedule(user_ids=[instance.user_id])
+
+
+@receiver(post_save, sender=NotificationPreference)
+def rebuild_schedule_on_preference_save(sender, instance, **kwargs):
+    build_lecture_notification_schedule(user_ids=[instance.user_id])
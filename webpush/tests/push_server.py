@@ -0,0 +1,96 @@
+import base64
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from py_vapid import Vapid
+
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def generate_vapid_private_key():
+    """テスト用の VAPID 秘密鍵（base64url の生の鍵）を生成する"""
+    vapid = Vapid()
+    vapid.generate_keys()
+    return b64url(vapid.private_key.private_numbers().private_value.to_bytes(32, "big"))
+
+
+def generate_subscription_keys(key=None):
+    """テスト用のブラウザ側の鍵 (p256dh, auth) を生成する"""
+    key = key or ec.generate_private_key(ec.SECP256R1())
+    p256dh = key.public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+    )
+    return b64url(p256dh), b64url(b"0123456789abcdef")
+
+
+class StubPushServer:
+    """
+    プッシュサービスの代わりにリクエストを受け付けるローカルサーバー
+
+    パスが /gone/ で始まる場合は 410 を、/error/ で始まる場合は 500 を、
+    /throttle/ で始まる場合は Retry-After を付けて 429 を、/invalid/ で始まる
+    場合は 400 を返し、それ以外は 201 を返す。
+    """
+
+    def __init__(self, delay=0):
+        self.requests = []
+        # パス毎に受け取った（暗号化された）本文
+        self.bodies = {}
+        self.ports = set()
+        self.delay = delay
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                with server._lock:
+                    server.requests.append((self.path, self.headers))
+                    server.bodies[self.path] = body
+                    server.ports.add(self.client_address[1])
+                if server.delay:
+                    threading.Event().wait(server.delay)
+
+                headers = {}
+                if self.path.startswith("/gone/"):
+                    status = 410
+                elif self.path.startswith("/error/"):
+                    status = 500
+                elif self.path.startswith("/throttle/"):
+                    status = 429
+                    headers["Retry-After"] = "120"
+                elif self.path.startswith("/invalid/"):
+                    status = 400
+                else:
+                    status = 201
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.origin = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def endpoint(self, path):
+        return f"{self.origin}/{path}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
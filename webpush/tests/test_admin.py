@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from webpush.broadcast import process_broadcasts
+from webpush.models import PushBroadcast, PushDelivery, PushSubscription
+from webpush.queue import process_push_queue
+
+from .push_server import (
+    StubPushServer,
+    generate_subscription_keys,
+    generate_vapid_private_key,
+)
+
+VAPID_PRIVATE_KEY = generate_vapid_private_key()
+
+
+@override_settings(VAPID_PRIVATE_KEY=VAPID_PRIVATE_KEY)
+class BroadcastAdminTest(TestCase):
+    """管理画面からの一斉通知のテスト"""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="adminpass123"
+        )
+        self.client.login(username="admin", password="adminpass123")
+        self.p256dh, self.auth = generate_subscription_keys()
+        self.send_url = reverse("admin:send-notification")
+
+    def make_users(self, server, count, **flags):
+        users = []
+        for _ in range(count):
+            user = User.objects.create_user(username=f"user{User.objects.count()}")
+            PushSubscription.objects.create(
+                user=user,
+                endpoint=server.endpoint(f"ok/{user.pk}"),
+                p256dh=self.p256dh,
+                auth=self.auth,
+                **flags,
+            )
+            users.append(user)
+        return users
+
+    def broadcast(self, **data):
+        return self.client.post(
+            self.send_url,
+            {
+                "title": "お知らせ",
+                "body": "本文",
+                "url": "/",
+                "notification_type": "system",
+                "recipient_type": "all",
+                **data,
+            },
+        )
+
+    @mock.patch("webpush.broadcast.BROADCAST_CHUNK_SIZE", 2)
+    def test_broadcast_to_all(self):
+        """全ユーザーへの一斉通知がワーカーで通知設定に従って送られることを確認"""
+        with StubPushServer() as server:
+            self.make_users(server, 5)
+            self.make_users(server, 2, system_notices=False)
+            User.objects.create_user(username="nosubscription")
+
+            response = self.broadcast()
+            broadcast = PushBroadcast.objects.get()
+            self.assertRedirects(
+                response, reverse("admin:broadcast-progress", args=[broadcast.pk])
+            )
+            # リクエスト中には送信キューに積まない
+            self.assertFalse(PushDelivery.objects.exists())
+
+            process_broadcasts()
+            broadcast.refresh_from_db()
+            self.assertEqual(broadcast.status, "queued")
+            self.assertEqual(broadcast.queued_count, 5)
+
+            progress_url = reverse("admin:broadcast-progress", args=[broadcast.pk])
+            progress = self.client.get(progress_url, {"format": "json"}).json()
+            self.assertEqual(progress["pending"], 5)
+            self.assertFalse(progress["finished"])
+
+            process_push_queue()
+
+        self.assertEqual(len(server.requests), 5)
+        progress = self.client.get(progress_url, {"format": "json"}).json()
+        self.assertEqual(progress["sent"], 5)
+        self.assertTrue(progress["finished"])
+
+        response = self.client.get(progress_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "完了")
+
+    def test_broadcast_to_selected_users(self):
+        """選択したユーザーにのみ送られることを確認"""
+        with StubPushServer() as server:
+            users = self.make_users(server, 3)
+            self.broadcast(recipient_type="selected", users=[users[0].pk])
+            process_broadcasts()
+
+        delivery = PushDelivery.objects.select_related("subscription").get()
+        self.assertEqual(delivery.subscription.user, users[0])
+
+    def test_selected_users_required(self):
+        response = self.broadcast(recipient_type="selected")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(PushBroadcast.objects.exists())
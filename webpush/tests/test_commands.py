@@ -0,0 +1,91 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from academics.models import Lecture, Registration, Schedule, Term
+from webpush.models import PushNotificationLog, PushSubscription
+from webpush.queue import process_push_queue
+
+from .push_server import (
+    StubPushServer,
+    generate_subscription_keys,
+    generate_vapid_private_key,
+)
+
+VAPID_PRIVATE_KEY = generate_vapid_private_key()
+
+# 2025年4月14日（月）9:00
+NOW = timezone.make_aware(datetime.datetime(2025, 4, 14, 9, 0))
+
+
+@override_settings(VAPID_PRIVATE_KEY=VAPID_PRIVATE_KEY)
+@mock.patch("django.utils.timezone.now", return_value=NOW)
+class SendLectureNotificationsTest(TestCase):
+    """講義開始通知コマンドのテスト"""
+
+    def setUp(self):
+        term = Term.objects.get(number=1)
+        term.start_date = datetime.date(2025, 4, 1)
+        term.end_date = datetime.date(2025, 5, 31)
+        term.save()
+
+        self.p256dh, self.auth = generate_subscription_keys()
+        self.first = Lecture.objects.create(name="月1の講義", room="A101")
+        self.first.terms.add(term)
+        self.first.schedules.add(Schedule.objects.get(day=1, time=1))
+        self.second = Lecture.objects.create(name="月2の講義", room="A102")
+        self.second.terms.add(term)
+        self.second.schedules.add(Schedule.objects.get(day=1, time=2))
+
+    def make_user(self, server, username, lecture, devices=1):
+        user = User.objects.create_user(username=username)
+        Registration.objects.create(user=user, lecture=lecture, year=2025)
+        for i in range(devices):
+            PushSubscription.objects.create(
+                user=user,
+                endpoint=server.endpoint(f"{username}/{i}"),
+                p256dh=self.p256dh,
+                auth=self.auth,
+            )
+        return user
+
+    def test_notifies_registered_users(self, _):
+        """該当する時限の講義を登録しているユーザーの全端末に送信されることを確認"""
+        with StubPushServer() as server:
+            alice = self.make_user(server, "alice", self.first, devices=2)
+            bob = self.make_user(server, "bob", self.first)
+            self.make_user(server, "carol", self.second)
+
+            call_command("send_lecture_notifications", time_slot=1, stdout=StringIO())
+            process_push_queue()
+
+        self.assertEqual(len(server.requests), 3)
+        logs = PushNotificationLog.objects.order_by("user__username")
+        self.assertEqual([log.user for log in logs], [alice, bob])
+        self.assertEqual(logs[0].success_count, 2)
+        self.assertEqual(logs[0].body, "月1の講義（09:00〜10:30）が A101 で始まります")
+        self.assertEqual(logs[0].url, "/timetable/2025/1/1")
+
+    def test_query_count_independent_of_users(self, _):
+        """ユーザー数に関わらずサブスクリプションの取得が1クエリで済むことを確認"""
+        with StubPushServer() as server:
+            for i in range(5):
+                self.make_user(server, f"user{i}", self.first)
+
+            with CaptureQueriesContext(connection) as queries:
+                call_command(
+                    "send_lecture_notifications", time_slot=1, stdout=StringIO()
+                )
+            process_push_queue()
+
+        self.assertEqual(len(server.requests), 5)
+        # サブスクリプション + 送信キューに積む際のログIDと積み済みの端末
+        selects = [q for q in queries if q["sql"].startswith("SELECT")]
+        self.assertLessEqual(len(selects), 3)
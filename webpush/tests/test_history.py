@@ -0,0 +1,118 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from webpush.models import NotificationInbox, PushNotificationLog, PushSubscription
+from webpush.queue import process_push_queue
+from webpush.views import send_push_notification
+
+from .push_server import (
+    StubPushServer,
+    generate_subscription_keys,
+    generate_vapid_private_key,
+)
+
+VAPID_PRIVATE_KEY = generate_vapid_private_key()
+
+
+class NotificationHistoryTest(TestCase):
+    """通知履歴APIのテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice")
+        self.other = User.objects.create_user(username="bob")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def log(self, title, minutes_ago, user=None, status="sent"):
+        log = PushNotificationLog.objects.create(
+            user=user or self.user,
+            title=title,
+            body="本文",
+            notification_type="system",
+            status=status,
+        )
+        PushNotificationLog.objects.filter(pk=log.pk).update(
+            sent_at=timezone.now() - datetime.timedelta(minutes=minutes_ago)
+        )
+        return log
+
+    def test_history_pagination(self):
+        """自分に届いた通知を新しい順に重複なく辿れることを確認"""
+        for i in range(5):
+            self.log(f"通知{i}", minutes_ago=i)
+        # 同じ時刻に送信した通知も取りこぼさない
+        same_time = timezone.now() - datetime.timedelta(minutes=10)
+        for i in range(3):
+            log = self.log(f"同時{i}", minutes_ago=0)
+            PushNotificationLog.objects.filter(pk=log.pk).update(sent_at=same_time)
+        self.log("他人の通知", minutes_ago=0, user=self.other)
+        self.log("送信待ち", minutes_ago=0, status="queued")
+        self.log("送信失敗", minutes_ago=0, status="failed")
+
+        titles = []
+        url = reverse("push_notification_history") + "?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            titles += [log["title"] for log in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(titles[:5], [f"通知{i}" for i in range(5)])
+        self.assertEqual(sorted(titles[5:]), ["同時0", "同時1", "同時2"])
+
+    def test_requires_authentication(self):
+        """未ログインでは取得できないことを確認"""
+        response = APIClient().get(reverse("push_notification_history"))
+        self.assertIn(response.status_code, (401, 403))
+
+
+@override_settings(VAPID_PRIVATE_KEY=VAPID_PRIVATE_KEY)
+class UnreadNotificationCountTest(TestCase):
+    """通知の未読件数のテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("push_notification_unread")
+
+    def subscribe(self, endpoint):
+        p256dh, auth = generate_subscription_keys()
+        PushSubscription.objects.create(
+            user=self.user, endpoint=endpoint, p256dh=p256dh, auth=auth
+        )
+
+    def test_unread_count(self):
+        """届いた通知の件数が加算され、既読にすると 0 になることを確認"""
+        self.assertEqual(self.client.get(self.url).data, {"unread_count": 0})
+
+        with StubPushServer() as server:
+            # 2台の端末に届いても1件と数える
+            self.subscribe(server.endpoint("ok/1"))
+            self.subscribe(server.endpoint("ok/2"))
+            send_push_notification(self.user, "通知1", "本文")
+            send_push_notification(self.user, "通知2", "本文")
+            process_push_queue()
+            # 送信済みの通知を再度処理しても加算しない
+            process_push_queue()
+
+        self.assertEqual(self.client.get(self.url).data, {"unread_count": 2})
+        response = self.client.post(self.url)
+        self.assertEqual(response.data, {"unread_count": 0})
+        self.assertEqual(self.client.get(self.url).data, {"unread_count": 0})
+        self.assertIsNotNone(NotificationInbox.objects.get().last_read_at)
+
+    def test_failed_notification_not_counted(self):
+        """届かなかった通知は未読件数に加算されないことを確認"""
+        with StubPushServer() as server:
+            self.subscribe(server.endpoint("invalid/1"))
+            send_push_notification(self.user, "通知", "本文")
+            process_push_queue()
+
+        self.assertEqual(self.client.get(self.url).data, {"unread_count": 0})
@@ -0,0 +1,240 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from webpush.constants import (
+    DELIVERY_DEAD,
+    DELIVERY_MAX_ATTEMPTS,
+    DELIVERY_PENDING,
+    DELIVERY_RETRY_BASE_DELAY,
+    DELIVERY_SENT,
+)
+from webpush.models import PushDelivery, PushNotificationLog, PushSubscription
+from webpush.queue import get_push_queue_stats, process_push_queue
+from webpush.views import send_push_notification, send_push_notification_to_users
+
+from .push_server import (
+    StubPushServer,
+    generate_subscription_keys,
+    generate_vapid_private_key,
+)
+
+VAPID_PRIVATE_KEY = generate_vapid_private_key()
+
+
+@override_settings(VAPID_PRIVATE_KEY=VAPID_PRIVATE_KEY)
+class PushQueueTest(TestCase):
+    """送信キューのテスト"""
+
+    def setUp(self):
+        self.p256dh, self.auth = generate_subscription_keys()
+        self.user = User.objects.create_user(username="alice")
+
+    def subscribe(self, endpoint, user=None):
+        return PushSubscription.objects.create(
+            user=user or self.user,
+            endpoint=endpoint,
+            p256dh=self.p256dh,
+            auth=self.auth,
+        )
+
+    def process_at(self, **delta):
+        return process_push_queue(now=timezone.now() + datetime.timedelta(**delta))
+
+    def test_enqueue_returns_immediately(self):
+        """送信はキューに積むだけで、ワーカーが処理するまで送られないことを確認"""
+        with StubPushServer() as server:
+            self.subscribe(server.endpoint("ok/1"))
+            result = send_push_notification(self.user, "タイトル", "本文")
+            self.assertEqual(result, {"queued": 1, "errors": []})
+            self.assertEqual(server.requests, [])
+            self.assertEqual(PushNotificationLog.objects.get().status, "queued")
+
+            self.assertEqual(process_push_queue()["sent"], 1)
+
+        self.assertEqual(len(server.requests), 1)
+        log = PushNotificationLog.objects.get()
+        self.assertEqual(log.status, "sent")
+        self.assertEqual(log.success_count, 1)
+        self.assertEqual(PushDelivery.objects.get().status, DELIVERY_SENT)
+
+    def test_log_per_user(self):
+        """ログはユーザー毎に1件にまとめられ、端末毎の成否が件数で残ることを確認"""
+        with StubPushServer() as server:
+            self.subscribe(server.endpoint("ok/1"))
+            gone = self.subscribe(server.endpoint("gone/1"))
+            send_push_notification(self.user, "タイトル", "本文")
+            process_push_queue()
+
+        log = PushNotificationLog.objects.get()
+        self.assertEqual(log.status, "sent")
+        self.assertEqual(log.success_count, 1)
+        self.assertEqual(log.failure_count, 1)
+        # 無効なサブスクリプションは削除される
+        self.assertFalse(PushSubscription.objects.filter(pk=gone.pk).exists())
+
+    def test_idempotency_key(self):
+        """同じキーで積んだ通知は二重に送られないことを確認"""
+        with StubPushServer() as server:
+            self.subscribe(server.endpoint("ok/1"))
+            for _ in range(2):
+                send_push_notification(
+                    self.user, "タイトル", "本文", idempotency_key="notice:1"
+                )
+            process_push_queue()
+            send_push_notification(
+                self.user, "タイトル", "本文", idempotency_key="notice:1"
+            )
+            process_push_queue()
+
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(PushNotificationLog.objects.count(), 1)
+
+    def test_queued_count_excludes_duplicates(self):
+        """同じキーで積み直した場合は実際に積んだ件数だけを返すことを確認"""
+        self.subscribe("https://push.example.com/1")
+        result = send_push_notification(
+            self.user, "タイトル", "本文", idempotency_key="notice:1"
+        )
+        self.assertEqual(result["queued"], 1)
+
+        self.subscribe("https://push.example.com/2")
+        result = send_push_notification(
+            self.user, "タイトル", "本文", idempotency_key="notice:1"
+        )
+        self.assertEqual(result["queued"], 1)
+        self.assertEqual(PushDelivery.objects.count(), 2)
+
+    def test_retry_with_backoff(self):
+        """5xx は間隔を広げながら再送し、上限に達したら送信失敗とすることを確認"""
+        with StubPushServer() as server:
+            self.subscribe(server.endpoint("error/1"))
+            send_push_notification(self.user, "タイトル", "本文")
+
+            delivery = PushDelivery.objects.get()
+            for attempt in range(1, DELIVERY_MAX_ATTEMPTS):
+                now = delivery.next_attempt_at
+                result = process_push_queue(now=now)
+                self.assertEqual(result["retried"], 1)
+                # 再送時刻より前には取り出されない
+                self.assertEqual(process_push_queue(now=now)["processed"], 0)
+
+                delivery.refresh_from_db()
+                self.assertEqual(delivery.attempts, attempt)
+                self.assertEqual(delivery.last_status_code, 500)
+                self.assertEqual(
+                    delivery.next_attempt_at - now,
+                    datetime.timedelta(
+                        seconds=DELIVERY_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+                    ),
+                )
+
+            result = process_push_queue(now=delivery.next_attempt_at)
+            self.assertEqual(result["dead"], 1)
+
+        self.assertEqual(len(server.requests), DELIVERY_MAX_ATTEMPTS)
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, DELIVERY_DEAD)
+        log = PushNotificationLog.objects.get()
+        self.assertEqual(log.status, "failed")
+        self.assertEqual(log.failure_count, 1)
+
+    def test_retry_after(self):
+        """429 の Retry-After に従って再送を遅らせることを確認"""
+        with StubPushServer() as server:
+            self.subscribe(server.endpoint("throttle/1"))
+            send_push_notification(self.user, "タイトル", "本文")
+            now = timezone.now()
+            process_push_queue(now=now)
+
+        delivery = PushDelivery.objects.get()
+        self.assertEqual(delivery.status, DELIVERY_PENDING)
+        self.assertEqual(
+            delivery.next_attempt_at - now, datetime.timedelta(seconds=120)
+        )
+        # 再送待ちの間はログは送信待ちのまま
+        self.assertEqual(PushNotificationLog.objects.get().status, "queued")
+
+    def test_non_retryable_failure(self):
+        """再送しても成功しない 4xx はすぐに送信失敗とすることを確認"""
+        with StubPushServer() as server:
+            self.subscribe(server.endpoint("invalid/1"))
+            send_push_notification(self.user, "タイトル", "本文")
+            self.assertEqual(process_push_queue()["dead"], 1)
+
+    def test_expired_notification(self):
+        """有効期限を過ぎた通知は送信しないことを確認"""
+        with StubPushServer() as server:
+            self.subscribe(server.endpoint("ok/1"))
+            send_push_notification(self.user, "タイトル", "本文")
+            result = self.process_at(hours=13)
+
+        self.assertEqual(result["dead"], 1)
+        self.assertEqual(server.requests, [])
+
+    def test_queue_stats(self):
+        """送信キューの状況を取得できることを確認"""
+        with StubPushServer() as server:
+            self.subscribe(server.endpoint("ok/1"))
+            self.subscribe(server.endpoint("invalid/1"))
+            send_push_notification(self.user, "タイトル", "本文")
+            self.assertEqual(get_push_queue_stats()["pending"], 2)
+            self.assertEqual(get_push_queue_stats()["due"], 2)
+            process_push_queue()
+
+        stats = get_push_queue_stats()
+        self.assertEqual(stats["pending"], 0)
+        self.assertEqual(stats["dead"], 1)
+
+    def test_bulk_writes(self):
+        """キューへの追加と送信後の更新がユーザー数に依らないクエリ数で済むことを確認"""
+        with StubPushServer() as server:
+            users = []
+            for i in range(5):
+                user = User.objects.create_user(username=f"user{i}")
+                self.subscribe(server.endpoint(f"ok/{i}"), user=user)
+                users.append(user)
+
+            with CaptureQueriesContext(connection) as enqueue_queries:
+                send_push_notification_to_users(users, "タイトル", "本文")
+            with CaptureQueriesContext(connection) as process_queries:
+                process_push_queue()
+
+        self.assertEqual(len(server.requests), 5)
+        self.assertEqual(PushNotificationLog.objects.count(), 5)
+        inserts = [q for q in enqueue_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 2)
+        self.assertLessEqual(len(process_queries), 15)
+
+    def test_respects_notification_settings(self):
+        """通知設定でオフにした種類はキューに積まれないことを確認"""
+        subscription = self.subscribe("https://push.example.com/1")
+        subscription.system_notices = False
+        subscription.save()
+        result = send_push_notification(
+            self.user, "タイトル", "本文", notification_type="system"
+        )
+
+        self.assertEqual(result["errors"], ["No active subscriptions found"])
+        self.assertFalse(PushDelivery.objects.exists())
+
+    def test_test_notification_view(self):
+        """テスト通知APIはキューに積んで即座に返すことを確認"""
+        self.subscribe("https://push.example.com/1")
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.post(reverse("push_notification_test"), {}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["queued"], 1)
+        # 従来のクライアントが参照するキー
+        self.assertEqual(response.data["sent"], 1)
+        self.assertTrue(response.data["success"])
+        self.assertEqual(PushDelivery.objects.count(), 1)
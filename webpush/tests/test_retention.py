@@ -0,0 +1,141 @@
+import datetime
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from academics.models import Lecture
+from webpush.models import (
+    PushDelivery,
+    PushNotificationDailyStat,
+    PushNotificationLog,
+    PushSubscription,
+    ScheduledNotification,
+)
+from webpush.retention import (
+    delete_old_scheduled_notifications,
+    rollup_push_notification_logs,
+)
+
+
+def local(date, hour):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time(hour)))
+
+
+@override_settings(
+    WEBPUSH_SETTINGS={**settings.WEBPUSH_SETTINGS, "LOG_RETENTION_DAYS": 30}
+)
+class RollupPushNotificationLogsTest(TestCase):
+    """保存期間を過ぎた通知ログの集計と削除のテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="alice")
+        self.subscription = PushSubscription.objects.create(
+            user=self.user, endpoint="https://push.example.com/1", p256dh="", auth=""
+        )
+        self.today = datetime.date(2026, 6, 1)
+
+    def log(self, sent_at, notification_type="lecture", status="sent", success=1):
+        log = PushNotificationLog.objects.create(
+            user=self.user,
+            title="通知",
+            body="本文",
+            notification_type=notification_type,
+            status=status,
+            success_count=success,
+            failure_count=0 if success else 1,
+        )
+        PushNotificationLog.objects.filter(pk=log.pk).update(sent_at=sent_at)
+        PushDelivery.objects.create(log=log, subscription=self.subscription)
+        return log
+
+    def stats(self):
+        return {
+            (stat.date, stat.notification_type, stat.status): (
+                stat.count,
+                stat.success_count,
+                stat.failure_count,
+            )
+            for stat in PushNotificationDailyStat.objects.all()
+        }
+
+    def test_rollup_old_logs(self):
+        """保存期間を過ぎたログが日毎に集計されて削除されることを確認"""
+        old = self.today - datetime.timedelta(days=40)
+        self.log(local(old, 8))
+        self.log(local(old, 23))
+        self.log(local(old, 12), status="failed", success=0)
+        self.log(local(old, 12), notification_type="system")
+        older = old - datetime.timedelta(days=1)
+        self.log(local(older, 9))
+        recent = self.log(local(self.today - datetime.timedelta(days=29), 9))
+
+        deleted = rollup_push_notification_logs(today=self.today)
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(
+            self.stats(),
+            {
+                (old, "lecture", "sent"): (2, 2, 0),
+                (old, "lecture", "failed"): (1, 0, 1),
+                (old, "system", "sent"): (1, 1, 0),
+                (older, "lecture", "sent"): (1, 1, 0),
+            },
+        )
+        self.assertEqual(list(PushNotificationLog.objects.all()), [recent])
+        self.assertEqual(PushDelivery.objects.get().log, recent)
+
+    def test_rollup_adds_to_existing_stats(self):
+        """既に集計済みの日のログは集計に加算されることを確認"""
+        old = self.today - datetime.timedelta(days=40)
+        self.log(local(old, 8))
+        rollup_push_notification_logs(today=self.today)
+        self.log(local(old, 9))
+        rollup_push_notification_logs(today=self.today)
+
+        self.assertEqual(self.stats(), {(old, "lecture", "sent"): (2, 2, 0)})
+        self.assertFalse(PushNotificationLog.objects.exists())
+
+    def test_command(self):
+        """コマンドで保存日数を指定して実行できることを確認"""
+        self.log(timezone.now() - datetime.timedelta(days=3))
+        self.log(timezone.now())
+
+        out = StringIO()
+        call_command("rollup_push_notification_logs", days=1, stdout=out)
+
+        self.assertIn("1件", out.getvalue())
+        self.assertEqual(PushNotificationLog.objects.count(), 1)
+        self.assertEqual(PushNotificationDailyStat.objects.get().count, 1)
+
+
+class DeleteOldScheduledNotificationsTest(TestCase):
+    """使い終わった予約通知の削除のテスト"""
+
+    def test_delete_sent_and_stale(self):
+        """送信済みの予約通知と送信の猶予を過ぎた予約通知が削除されることを確認"""
+        user = User.objects.create_user(username="alice")
+        lecture = Lecture.objects.create(name="講義")
+        today = datetime.date(2026, 6, 1)
+        now = local(today, 12)
+
+        def schedule(send_at, sent_at=None):
+            return ScheduledNotification.objects.create(
+                user=user,
+                lecture=lecture,
+                send_at=send_at,
+                sent_at=sent_at,
+                title="通知",
+                body="本文",
+            )
+
+        schedule(local(today, 9), sent_at=local(today, 9))
+        schedule(local(today, 10))  # 送信されなかった予定
+        due = schedule(now - datetime.timedelta(minutes=5))  # まだ送信できる
+        upcoming = schedule(local(today, 13))
+
+        self.assertEqual(delete_old_scheduled_notifications(now=now), 2)
+        self.assertEqual(set(ScheduledNotification.objects.all()), {due, upcoming})
@@ -0,0 +1,225 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from academics.models import Lecture, Registration, Schedule, Term
+from webpush.models import (
+    NotificationPreference,
+    PushNotificationLog,
+    PushSubscription,
+    ScheduledNotification,
+)
+from webpush.queue import process_push_queue
+from webpush.schedule import build_lecture_notification_schedule, send_due_notifications
+
+from .push_server import (
+    StubPushServer,
+    generate_subscription_keys,
+    generate_vapid_private_key,
+)
+
+VAPID_PRIVATE_KEY = generate_vapid_private_key()
+
+
+def local(hour, minute=0, day=14):
+    # 2025年4月14日は月曜日
+    return timezone.make_aware(datetime.datetime(2025, 4, day, hour, minute))
+
+
+@override_settings(VAPID_PRIVATE_KEY=VAPID_PRIVATE_KEY)
+@mock.patch("django.utils.timezone.now", return_value=local(0, 5))
+class LectureNotificationScheduleTest(TestCase):
+    """講義開始通知の予定のテスト"""
+
+    def setUp(self):
+        term = Term.objects.get(number=1)
+        term.start_date = datetime.date(2025, 4, 1)
+        term.end_date = datetime.date(2025, 5, 31)
+        term.save()
+
+        self.p256dh, self.auth = generate_subscription_keys()
+        self.first = self.make_lecture("月1の講義", term, day=1, time=1)
+        self.second = self.make_lecture("月2の講義", term, day=1, time=2)
+        self.tuesday = self.make_lecture("火1の講義", term, day=2, time=1)
+
+    def make_lecture(self, name, term, day, time):
+        lecture = Lecture.objects.create(name=name, room="A101")
+        lecture.terms.add(term)
+        lecture.schedules.add(Schedule.objects.get(day=day, time=time))
+        return lecture
+
+    def make_user(self, username, endpoint=None):
+        user = User.objects.create_user(username=username)
+        PushSubscription.objects.create(
+            user=user,
+            endpoint=endpoint or f"https://push.example.com/{username}",
+            p256dh=self.p256dh,
+            auth=self.auth,
+        )
+        return user
+
+    def test_build_schedule(self, _):
+        """今日の講義の開始時刻（設定した何分前）に予定が作られることを確認"""
+        alice = self.make_user("alice")
+        NotificationPreference.objects.create(user=alice, lecture_lead_minutes=10)
+        for lecture in (self.first, self.second, self.tuesday):
+            Registration.objects.create(user=alice, lecture=lecture, year=2025)
+
+        ScheduledNotification.objects.all().delete()
+        self.assertEqual(build_lecture_notification_schedule(), 2)
+
+        rows = ScheduledNotification.objects.order_by("send_at")
+        self.assertEqual(
+            [(row.user, row.lecture_id, row.send_at) for row in rows],
+            [
+                (alice, str(self.first.pk), local(8, 50)),
+                (alice, str(self.second.pk), local(10, 30)),
+            ],
+        )
+        self.assertEqual(rows[0].url, "/timetable/2025/1/1")
+
+    def test_schedule_follows_registration(self, _):
+        """講義の登録・解除と通知設定の変更が予定に反映されることを確認"""
+        alice = self.make_user("alice")
+        registration = Registration.objects.create(
+            user=alice, lecture=self.first, year=2025
+        )
+        self.assertEqual(
+            ScheduledNotification.objects.get(user=alice).send_at, local(9)
+        )
+
+        NotificationPreference.objects.create(user=alice, lecture_lead_minutes=15)
+        self.assertEqual(
+            ScheduledNotification.objects.get(user=alice).send_at, local(8, 45)
+        )
+
+        registration.delete()
+        self.assertFalse(ScheduledNotification.objects.exists())
+
+    def test_subscribe_after_build(self, _):
+        """予定の生成後に購読したユーザーにも通知が送られることを確認"""
+        alice = User.objects.create_user(username="alice")
+        Registration.objects.create(user=alice, lecture=self.first, year=2025)
+        build_lecture_notification_schedule()
+
+        PushSubscription.objects.create(
+            user=alice,
+            endpoint="https://push.example.com/alice",
+            p256dh=self.p256dh,
+            auth=self.auth,
+        )
+        self.assertEqual(send_due_notifications(now=local(9)), 1)
+
+    def test_rebuild_skips_past_notifications(self, mock_now):
+        """日中に作り直しても送信時刻を過ぎた予定は作らないことを確認"""
+        alice = self.make_user("alice")
+        Registration.objects.create(user=alice, lecture=self.first, year=2025)
+        ScheduledNotification.objects.all().delete()
+
+        mock_now.return_value = local(9, 5)
+        Registration.objects.create(user=alice, lecture=self.second, year=2025)
+        self.assertEqual(
+            list(ScheduledNotification.objects.values_list("send_at", flat=True)),
+            [local(10, 40)],
+        )
+
+    def test_no_schedule_on_weekend(self, mock_now):
+        alice = self.make_user("alice")
+        Registration.objects.create(user=alice, lecture=self.first, year=2025)
+        mock_now.return_value = local(0, 5, day=19)  # 土曜日
+        self.assertEqual(build_lecture_notification_schedule(), 0)
+
+    def test_send_due_notifications(self, mock_now):
+        """送信時刻を過ぎた予定だけが一度だけ送信されることを確認"""
+        with StubPushServer() as server:
+            alice = self.make_user("alice", server.endpoint("alice"))
+            Registration.objects.create(user=alice, lecture=self.first, year=2025)
+            Registration.objects.create(user=alice, lecture=self.second, year=2025)
+
+            self.assertIsNone(send_due_notifications(now=local(8, 59)))
+
+            queued = send_due_notifications(
+                now=local(9) + datetime.timedelta(seconds=30)
+            )
+            self.assertEqual(queued, 1)
+            self.assertIsNone(send_due_notifications(now=local(9, 1)))
+            process_push_queue()
+
+        self.assertEqual(len(server.requests), 1)
+        log = PushNotificationLog.objects.get()
+        self.assertEqual(log.body, "月1の講義（09:00〜10:30）が A101 で始まります")
+
+        # 送信済みの予定は作り直しても残り、重複しない
+        mock_now.return_value = local(9, 5)
+        build_lecture_notification_schedule()
+        self.assertEqual(ScheduledNotification.objects.count(), 2)
+        self.assertEqual(
+            ScheduledNotification.objects.filter(sent_at__isnull=False).count(), 1
+        )
+
+    def test_no_duplicate_with_command(self, mock_now):
+        """予約通知と時限毎のコマンドの両方から同じ講義の通知が送られないことを確認"""
+        with StubPushServer() as server:
+            alice = self.make_user("alice", server.endpoint("alice"))
+            Registration.objects.create(user=alice, lecture=self.first, year=2025)
+
+            self.assertEqual(send_due_notifications(now=local(9)), 1)
+            mock_now.return_value = local(9)
+            call_command("send_lecture_notifications", time_slot=1, stdout=StringIO())
+            process_push_queue()
+
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(PushNotificationLog.objects.count(), 1)
+
+    def test_enqueue_failure_keeps_notification(self, _):
+        """送信キューに積めなかった予定は送信済みにならず、次回に積まれることを確認"""
+        alice = self.make_user("alice")
+        Registration.objects.create(user=alice, lecture=self.first, year=2025)
+
+        with mock.patch(
+            "webpush.schedule.enqueue_push_notifications", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                send_due_notifications(now=local(9))
+        self.assertFalse(
+            ScheduledNotification.objects.filter(sent_at__isnull=False).exists()
+        )
+
+        self.assertEqual(send_due_notifications(now=local(9)), 1)
+        self.assertIsNone(send_due_notifications(now=local(9)))
+
+    def test_skip_stale_notifications(self, _):
+        """送信時刻から時間が経ちすぎた予定は送信しないことを確認"""
+        alice = self.make_user("alice")
+        Registration.objects.create(user=alice, lecture=self.first, year=2025)
+        self.assertIsNone(send_due_notifications(now=local(10)))
+
+    def test_update_lead_minutes(self, _):
+        """通知設定APIで講義開始通知のタイミングを変更できることを確認"""
+        alice = self.make_user("alice")
+        client = APIClient()
+        client.force_authenticate(user=alice)
+        url = reverse("push_notification_settings")
+
+        response = client.patch(
+            url,
+            {"endpoint": "https://push.example.com/alice", "lecture_lead_minutes": 7},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = client.patch(
+            url,
+            {"endpoint": "https://push.example.com/alice", "lecture_lead_minutes": 10},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["lecture_lead_minutes"], 10)
+        self.assertEqual(alice.notification_preference.lecture_lead_minutes, 10)
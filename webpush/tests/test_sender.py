@@ -0,0 +1,184 @@
+import json
+import time
+from unittest import mock
+
+import http_ece
+from cryptography.hazmat.primitives.asymmetric import ec
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from webpush.models import PushSubscription
+from webpush.sender import OriginLimiter, PushSender, VapidHeaderCache
+
+from .push_server import (
+    StubPushServer,
+    generate_subscription_keys,
+    generate_vapid_private_key,
+)
+
+VAPID_PRIVATE_KEY = generate_vapid_private_key()
+
+
+@override_settings(VAPID_PRIVATE_KEY=VAPID_PRIVATE_KEY)
+class PushSenderTest(TestCase):
+    """PushSender による並行送信のテスト"""
+
+    def setUp(self):
+        self.key = ec.generate_private_key(ec.SECP256R1())
+        self.p256dh, self.auth = generate_subscription_keys(self.key)
+
+    def decrypt(self, body):
+        return http_ece.decrypt(
+            body,
+            private_key=self.key,
+            auth_secret=b"0123456789abcdef",
+            version="aes128gcm",
+        )
+
+    def make_subscriptions(self, server, count, prefix="ok"):
+        subscriptions = []
+        for i in range(count):
+            user = User.objects.create_user(username=f"{prefix}{i}")
+            subscriptions.append(
+                PushSubscription.objects.create(
+                    user=user,
+                    endpoint=server.endpoint(f"{prefix}/{i}"),
+                    p256dh=self.p256dh,
+                    auth=self.auth,
+                )
+            )
+        return subscriptions
+
+    def test_send_concurrently(self):
+        """複数のサブスクリプションに並行して送信されることを確認"""
+        with StubPushServer(delay=0.2) as server:
+            subscriptions = self.make_subscriptions(server, 10)
+            sender = PushSender(max_workers=10, max_connections_per_origin=10)
+
+            started = time.monotonic()
+            results = sender.send((s, "{}") for s in subscriptions)
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(len(server.requests), 10)
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual([r.subscription for r in results], subscriptions)
+        # 直列なら 2 秒以上かかる
+        self.assertLess(elapsed, 1.5)
+
+    def test_connections_reused(self):
+        """同じオリジンへの接続が使い回されることを確認"""
+        with StubPushServer() as server:
+            subscriptions = self.make_subscriptions(server, 6)
+            sender = PushSender(max_workers=2, max_connections_per_origin=2)
+            sender.send((s, "{}") for s in subscriptions)
+
+        self.assertEqual(len(server.requests), 6)
+        self.assertLessEqual(len(server.ports), 2)
+
+    def test_vapid_headers(self):
+        """VAPID の Authorization ヘッダーと暗号化済みの本文が送られることを確認"""
+        with StubPushServer() as server:
+            subscriptions = self.make_subscriptions(server, 1)
+            PushSender().send([(subscriptions[0], '{"title": "t"}')])
+
+        _, headers = server.requests[0]
+        self.assertTrue(headers["Authorization"].startswith("vapid t="))
+        self.assertEqual(headers["Content-Encoding"], "aes128gcm")
+
+    def test_failure_status(self):
+        """失敗したステータスコードが結果に含まれることを確認"""
+        with StubPushServer() as server:
+            gone = self.make_subscriptions(server, 1, prefix="gone")
+            error = self.make_subscriptions(server, 1, prefix="error")
+            throttle = self.make_subscriptions(server, 1, prefix="throttle")
+            results = PushSender().send(
+                [(gone[0], "{}"), (error[0], "{}"), (throttle[0], "{}")]
+            )
+
+        self.assertEqual([r.status_code for r in results], [410, 500, 429])
+        self.assertFalse(any(r.success for r in results))
+        self.assertTrue(results[0].is_gone)
+        self.assertFalse(results[1].is_gone)
+        self.assertEqual(results[2].retry_after, 120)
+
+    def test_encryption_pool(self):
+        """プロセスプールで暗号化したペイロードが復号できることを確認"""
+        sender = PushSender(encryption_processes=2, encryption_pool_threshold=2)
+        self.addCleanup(sender.close)
+        with StubPushServer() as server:
+            subscriptions = self.make_subscriptions(server, 4)
+            results = sender.send(
+                (s, json.dumps({"title": f"t{i}"})) for i, s in enumerate(subscriptions)
+            )
+
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual([r.subscription for r in results], subscriptions)
+        for i in range(4):
+            payload = json.loads(self.decrypt(server.bodies[f"/ok/{i}"]))
+            self.assertEqual(payload, {"title": f"t{i}"})
+
+    def test_encryption_error(self):
+        """暗号化できないサブスクリプションがあっても他には送信されることを確認"""
+        sender = PushSender(encryption_processes=2, encryption_pool_threshold=2)
+        self.addCleanup(sender.close)
+        with StubPushServer() as server:
+            subscriptions = self.make_subscriptions(server, 3)
+            subscriptions[1].p256dh = "invalid"
+            results = sender.send((s, "{}") for s in subscriptions)
+
+        self.assertEqual([r.success for r in results], [True, False, True])
+        self.assertIsNone(results[1].status_code)
+        self.assertIn("Encryption failed", results[1].error)
+        self.assertEqual(len(server.requests), 2)
+
+    def test_origin_limiter(self):
+        """オリジン毎の送信レートが制限されることを確認"""
+        limiter = OriginLimiter(max_connections=4, rate_limit=20)
+        started = time.monotonic()
+        for _ in range(5):
+            with limiter:
+                pass
+        # 20件/秒なら5件目は 0.2 秒後
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+
+class VapidHeaderCacheTest(TestCase):
+    """VAPID ヘッダーのキャッシュのテスト"""
+
+    def setUp(self):
+        self.vapid = mock.Mock()
+        self.vapid.sign.side_effect = lambda claims: {
+            "Authorization": f"vapid t={claims['aud']}:{claims['exp']}"
+        }
+        self.cache = VapidHeaderCache(
+            self.vapid, "mailto:test@example.com", lifetime=3600, refresh_margin=600
+        )
+
+    def test_sign_once_per_audience(self):
+        """同じオリジンへの送信では署名が1回で済むことを確認"""
+        for _ in range(100):
+            self.cache.get("https://fcm.googleapis.com")
+            self.cache.get("https://web.push.apple.com")
+
+        self.assertEqual(self.vapid.sign.call_count, 2)
+        claims = self.vapid.sign.call_args_list[0].args[0]
+        self.assertEqual(claims["aud"], "https://fcm.googleapis.com")
+        self.assertEqual(claims["sub"], "mailto:test@example.com")
+
+    def test_refresh_before_expiry(self):
+        """有効期限が近づいたら署名し直すことを確認"""
+        with mock.patch("webpush.sender.time.time", return_value=1000):
+            first = self.cache.get("https://fcm.googleapis.com")
+        with mock.patch("webpush.sender.time.time", return_value=1000 + 2999):
+            self.assertEqual(self.cache.get("https://fcm.googleapis.com"), first)
+        with mock.patch("webpush.sender.time.time", return_value=1000 + 3000):
+            refreshed = self.cache.get("https://fcm.googleapis.com")
+
+        self.assertNotEqual(refreshed, first)
+        self.assertEqual(self.vapid.sign.call_count, 2)
+
+    def test_returns_copy(self):
+        """返したヘッダーを変更してもキャッシュに影響しないことを確認"""
+        headers = self.cache.get("https://fcm.googleapis.com")
+        headers["TTL"] = "0"
+        self.assertNotIn("TTL", self.cache.get("https://fcm.googleapis.com"))
@@ -1,7 +1,9 @@
 from django.urls import path
 from .views import (
+    NotificationHistoryView,
     PushSubscriptionView,
     TestPushNotificationView,
+    UnreadNotificationCountView,
     UpdateNotificationSettingsView,
 )
 
@@ -20,4 +22,14 @@ urlpatterns = [
         name="push_notification_settings",
     ),
     path("test/", TestPushNotificationView.as_view(), name="push_notification_test"),
+    path(
+        "history/",
+        NotificationHistoryView.as_view(),
+        name="push_notification_history",
+    ),
+    path(
+        "history/unread/",
+        UnreadNotificationCountView.as_view(),
+        name="push_notification_unread",
+    ),
 ]
@@ -1,15 +1,19 @@
-import base64
-import time
+from django.conf import settings
+from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import generics, status
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
-from pywebpush import webpush, WebPushException
-import json
-from django.conf import settings
-import urllib
-from .models import PushSubscription, PushNotificationLog
-from .serializers import PushSubscriptionSerializer
+from .constants import LECTURE_LEAD_MINUTES_CHOICES, LOG_STATUS_SENT
+from .models import (
+    NotificationInbox,
+    NotificationPreference,
+    PushNotificationLog,
+    PushSubscription,
+)
+from .queue import enqueue_push_notifications
+from .serializers import PushNotificationLogSerializer, PushSubscriptionSerializer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -116,7 +120,17 @@ class UpdateNotificationSettingsView(APIView):
             # Noneの値はアップデートから除外
             settings_data = {k: v for k, v in settings_data.items() if v is not None}
 
-            if not settings_data:
+            # 講義開始通知のタイミングは端末ではなくユーザー単位の設定
+            lead_minutes = request.data.get("lecture_lead_minutes")
+            if lead_minutes is not None and lead_minutes not in dict(
+                LECTURE_LEAD_MINUTES_CHOICES
+            ):
+                return Response(
+                    {"error": "Invalid lecture_lead_minutes"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            if not settings_data and lead_minutes is None:
                 return Response(
                     {"error": "No settings provided"},
                     status=status.HTTP_400_BAD_REQUEST,
@@ -138,10 +152,18 @@ class UpdateNotificationSettingsView(APIView):
 
             subscription.save()
 
+            preference, _ = NotificationPreference.objects.get_or_create(
+                user=request.user
+            )
+            if lead_minutes is not None:
+                preference.lecture_lead_minutes = lead_minutes
+                preference.save()
+
             return Response(
                 {
                     "success": True,
                     "subscription": PushSubscriptionSerializer(subscription).data,
+                    "lecture_lead_minutes": preference.lecture_lead_minutes,
                 }
             )
 
@@ -152,10 +174,57 @@ class UpdateNotificationSettingsView(APIView):
             )
 
 
-def get_audience_from_endpoint(endpoint):
-    parsed_url = urllib.parse.urlparse(endpoint)
-    audience = f"{parsed_url.scheme}://{parsed_url.netloc}"
-    return audience
+class NotificationHistoryPagination(CursorPagination):
+    """
+    通知履歴のカーソルページネーション
+
+    (sent_at, id) の降順に辿るので、OFFSET を使わずに
+    (user_id, sent_at DESC) のインデックスで次のページを取得できる。
+    """
+
+    page_size = settings.APP_SETTINGS["DEFAULT_PAGE_SIZE"]
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-sent_at", "-id")
+
+
+class NotificationHistoryView(generics.ListAPIView):
+    """自分に届いた通知の履歴を新しい順に返すAPI"""
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = PushNotificationLogSerializer
+    pagination_class = NotificationHistoryPagination
+
+    def get_queryset(self):
+        return PushNotificationLog.objects.filter(
+            user=self.request.user, status=LOG_STATUS_SENT
+        ).only(*PushNotificationLogSerializer.Meta.fields)
+
+
+class UnreadNotificationCountView(APIView):
+    """
+    通知履歴の未読件数を返すAPI
+
+    GET で未読件数を返し、POST で全件を既読にする。
+    未読件数は通知が届く度に加算しているので、通知ログを数え直すことはない。
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        unread_count = (
+            NotificationInbox.objects.filter(user=request.user)
+            .values_list("unread_count", flat=True)
+            .first()
+        )
+        return Response({"unread_count": unread_count or 0})
+
+    def post(self, request):
+        NotificationInbox.objects.update_or_create(
+            user=request.user,
+            defaults={"unread_count": 0, "last_read_at": timezone.now()},
+        )
+        return Response({"unread_count": 0})
 
 
 class TestPushNotificationView(APIView):
@@ -180,9 +249,12 @@ class TestPushNotificationView(APIView):
                 notification_type="test",
             )
 
+            # 送信はワーカーが行うため、キューに積んだ件数を返す。
+            # 既存のクライアントのため、従来の sent にも同じ件数を入れる
             response_data = {
-                "success": result["success"] > 0,
-                "sent": result["success"],
+                "success": result["queued"] > 0,
+                "sent": result["queued"],
+                "queued": result["queued"],
                 "errors": result["errors"] if result["errors"] else None,
             }
 
@@ -195,102 +267,85 @@ class TestPushNotificationView(APIView):
             )
 
 
-def send_push_notification(user, title, body, url=None, notification_type="general"):
+def send_push_notification(
+    user, title, body, url=None, notification_type="general", idempotency_key=None
+):
     """
     特定のユーザーにプッシュ通知を送信するユーティリティ関数
 
+    通知は送信キューに積まれ、ワーカーが送信する。
+
     Args:
         user: 通知を送信するユーザー
         title: 通知のタイトル
         body: 通知の本文
         url: 通知クリック時のリダイレクト先URL（オプション）
         notification_type: 通知の種類 ('task', 'article', 'system'など)
+        idempotency_key: 同じ通知を二重に送らないためのキー（オプション）
 
     Returns:
-        dict: 送信結果の情報
+        dict: 送信キューに積んだ件数とエラーの情報
+    """
+    return send_push_notification_to_users(
+        [user],
+        title,
+        body,
+        url=url,
+        notification_type=notification_type,
+        idempotency_key=idempotency_key,
+    )
+
+
+def filter_subscriptions_by_type(subscriptions, notification_type):
+    """通知タイプに応じた通知設定でサブスクリプションを絞り込む"""
+    if notification_type == "task":
+        return subscriptions.filter(task_reminders=True)
+    if notification_type == "article":
+        return subscriptions.filter(new_articles=True)
+    if notification_type == "system":
+        return subscriptions.filter(system_notices=True)
+    return subscriptions
+
+
+def send_push_notification_to_users(
+    users, title, body, url=None, notification_type="general", idempotency_key=None
+):
     """
-    results = {"success": 0, "failed": 0, "errors": []}
+    複数のユーザーに同じプッシュ通知をまとめて送信する
 
-    try:
-        # ユーザーの通知設定に応じてフィルタリング
-        subscriptions = PushSubscription.objects.filter(user=user)
+    全ユーザーのサブスクリプションを1クエリで取得し、送信キューに積む。
+
+    Args:
+        users: 通知を送信するユーザーのリストまたはクエリセット
+        その他の引数は send_push_notification と同じ
 
-        # 通知タイプに応じた設定をチェック
-        if notification_type == "task":
-            subscriptions = subscriptions.filter(task_reminders=True)
-        elif notification_type == "article":
-            subscriptions = subscriptions.filter(new_articles=True)
-        elif notification_type == "system":
-            subscriptions = subscriptions.filter(system_notices=True)
+    Returns:
+        dict: 送信キューに積んだ件数とエラーの情報
+    """
+    results = {"queued": 0, "errors": []}
+
+    try:
+        subscriptions = list(
+            filter_subscriptions_by_type(
+                PushSubscription.objects.filter(user__in=users), notification_type
+            )
+        )
 
         if not subscriptions:
             results["errors"].append("No active subscriptions found")
             return results
 
-        # 送信するデータ
-        payload = json.dumps(
-            {"title": title, "body": body, "url": url or "/", "type": notification_type}
+        notification = {
+            "title": title,
+            "body": body,
+            "url": url,
+            "notification_type": notification_type,
+            "idempotency_key": idempotency_key,
+        }
+        results["queued"] = enqueue_push_notifications(
+            (subscription, notification) for subscription in subscriptions
         )
 
-        # 各サブスクリプションに通知を送信
-        for subscription in subscriptions:
-            subscription_info = {
-                "endpoint": subscription.endpoint,
-                "keys": {"p256dh": subscription.p256dh, "auth": subscription.auth},
-            }
-
-            vapid_claims = {
-                "sub": f"mailto:{settings.VAPID_CLAIMS_EMAIL}",
-                "exp": int(time.time()) + 12 * 60 * 60,  # 有効期限を12時間に設定
-                "aud": get_audience_from_endpoint(subscription.endpoint),
-            }
-
-            try:
-                webpush(
-                    subscription_info=subscription_info,
-                    data=payload,
-                    vapid_private_key=settings.VAPID_PRIVATE_KEY,
-                    vapid_claims=vapid_claims,
-                    ttl=60 * 60 * 12,
-                )
-                results["success"] += 1
-
-                # 通知ログを保存
-                PushNotificationLog.objects.create(
-                    user=user,
-                    title=title,
-                    body=body,
-                    url=url,
-                    notification_type=notification_type,
-                    status="sent",
-                )
-
-            except WebPushException as e:
-                logger.error(e)
-                error_msg = str(e)
-                results["failed"] += 1
-                results["errors"].append(error_msg)
-
-                # 無効なサブスクリプションの場合は削除
-                if e.response.status_code in [404, 410]:
-                    deleted = subscription.delete()
-                    logger.info(f"Delete result: {deleted}")
-                    results["errors"].append(
-                        f"Invalid subscription removed: {subscription.endpoint}"
-                    )
-
-                logger.error(f"通知送信エラー (User: {user.username}): {error_msg}")
-
-                # エラーログを保存
-                PushNotificationLog.objects.create(
-                    user=user,
-                    title=title,
-                    body=body,
-                    url=url,
-                    notification_type=notification_type,
-                    status="failed",
-                )
-
     except Exception as e:
         error_msg = str(e)
         results["errors"].append(error_msg)